@@ -0,0 +1,195 @@
+import numpy as np
+from Model.FEMModel import FEMModel
+from Model.BinaryModel import BinaryModel
+from Analysis.Solver import Solver
+from Analysis.ErrorEstimator import ErrorEstimator
+
+class AdaptiveRefinement:
+    """
+    誤差評価(ErrorEstimator)に基づいて要素を細分割し、全体の相対誤差が目標値以下になるまで解析を繰り返すクラス。
+    4節点要素(非適合要素を含む)のみ対応。
+
+    細分割は要素を辺の中点と中心で4分割する。隣接要素が細分割されない辺の中点はハンギングノードとなり、
+    変位を辺の両端の平均に従属させる(Mesh.hanging_nodes)。1つの辺に2段階以上のハンギングノードが生じないよう、
+    ハンギングノードを持つ要素を細分割する場合はその辺の粗い隣接要素も細分割する。
+    再解析では前回の解を新しい節点に補間したものを反復法ソルバーの初期値とする。
+    節点荷重は入力された節点にのみ与えられたままとし、細分割による分布荷重の再配分は行わない。
+
+    Attributes:
+        fem_model (FEMModel): 現在のモデル
+        solver (Solver): 現在のモデルの解析結果
+        element_error (array n_elem): 現在のモデルの要素ごとの誤差
+        history ([dict]): 反復ごとの記録 {"iteration", "n_elements", "n_dof", "rel_error", "energy_norm", "n_refined"}
+    """
+    EDGE_KEY = 2**32
+
+    def __init__(self,fem_model,target_error=0.05,max_iterations=10,max_elements=None):
+        """
+        Args:
+            target_error (float): 目標とする全体の相対誤差η
+            max_iterations (int): 細分割の最大回数
+            max_elements (int): 要素数の上限(超える場合は細分割を打ち切る)
+        """
+        if fem_model.analysis_setting["element_type"] not in ErrorEstimator.ELEMENT_TYPES:
+            raise ValueError("Adaptive refinement supports {} only".format(", ".join(ErrorEstimator.ELEMENT_TYPES)))
+        self.fem_model = fem_model
+        self.profiler = fem_model.profiler
+        self.target_error = target_error
+        self.max_iterations = max_iterations
+        self.max_elements = max_elements
+        #分割済みの辺 -> 中点の節点番号(辺のキーは両端の節点番号 min * EDGE_KEY + max)
+        self.edge_mid = {}
+        self.solver = None
+        self.element_error = None
+        self.history = []
+
+    def run(self,callback=None):
+        """
+        目標誤差に達するまで解析・誤差評価・細分割を繰り返す。
+
+        Args:
+            callback (function): 各解析の後にcallback(self, record)を呼ぶ
+
+        Returns:
+            solver (Solver): 最後のモデルの解析結果
+        """
+        d0 = None
+        for iteration in range(self.max_iterations + 1):
+            self.solver = Solver(self.fem_model,d0)
+            self.element_error, energy_norm, rel_error = ErrorEstimator.estimate(self.solver)
+            flags = self.mark(self.element_error,energy_norm)
+            record = {"iteration":iteration,"n_elements":len(self.fem_model.mesh.element_ids),
+                      "n_dof":2 * len(self.fem_model.mesh.node_ids),"rel_error":rel_error,"energy_norm":energy_norm,
+                      "n_refined":0}
+            self.history.append(record)
+            if callback is not None:
+                callback(self,record)
+            if rel_error <= self.target_error or iteration == self.max_iterations or not flags.any():
+                break
+            with self.profiler.stage("refine") as counters:
+                flags = self.balance(flags)
+                if self.max_elements is not None and record["n_elements"] + 3 * int(flags.sum()) > self.max_elements:
+                    break
+                record["n_refined"] = int(flags.sum())
+                d0 = self.refine(flags,self.solver.d_cases)
+                counters.update(n_refined=record["n_refined"],n_elements=len(self.fem_model.mesh.element_ids))
+        return self.solver
+
+    def mark(self,element_error,energy_norm):
+        """
+        誤差を全要素に等しく配分した許容値 η_target sqrt((||u||^2 + Σ||e||^2) / n_elem) を超える要素を選ぶ。
+
+        Returns:
+            flags (array n_elem, bool): 細分割する要素
+        """
+        allowed = self.target_error * np.sqrt((energy_norm**2 + np.sum(element_error**2)) / len(element_error))
+        return element_error > allowed
+
+    @staticmethod
+    def edge_keys(corner):
+        """
+        Returns:
+            keys (array n_elem x 4): 要素の各辺(隅節点i -> i+1)のキー
+        """
+        a, b = corner, np.roll(corner,-1,axis=1)
+        return np.minimum(a,b) * AdaptiveRefinement.EDGE_KEY + np.maximum(a,b)
+
+    def balance(self,flags):
+        """
+        細分割する要素がハンギングノードを持つ場合、その辺を持つ粗い隣接要素も細分割対象に加える(1辺に1段階のハンギングノードまで)。
+
+        Returns:
+            flags (array n_elem, bool): 細分割する要素
+        """
+        mesh = self.fem_model.mesh
+        if len(mesh.hanging_nodes) == 0:
+            return flags
+        corner = mesh.connectivity[:,:4]
+        keys = AdaptiveRefinement.edge_keys(corner)
+        parent_key = np.full(len(mesh.node_ids),-1,dtype=np.int64)
+        parents = np.sort(mesh.hanging_parents,axis=1)
+        parent_key[mesh.hanging_nodes] = parents[:,0] * AdaptiveRefinement.EDGE_KEY + parents[:,1]
+        flags = flags.copy()
+        while True:
+            required = parent_key[corner[flags]]
+            required = np.unique(required[required >= 0])
+            new = ~flags & np.isin(keys,required).any(axis=1)
+            if not new.any():
+                return flags
+            flags |= new
+
+    def refine(self,flags,d):
+        """
+        選んだ要素を4分割した新しいモデルを作成し、self.fem_modelを置き換える。
+
+        Args:
+            flags (array n_elem, bool): 細分割する要素
+            d (array 2node_num x n_case): 現在のモデルの変位(節点番号順)
+
+        Returns:
+            d0 (array 2node_num x n_case): 新しいモデルの節点に補間した変位(節点番号順)
+        """
+        mesh = self.fem_model.mesh
+        header, arrays = BinaryModel.from_fem_model(self.fem_model)
+        corner = mesh.connectivity[:,:4]
+        rows = np.flatnonzero(flags)
+        n_nodes = len(mesh.node_ids)
+
+        #辺の中点(分割済みの辺は既存の節点を使う)
+        keys = AdaptiveRefinement.edge_keys(corner[rows])
+        unique_keys, inverse = np.unique(keys,return_inverse=True)
+        edge_node = np.empty(len(unique_keys),dtype=np.int64)
+        new_edges = []
+        for i,key in enumerate(unique_keys.tolist()):
+            node = self.edge_mid.get(key)
+            if node is None:
+                node = n_nodes + len(new_edges)
+                self.edge_mid[key] = node
+                new_edges.append(key)
+            edge_node[i] = node
+        mid = edge_node[inverse.reshape(keys.shape)]
+        new_edges = np.array(new_edges,dtype=np.int64)
+        a, b = new_edges // AdaptiveRefinement.EDGE_KEY, new_edges % AdaptiveRefinement.EDGE_KEY
+        center = n_nodes + len(new_edges) + np.arange(len(rows))
+
+        #新しい節点の座標・拘束条件(辺の中点は両端の拘束条件が同じなら引き継ぐ)・補間用の親節点
+        coords = np.concatenate([(mesh.coords[a] + mesh.coords[b]) / 2,mesh.coords[corner[rows]].mean(axis=1)])
+        same = np.all(mesh.bc_mask[a] == mesh.bc_mask[b],axis=1) & np.all(mesh.bc_value[a] == mesh.bc_value[b],axis=1)
+        bc_mask = np.concatenate([mesh.bc_mask[a] & same[:,None],np.zeros((len(rows),2),dtype=bool)])
+        bc_value = np.where(bc_mask,np.concatenate([mesh.bc_value[a],np.zeros((len(rows),2))]),0.0)
+        n_new = len(coords)
+
+        c, m = corner[rows], mid
+        children = np.stack([np.column_stack([c[:,0],m[:,0],center,m[:,3]]),
+                             np.column_stack([m[:,0],c[:,1],m[:,1],center]),
+                             np.column_stack([center,m[:,1],c[:,2],m[:,2]]),
+                             np.column_stack([m[:,3],center,m[:,2],c[:,3]])],axis=1).reshape(-1,4)
+        keep = ~flags
+        #子要素の1つ目は親の要素番号を引き継ぎ、残りは新しい要素番号を付ける
+        child_ids = np.empty((len(rows),4),dtype=np.int64)
+        child_ids[:,0] = mesh.element_ids[rows]
+        child_ids[:,1:] = mesh.element_ids.max() + 1 + np.arange(3 * len(rows)).reshape(-1,3)
+        arrays.update(node_ids=np.arange(n_nodes + n_new),
+                      coords=np.concatenate([arrays["coords"],coords]),
+                      bc_mask=np.concatenate([arrays["bc_mask"],bc_mask]),
+                      bc_value=np.concatenate([arrays["bc_value"],bc_value]),
+                      element_ids=np.concatenate([mesh.element_ids[keep],child_ids.ravel()]),
+                      connectivity=np.concatenate([corner[keep],children]),
+                      section_ids=np.concatenate([arrays["section_ids"][keep],np.repeat(arrays["section_ids"][rows],4)]),
+                      material_ids=np.concatenate([arrays["material_ids"][keep],np.repeat(arrays["material_ids"][rows],4)]))
+        self.fem_model = FEMModel.from_arrays(header,arrays,self.profiler)
+        self.set_hanging_nodes(self.fem_model.mesh)
+
+        d = np.asarray(d,dtype=float).reshape(n_nodes,2,-1)
+        d_new = np.concatenate([(d[a] + d[b]) / 2,d[corner[rows]].mean(axis=1)])
+        return np.concatenate([d,d_new]).reshape(2 * (n_nodes + n_new),-1)
+
+    def set_hanging_nodes(self,mesh):
+        """
+        分割済みの辺のうち、まだ要素の辺として残っているもの(隣接要素が細分割されていない辺)の中点をハンギングノードとする。
+        """
+        keys = np.array(list(self.edge_mid.keys()),dtype=np.int64)
+        nodes = np.array(list(self.edge_mid.values()),dtype=np.int64)
+        hanging = np.isin(keys,AdaptiveRefinement.edge_keys(mesh.connectivity[:,:4]))
+        mesh.hanging_nodes = nodes[hanging]
+        mesh.hanging_parents = np.column_stack([keys[hanging] // AdaptiveRefinement.EDGE_KEY,keys[hanging] % AdaptiveRefinement.EDGE_KEY])
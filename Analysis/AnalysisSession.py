@@ -0,0 +1,231 @@
+import numpy as np
+import scipy.linalg as la
+from Analysis.Solver import Solver
+from Analysis.CalcStiffness import CalcStifness
+from Analysis.LinearSolver import LinearSolver, ConstrainedSystem
+from Analysis.SparseAssembly import SparseAssembly
+from Result.LoadCaseResults import LoadCaseResults
+
+class AnalysisSession:
+    """
+    厚さ・荷重・支持条件を少しずつ変更しながら再解析するためのクラス。
+    全体剛性マトリクスKと分解済みの係数を保持し、変更は次のように反映する。
+
+        厚さの変更: Keは厚さに比例するため、変更した要素の ΔKe = Ke(t_new - t_old) のみをKのdataに足し込む
+        荷重の変更: 分解済みの係数で前進後退代入のみ
+        支持条件の追加・削除: 拘束自由度の行・列を対角のみに置き換えた行列で扱う
+
+    分解時の行列 A に対する現在の行列 M の差 M - A は変更した自由度(支持条件の場合はその隣接自由度も)の集合Sの中に収まるため、
+    Woodburyの公式 M^-1 b = A^-1 b - Z (I + W Z_S)^-1 W (A^-1 b)_S (Z = A^-1 E_S, W = (M - A)_SS) で求解する。
+    |S|がmax_rankを超えた場合(または反復法ソルバーの場合)は現在のKで分解し直す。
+
+    Attributes:
+        solver (Solver): 最初の解析結果(mesh, renumbering, D, gpsなどを共有)
+        K (csr_matrix): 現在の全体剛性マトリクス(内部自由度順)
+        F (array 2node_num x n_case): 現在の荷重ベクトル(内部自由度順)
+        prescribed (array 2node_num): 拘束自由度の強制変位(拘束のない自由度はnan、内部自由度順)
+        max_rank (int): 分解し直すまでに許容する変更自由度数
+        n_factorizations (int): 分解の回数
+        d_cases (array 2node_num x n_case): 荷重ケースごとの全体変位ベクトル(節点番号順)
+    """
+    DEFAULT_MAX_RANK = 128
+
+    def __init__(self,fem_model,max_rank=None):
+        if fem_model.analysis_setting.get("assembly","sparse") == "dense":
+            raise ValueError("AnalysisSession requires sparse assembly")
+        self.solver = Solver(fem_model)
+        self.fem_model = fem_model
+        self.mesh = fem_model.mesh
+        self.renumbering = self.solver.renumbering
+        self.kernel = CalcStifness.element_kernel(fem_model)
+        self.K = self.solver.K.copy()
+        self.F = self.solver.F.copy()
+        #拘束自由度の対角の値(Woodburyの公式の係数の条件数を悪くしないようKの対角と同程度にする)
+        self.scale = float(np.mean(np.abs(self.K.diagonal())))
+        self.prescribed = np.full(self.K.shape[0],np.nan)
+        for i,value in self.solver.bc_dist_dict.items():
+            self.prescribed[i] = value
+        self.max_rank = max_rank or fem_model.analysis_setting.get("session_max_rank",AnalysisSession.DEFAULT_MAX_RANK)
+        self.n_factorizations = 0
+        self.system = self.solver.system
+        self.base_K = self.K.copy()
+        self.base_free = self.system.free
+        self.base_mask = np.isnan(self.prescribed)
+        self.touched = np.zeros(self.K.shape[0],dtype=bool)
+        self.Z_columns = {}
+        self.update = None
+        self.modified = False
+        self.d_cases = self.solver.d_cases
+
+    def factorize(self):
+        """
+        現在のKと支持条件で分解し直す。
+        """
+        constrained = np.flatnonzero(~np.isnan(self.prescribed))
+        bc_dist_dict = dict(zip(constrained.tolist(),self.prescribed[constrained].tolist()))
+        fem_model = self.fem_model
+        self.system = ConstrainedSystem(self.K,bc_dist_dict,lambda K_ff,dof_node: LinearSolver.create(fem_model,K_ff,dof_node))
+        self.base_K = self.K.copy()
+        self.base_free = self.system.free
+        self.base_mask = np.isnan(self.prescribed)
+        self.touched = np.zeros(self.K.shape[0],dtype=bool)
+        self.Z_columns = {}
+        self.update = None
+        self.n_factorizations += 1
+
+    def masked_block(self,K,free,S):
+        """
+        拘束自由度の行・列を対角のみ(scale)に置き換えた行列のS x Sブロック。
+
+        Args:
+            free (array 2node_num, bool): 自由自由度
+            S (array): 自由度番号
+        """
+        m = free[S].astype(float)
+        return K[S][:,S].toarray() * m[:,None] * m[None,:] + np.diag(self.scale * (1.0 - m))
+
+    def base_solve(self,b):
+        """
+        分解時の行列(拘束自由度は対角のみ)での求解 A^-1 b。
+        """
+        x = b / self.scale
+        x[self.base_free] = self.system.solver.solve(b[self.base_free])
+        return x
+
+    def prepare(self):
+        """
+        分解時からの変更をWoodburyの公式の係数にまとめる(変更が大きい場合は分解し直す)。
+        """
+        self.modified = False
+        touched = np.flatnonzero(self.touched)
+        W = self.masked_block(self.K,np.isnan(self.prescribed),touched) - self.masked_block(self.base_K,self.base_mask,touched)
+        keep = np.flatnonzero(np.any(W != 0.0,axis=1))
+        S, W = touched[keep], W[np.ix_(keep,keep)]
+        if len(S) == 0:
+            self.update = None
+            return
+        if len(S) > self.max_rank or self.system.solver.method in ("pcg","mixed"):
+            self.factorize()
+            return
+        #A^-1 E_Sの列は自由度ごとに保持し、新たに変更された自由度の分のみ求解する
+        new = [i for i in S.tolist() if i not in self.Z_columns]
+        if new:
+            E = np.zeros((self.K.shape[0],len(new)))
+            E[new,np.arange(len(new))] = 1.0
+            for i,z in zip(new,self.base_solve(E).T):
+                self.Z_columns[i] = z
+        Z = np.column_stack([self.Z_columns[i] for i in S.tolist()])
+        self.update = (S,Z,W,la.lu_factor(np.eye(len(S)) + W @ Z[S]))
+
+    def solve(self):
+        """
+        現在のK・荷重・支持条件で全荷重ケースを求解。
+
+        Returns:
+            d_cases (array 2node_num x n_case): 全体変位ベクトル(節点番号順)
+        """
+        if self.modified:
+            self.prepare()
+        constrained = ~np.isnan(self.prescribed)
+        u = np.where(constrained,self.prescribed,0.0)
+        b = self.F - (self.K @ u)[:,None]
+        b[constrained] = self.scale * u[constrained,None]
+        x = self.base_solve(b)
+        if self.update is not None:
+            S, Z, W, cap = self.update
+            x -= Z @ la.lu_solve(cap,W @ x[S])
+        self.d_internal = x
+        self.d_cases = self.renumbering.to_external(x)
+        return self.d_cases
+
+    @property
+    def d(self):
+        return self.d_cases[:,0]
+
+    def reactions(self):
+        """
+        Returns:
+            R (array 2node_num x n_case): 反力(節点番号順、拘束のない自由度では0)
+        """
+        constrained = np.flatnonzero(~np.isnan(self.prescribed))
+        R = np.zeros_like(self.d_internal)
+        R[constrained] = self.K[constrained] @ self.d_internal - self.F[constrained]
+        return self.renumbering.to_external(R)
+
+    def results(self):
+        """
+        現在の変位から節点応力・ひずみエネルギーを算出。
+
+        Returns:
+            results (LoadCaseResults): 荷重ケースごとの結果
+        """
+        nodal_stress, _ = self.solver.calc_nodal_stress(self.d_cases)
+        strain_energy = 1/2 * np.einsum("ic,ic->c",self.d_internal,self.K @ self.d_internal)
+        return LoadCaseResults(self.solver.load_case_names,self.d_cases,nodal_stress,strain_energy)
+
+    def set_thickness(self,element_ids,thickness):
+        """
+        要素の厚さを変更し、変更した要素の剛性の差分のみをKに足し込む。
+
+        Args:
+            element_ids (array): 要素番号
+            thickness (float or array): 新しい厚さ
+        """
+        rows = np.array([self.mesh.elements.index_of(elem_id) for elem_id in np.atleast_1d(element_ids).tolist()],dtype=np.int64)
+        old = self.mesh.get_element_thickness()[rows]
+        self.mesh.set_element_thickness(rows,thickness)
+        dt = self.mesh.get_element_thickness()[rows] - old
+        dKe = self.kernel(self.mesh.coords[self.mesh.connectivity[rows]],self.solver.D,dt,self.solver.gps,
+                          group=self.solver.element_group[rows])
+        pattern = SparseAssembly.get_pattern(self.fem_model)
+        self.K.data += np.bincount(pattern.slot[rows].ravel(),weights=dKe.ravel(),minlength=pattern.nnz)
+        self.touched[pattern.dofs[rows].ravel()] = True
+        self.modified = True
+
+    def set_load(self,node_ids,values,case=0):
+        """
+        節点荷重を置き換える(支持条件の変更と異なり再分解は不要)。そのケースを含む荷重組合せの荷重ベクトルも組み立て直す。
+
+        Args:
+            node_ids (array): 節点番号
+            values (array n x 2): 節点荷重[x方向、y方向]
+            case (int or str): 荷重ケース(番号またはケース名、荷重組合せは指定できない)
+        """
+        j = case if isinstance(case,int) else self.solver.load_case_names.index(case)
+        if j >= len(self.fem_model.load_cases):
+            raise ValueError("Load combination {} cannot be edited, edit its load cases".format(self.solver.load_case_names[j]))
+        i = self.renumbering.node_index[np.atleast_1d(node_ids)]
+        values = np.broadcast_to(np.asarray(values,dtype=float),(len(i),2))
+        self.F[2 * i,j] = values[:,0]
+        self.F[2 * i + 1,j] = values[:,1]
+        if j == 0:
+            self.mesh.forces[np.atleast_1d(node_ids)] = values
+        self.update_combinations()
+
+    def update_combinations(self):
+        """
+        荷重組合せの列を現在の荷重ケースの列から組み立て直す(Solver.read_load_casesと同じ組合せ方)。
+        """
+        names = list(self.fem_model.load_cases.keys())
+        for j,factors in enumerate(self.fem_model.load_combinations.values()):
+            column = self.F[:,len(names) + j]
+            column[:] = 0.0
+            for case_name,factor in factors.items():
+                column += factor * self.F[:,names.index(case_name)]
+
+    def set_support(self,node_ids,bc_dist):
+        """
+        支持条件を変更(8節点要素の中間節点には伝播しないため、必要なら中間節点の番号も指定する)。
+
+        Args:
+            node_ids (array): 節点番号
+            bc_dist ([float or None, float or None]): 節点拘束[x方向、y方向](None:拘束なし)
+        """
+        i = self.renumbering.node_index[np.atleast_1d(node_ids)]
+        for c in range(2):
+            self.prescribed[2 * i + c] = np.nan if bc_dist[c] is None else bc_dist[c]
+            #支持条件を変えた自由度の行・列が変わるため、隣接自由度も変更対象にする
+            self.touched[self.K[2 * i + c].indices] = True
+            self.mesh.bc_mask[np.atleast_1d(node_ids),c] = bc_dist[c] is not None
+            self.mesh.bc_value[np.atleast_1d(node_ids),c] = 0.0 if bc_dist[c] is None else bc_dist[c]
+        self.modified = True
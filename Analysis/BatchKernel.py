@@ -0,0 +1,131 @@
+import numpy as np
+
+class BatchKernel:
+    """
+    全要素(またはそのチャンク)のヤコビアン・Bマトリクス・Keを一括で算出するクラス
+
+    Attributes:
+        CHUNK_SIZE (int): 一度に処理する要素数(中間配列のメモリ量を抑えるため)
+    """
+    CHUNK_SIZE = 2048
+
+    @staticmethod
+    def gauss_table(gps):
+        """
+        set_gpsの積分点のタプルを配列に変換。
+
+        Returns:
+            xi, eta (array n_gp): 積分点の自然座標
+            w (array n_gp): 重み(wi*wj)
+        """
+        table = np.array(gps,dtype=float)
+        return table[:,0], table[:,1], table[:,2] * table[:,3]
+
+    @staticmethod
+    def calc_J(xy,dN):
+        """
+        ヤコビアンとその行列式・逆行列を算出。
+
+        Args:
+            xy (array n_elem x n_nodes x 2): 要素節点座標
+            dN (array n_gp x 2 x n_nodes): 積分点での形状関数の(xi,eta)微分
+
+        Returns:
+            J, invJ (array n_elem x n_gp x 2 x 2): ヤコビアンと逆行列
+            detJ (array n_elem x n_gp): ヤコビアンの行列式
+        """
+        J = np.einsum("gan,enc->egac",dN,xy)
+        detJ = J[...,0,0] * J[...,1,1] - J[...,0,1] * J[...,1,0]
+        invJ = np.empty_like(J)
+        invJ[...,0,0] = J[...,1,1] / detJ
+        invJ[...,0,1] = -J[...,0,1] / detJ
+        invJ[...,1,0] = -J[...,1,0] / detJ
+        invJ[...,1,1] = J[...,0,0] / detJ
+        return J, invJ, detJ
+
+    @staticmethod
+    def calc_B(invJ,dN):
+        """
+        Bマトリクスを算出。
+
+        Args:
+            invJ (array n_elem x n_gp x 2 x 2): ヤコビアンの逆行列
+            dN (array n_gp x 2 x n_nodes): 形状関数の(xi,eta)微分
+
+        Returns:
+            B (array n_elem x n_gp x 3 x 2n_nodes): Bマトリクス
+        """
+        dNdx = np.einsum("egij,gjn->egin",invJ,dN)
+        n_elem, n_gp, _, n_nodes = dNdx.shape
+        B = np.zeros((n_elem,n_gp,3,2 * n_nodes))
+        B[:,:,0,0::2] = dNdx[:,:,0]
+        B[:,:,1,1::2] = dNdx[:,:,1]
+        B[:,:,2,0::2] = dNdx[:,:,1]
+        B[:,:,2,1::2] = dNdx[:,:,0]
+        return B
+
+    @staticmethod
+    def calc_Ke(xy,D,thickness,dN,w,return_B=False):
+        """
+        アイソパラメトリック要素のKe(及び積分点でのB)をチャンクごとに一括算出。
+
+        Args:
+            xy (array n_elem x n_nodes x 2): 要素節点座標
+            D (array 3x3): Dマトリクス
+            thickness (array n_elem): 要素の厚さ
+            dN (array n_gp x 2 x n_nodes): 形状関数の(xi,eta)微分
+            w (array n_gp): 積分点の重み
+            return_B (bool): Trueの場合は積分点でのBも返す
+
+        Returns:
+            Ke (array n_elem x 2n_nodes x 2n_nodes): 要素剛性マトリクス
+            B (array n_elem x n_gp x 3 x 2n_nodes): Bマトリクス(return_B=Trueの場合)
+        """
+        xy = np.asarray(xy,dtype=float)
+        thickness = np.broadcast_to(np.asarray(thickness,dtype=float),(len(xy),))
+        n_elem, n_nodes = xy.shape[0], xy.shape[1]
+        Ke = np.empty((n_elem,2 * n_nodes,2 * n_nodes))
+        B_all = np.empty((n_elem,len(w),3,2 * n_nodes)) if return_B else None
+        for s in range(0,n_elem,BatchKernel.CHUNK_SIZE):
+            e = min(s + BatchKernel.CHUNK_SIZE,n_elem)
+            _, invJ, detJ = BatchKernel.calc_J(xy[s:e],dN)
+            B = BatchKernel.calc_B(invJ,dN)
+            DB = np.einsum("kl,eglj->egkj",D,B)
+            coef = w[None,:] * detJ * thickness[s:e,None]
+            Ke[s:e] = np.einsum("eg,egki,egkj->eij",coef,B,DB,optimize=True)
+            if return_B:
+                B_all[s:e] = B
+        if return_B:
+            return Ke, B_all
+        return Ke
+
+    @staticmethod
+    def by_group(kernel,xy,D,thickness,gps,group=None,return_B=False):
+        """
+        要素を(材料, 断面の種類)のグループに分け、グループごとにそのDマトリクスでkernelを一括で呼ぶ。
+
+        Args:
+            kernel (function): kernel(xy,D,thickness,gps,return_B)(Calc_*.calc_Ke_batchまたはキャッシュ経由のカーネル)
+            D (array 3x3 or n_group x 3 x 3): Dマトリクス(groupを省略した場合は全要素共通の3x3)
+            group (array n_elem): 各要素のグループ(Dのインデックス)
+
+        Returns:
+            Ke (array n_elem x ndof_e x ndof_e): 要素剛性マトリクス
+            B (array n_elem x n_gp x 3 x ndof_e): Bマトリクス(return_B=Trueの場合)
+        """
+        if group is None:
+            return kernel(xy,D,thickness,gps,return_B=return_B)
+        thickness = np.broadcast_to(np.asarray(thickness,dtype=float),(len(xy),))
+        groups = np.unique(group)
+        if len(groups) == 1:
+            return kernel(xy,D[groups[0]],thickness,gps,return_B=return_B)
+        results = None
+        for g in groups.tolist():
+            rows = np.flatnonzero(group == g)
+            values = kernel(xy[rows],D[g],thickness[rows],gps,return_B=return_B)
+            values = values if return_B else (values,)
+            if results is None:
+                results = [np.empty((len(xy),) + value.shape[1:]) for value in values]
+            for result,value in zip(results,values):
+                result[rows] = value
+        return tuple(results) if return_B else results[0]
@@ -1,77 +1,173 @@
-import numpy as np
-from Analysis.Calc_Q4 import Calc_Q4
-from Analysis.Calc_Q8 import Calc_Q8
-from Analysis.Calc_Q4Incomp import Calc_Q4Incomp
-
-class CalcStifness:
-    @staticmethod
-    def calc_D(fem_model):
-        """
-        Dマトリクスを算出。
-
-        Returns:
-            D (array 3x3): Dマトリクス
-        """
-        mesh = fem_model.mesh
-        D = np.array([
-                    [1,mesh.material.nu,0],
-                    [mesh.material.nu,1,0],
-                    [0,0,(1-mesh.material.nu)/2] 
-                        ]) * mesh.material.E / (1-mesh.material.nu**2)
-        return D
-    @staticmethod
-    def calc_K(fem_model,D,gps):
-        if fem_model.analysis_setting["element_type"] == "Quad_4node":
-            return Calc_Q4.calc_K(fem_model,D,gps)
-        elif fem_model.analysis_setting["element_type"] == "Quad_8node":
-            return Calc_Q8.calc_K(fem_model,D,gps)
-        elif fem_model.analysis_setting["element_type"] == "Quad_4node_Incomp":
-            return  Calc_Q4Incomp.calc_K(fem_model,D,gps)
-        else:
-            return
-    @staticmethod
-    def calc_B(fem_model,elem, xi, eta,D,gps):
-        if fem_model.analysis_setting["element_type"] == "Quad_4node":
-            B,_ = Calc_Q4.calc_B(elem, xi, eta)
-            return B
-        elif fem_model.analysis_setting["element_type"] == "Quad_8node":
-            B,_ = Calc_Q8.calc_B(elem, xi, eta)
-            return B
-        elif fem_model.analysis_setting["element_type"] == "Quad_4node_Incomp":
-            _,Be = Calc_Q4Incomp.calc_KeBe(elem, xi, eta,D,gps)
-            return Be
-        else:
-            return
-    @staticmethod
-    def set_gps(fem_model):
-        elmtype = fem_model.analysis_setting["element_type"]
-        gps = None
-        if elmtype in ("Quad_4node","Quad_4node_Incomp"):
-            gps = ((-1 / np.sqrt(3), -1 / np.sqrt(3), 1, 1),
-            (1 / np.sqrt(3), -1 / np.sqrt(3), 1, 1),
-            (1 / np.sqrt(3), 1 / np.sqrt(3), 1, 1),
-            (-1 / np.sqrt(3), 1 / np.sqrt(3), 1, 1),
-            ) #(xi,eta,wi,wj)
-        elif elmtype == "Quad_8node":
-            gps = (
-            (-np.sqrt(3/5), -np.sqrt(3/5),5/9, 5/9),
-            (0, -np.sqrt(3/5),8/9, 5/9),
-            (np.sqrt(3/5), -np.sqrt(3/5),5/9, 5/9),
-            (-np.sqrt(3/5), 0,5/9, 8/9),
-            (0, 0,8/9, 8/9),
-            (np.sqrt(3/5), 0,5/9, 8/9),
-            (-np.sqrt(3/5), np.sqrt(3/5),5/9, 5/9),
-            (0, np.sqrt(3/5),8/9, 5/9),
-            (np.sqrt(3/5), np.sqrt(3/5),5/9, 5/9)
-            ) #(xi,eta,wi,wj)
-        return gps
-    @staticmethod
-    def calc_d(fem_model,f,bc_dist_dict,K):
-        mesh = fem_model.mesh
-        for i in range(len(mesh.nodes) * 2):
-            if i in bc_dist_dict.keys():
-                K[i, :] = np.zeros(len(mesh.nodes) * 2)
-                K[:, i] = np.zeros(len(mesh.nodes) * 2)
-                K[i, i] = 1.0
-        d = np.dot(np.linalg.inv(K), f.T)
-        return d
+import numpy as np
+from Analysis.Calc_Q4 import Calc_Q4
+from Analysis.Calc_Q8 import Calc_Q8
+from Analysis.Calc_Q4Incomp import Calc_Q4Incomp
+from Analysis.LinearSolver import LinearSolver, ConstrainedSystem
+from Analysis.ElementCache import ElementCache
+from Analysis.BatchKernel import BatchKernel
+
+class CalcStifness:
+    @staticmethod
+    def calc_D_matrix(material,section_type="plane_stress"):
+        """
+        1つの材料・断面の種類のDマトリクスを算出。
+
+        Args:
+            material (Material): 材料
+            section_type (str): "plane_stress" または "plane_strain"
+
+        Returns:
+            D (array 3x3): Dマトリクス
+        """
+        E, nu = material.E, material.nu
+        if section_type == "plane_strain":
+            #平面応力の式でE, nuを E/(1-nu^2), nu/(1-nu) に置き換えたもの
+            E, nu = E / (1 - nu**2), nu / (1 - nu)
+        D = np.array([
+                    [1,nu,0],
+                    [nu,1,0],
+                    [0,0,(1-nu)/2] 
+                        ]) * E / (1-nu**2)
+        return D
+    @staticmethod
+    def calc_D(fem_model):
+        """
+        要素を(材料, 断面の種類)の組でグループ分けし、グループごとのDマトリクスを算出。
+
+        Returns:
+            D (array n_group x 3 x 3): グループごとのDマトリクス
+            group (array n_elem): 各要素のグループ(Dのインデックス)
+        """
+        keys, group = fem_model.mesh.get_element_groups()
+        D = np.array([CalcStifness.calc_D_matrix(material,section_type) for material,section_type in keys])
+        return D, group
+    @staticmethod
+    def calc_nu_z(fem_model):
+        """
+        グループごとの面外応力の係数(sigZ = nu_z (sigX + sigY))を算出。平面ひずみはnu、平面応力は0。
+
+        Returns:
+            nu_z (array n_group): calc_DのDと同じ順のグループごとの係数
+        """
+        keys, _ = fem_model.mesh.get_element_groups()
+        return np.array([material.nu if section_type == "plane_strain" else 0.0 for material,section_type in keys])
+    @staticmethod
+    def calc_K(fem_model,D,gps,group):
+        """
+        全体剛性マトリクスを算出。要素はグループごとに一括で計算する。
+        analysis_settingsの"assembly"が"dense"の場合のみ密行列で組み立てる(デバッグ用)。
+
+        Args:
+            D (array n_group x 3 x 3): グループごとのDマトリクス
+            group (array n_elem): 各要素のグループ
+
+        Returns:
+            K (csr_matrix or array): 全体剛性マトリクス
+        """
+        dense = fem_model.analysis_setting.get("assembly","sparse") == "dense"
+        if fem_model.analysis_setting["element_type"] == "Quad_4node":
+            return Calc_Q4.calc_K(fem_model,D,gps,group,dense)
+        elif fem_model.analysis_setting["element_type"] == "Quad_8node":
+            return Calc_Q8.calc_K(fem_model,D,gps,group,dense)
+        elif fem_model.analysis_setting["element_type"] == "Quad_4node_Incomp":
+            return  Calc_Q4Incomp.calc_K(fem_model,D,gps,group,dense)
+        else:
+            return
+    @staticmethod
+    def calc_B(fem_model,elem, xi, eta,D,gps):
+        if fem_model.analysis_setting["element_type"] == "Quad_4node":
+            B,_ = Calc_Q4.calc_B(elem, xi, eta)
+            return B
+        elif fem_model.analysis_setting["element_type"] == "Quad_8node":
+            B,_ = Calc_Q8.calc_B(elem, xi, eta)
+            return B
+        elif fem_model.analysis_setting["element_type"] == "Quad_4node_Incomp":
+            _,Be = Calc_Q4Incomp.calc_KeBe(elem, xi, eta,D,gps)
+            return Be
+        else:
+            return
+    @staticmethod
+    def element_kernel(fem_model):
+        """
+        要素タイプに応じたcalc_Ke_batchを取得(要素キャッシュが有効な場合はキャッシュ経由)。
+
+        Returns:
+            kernel (function): kernel(xy,D,thickness,gps,return_B=False,group=None)
+                               (groupを指定した場合はDをグループごとのDマトリクスとしてBatchKernel.by_groupで計算)
+        """
+        elmtype = fem_model.analysis_setting["element_type"]
+        if elmtype == "Quad_4node":
+            calc_Ke_batch = Calc_Q4.calc_Ke_batch
+        elif elmtype == "Quad_8node":
+            calc_Ke_batch = Calc_Q8.calc_Ke_batch
+        elif elmtype == "Quad_4node_Incomp":
+            calc_Ke_batch = Calc_Q4Incomp.calc_Ke_batch
+        else:
+            return
+        kernel = ElementCache.kernel_for(fem_model,calc_Ke_batch)
+        return lambda xy,D,thickness,gps,return_B=False,group=None: BatchKernel.by_group(kernel,xy,D,thickness,gps,group,return_B)
+    @staticmethod
+    def calc_B_batch(fem_model,xy,D,thickness,gps,group=None):
+        """
+        複数要素の積分点でのBマトリクスを一括で算出(要素キャッシュが有効な場合はキャッシュから取得)。
+
+        Args:
+            xy (array n_elem x n_nodes x 2): 要素節点座標
+            thickness (array n_elem): 要素の厚さ
+            group (array n_elem): 各要素のグループ(Dがグループごとの場合)
+
+        Returns:
+            B (array n_elem x n_gp x 3 x ndof_e): Bマトリクス
+        """
+        kernel = CalcStifness.element_kernel(fem_model)
+        if kernel is None:
+            return
+        _,B = kernel(xy,D,thickness,gps,return_B=True,group=group)
+        return B
+    @staticmethod
+    def set_gps(elmtype):
+        """
+        要素の種類に応じた積分点を返す。
+
+        Args:
+            elmtype (str): 要素の種類(analysis_settingのelement_type)
+
+        Returns:
+            gps (tuple): 積分点(xi,eta,wi,wj)のタプル
+        """
+        gps = None
+        if elmtype in ("Quad_4node","Quad_4node_Incomp"):
+            gps = ((-1 / np.sqrt(3), -1 / np.sqrt(3), 1, 1),
+            (1 / np.sqrt(3), -1 / np.sqrt(3), 1, 1),
+            (1 / np.sqrt(3), 1 / np.sqrt(3), 1, 1),
+            (-1 / np.sqrt(3), 1 / np.sqrt(3), 1, 1),
+            ) #(xi,eta,wi,wj)
+        elif elmtype == "Quad_8node":
+            gps = (
+            (-np.sqrt(3/5), -np.sqrt(3/5),5/9, 5/9),
+            (0, -np.sqrt(3/5),8/9, 5/9),
+            (np.sqrt(3/5), -np.sqrt(3/5),5/9, 5/9),
+            (-np.sqrt(3/5), 0,5/9, 8/9),
+            (0, 0,8/9, 8/9),
+            (np.sqrt(3/5), 0,5/9, 8/9),
+            (-np.sqrt(3/5), np.sqrt(3/5),5/9, 5/9),
+            (0, np.sqrt(3/5),8/9, 5/9),
+            (np.sqrt(3/5), np.sqrt(3/5),5/9, 5/9)
+            ) #(xi,eta,wi,wj)
+        return gps
+    @staticmethod
+    def calc_d(fem_model,f,bc_dist_dict,K,ties=None,x0=None):
+        """
+        Kを自由自由度・拘束自由度に分割し、強制変位を右辺に移して変位を算出(元のKは変更しない)。
+
+        Args:
+            ties (tuple): 従属自由度・主自由度・重み(ConstrainedSystemを参照)
+            x0 (array): 反復法ソルバーの初期値(内部自由度順)
+
+        Returns:
+            d (array 2node_num): 全体変位ベクトル
+            system (ConstrainedSystem): 分割した方程式とK_ffのソルバー(別の荷重ベクトルの求解・反力の算出に再利用可能)
+        """
+        system = ConstrainedSystem(K,bc_dist_dict,lambda K_ff,dof_node: LinearSolver.create(fem_model,K_ff,dof_node),ties)
+        d = system.solve(f,x0=x0)
+        return d, system
@@ -0,0 +1,89 @@
+import numpy as np
+
+class CalcStress:
+    @staticmethod
+    def calc_extrapolation_matrix(gps):
+        """
+        積分点の応力から隅節点の応力を求める外挿マトリクスを算出。
+        積分点の値に2次多項式(1, xi, eta, xi^2, eta^2, xi*eta)を最小二乗法(最小ノルム解)で当てはめ、隅節点で評価する。
+        積分則のみで決まるため、要素タイプごとに一度だけ計算すればよい。
+
+        Returns:
+            E (array 4 x n_gp): 隅節点応力 = E @ 積分点応力
+        """
+        gp = np.array(gps,dtype=float)
+        corner = np.array([[-1, -1], [1, -1], [1, 1], [-1, 1]],dtype=float)
+        A = CalcStress.poly_basis(gp[:,0],gp[:,1])
+        A_corners = CalcStress.poly_basis(corner[:,0],corner[:,1])
+        return A_corners @ np.linalg.pinv(A)
+
+    @staticmethod
+    def poly_basis(xi,eta):
+        return np.column_stack([np.ones(len(xi)),xi,eta,xi**2,eta**2,xi * eta])
+
+    @staticmethod
+    def calc_gp_stress(D,B,d_e):
+        """
+        積分点での応力を一括で算出。
+
+        Args:
+            D (array 3x3 or n_elem x 3 x 3): Dマトリクス(要素ごとに異なる場合は要素ごと)
+            B (array n_elem x n_gp x 3 x ndof_e): 積分点でのBマトリクス
+            d_e (array n_elem x ndof_e): 要素節点変位
+
+        Returns:
+            stress (array n_elem x n_gp x 3): 積分点応力(sigX, sigY, tauXY)
+        """
+        strain = np.einsum("egjk,ek->egj",B,d_e)
+        if np.ndim(D) == 3:
+            return np.einsum("eij,egj->egi",D,strain)
+        return np.einsum("ij,egj->egi",D,strain)
+
+    @staticmethod
+    def average_nodal(corner_nodes,node_stress_e,n_nodes):
+        """
+        要素ごとの隅節点応力を節点ごとに平均(scatter-add)。
+
+        Args:
+            corner_nodes (array n_elem x 4): 隅節点番号
+            node_stress_e (array n_elem x 4 x n_comp): 要素ごとの隅節点応力
+            n_nodes (int): 節点数
+
+        Returns:
+            stress (array n_nodes x n_comp): 平均節点応力(どの要素にも属さない節点はnan)
+        """
+        idx = corner_nodes.ravel()
+        counts = np.bincount(idx,minlength=n_nodes).astype(float)
+        n_comp = node_stress_e.shape[-1]
+        flat = node_stress_e.reshape(-1,n_comp)
+        sums = np.column_stack([np.bincount(idx,weights=flat[:,k],minlength=n_nodes) for k in range(n_comp)])
+        with np.errstate(invalid="ignore",divide="ignore"):
+            return sums / counts[:,None]
+
+    @staticmethod
+    def calc_sigma_z(stress,nu_z):
+        """
+        面外応力 sigZ = nu_z (sigX + sigY) を算出(平面ひずみはnu_z = nu、平面応力はnu_z = 0)。
+
+        Args:
+            stress (array n_elem x ... x 3): (sigX, sigY, tauXY)
+            nu_z (array n_elem): 要素ごとの係数
+
+        Returns:
+            sigma_z (array n_elem x ...): 面外応力
+        """
+        nu_z = np.asarray(nu_z,dtype=float).reshape((-1,) + (1,) * (stress.ndim - 2))
+        return nu_z * (stress[...,0] + stress[...,1])
+
+    @staticmethod
+    def calc_mises(stress):
+        """
+        Args:
+            stress (array ... x 3 or ... x 4): (sigX, sigY, tauXY) または (sigX, sigY, tauXY, sigZ)(3成分の場合はsigZ = 0)
+
+        Returns:
+            mises (array ...): von Mises応力
+        """
+        sx, sy, txy = stress[...,0], stress[...,1], stress[...,2]
+        sz = stress[...,3] if stress.shape[-1] > 3 else 0.0
+        return np.sqrt(((sx - sy)**2 + (sy - sz)**2 + (sz - sx)**2) / 2 + 3 * txy**2)
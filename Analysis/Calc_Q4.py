@@ -1,66 +1,122 @@
-import numpy as np
-
-class Calc_Q4:
-    @staticmethod
-    def calc_K(fem_model,D,gps):
-        mesh = fem_model.mesh
-        K = np.zeros((len(mesh.nodes) * 2, len(mesh.nodes) * 2))
-        for key,elem in mesh.elements.items():
-            Ke = Calc_Q4.calc_Ke(elem,D,gps)
-            for i in range(4):
-                for j in range(4):
-                    K[2 * elem.node[i]:2 * elem.node[i]+2,
-                        2 * elem.node[j]:2 * elem.node[j]+2] += Ke[2 * i:2 * i+2, 2 * j:2 * j+2]
-        return K
-    
-    @staticmethod
-    def calc_Ke(elem,D, gps):
-        """
-        4nodeのKeマトリクスを算出。
-
-        Args:
-            elem (Element): 対象のElementクラス
-            
-        Returns:
-            Ke (array 8x8): 要素剛性マトリクス
-        """  
-        Ke = np.zeros((8, 8))
-        for xi, eta, wi, wj in gps:
-            B, J = Calc_Q4.calc_B(elem, xi, eta)
-            Ke += wi * wj * np.dot(B.T, np.dot(D, B)) * np.linalg.det(J) * elem.section.thickness
-        return Ke
-
-    @staticmethod
-    def calc_B(elem, xi, eta):
-        """
-        Bマトリクス及びヤコビアンを算出。
-
-        Args:
-            elem (Element): 対象のElementクラス
-            xi, eta (float): Bマトリクス算出用の座標
-
-        Returns:
-            B (array 3x8): Bマトリクス
-            J (array 2x2): ヤコビアン
-        """
-        dndxi = np.array([-1+eta,1-eta,1+eta,-1-eta])/4
-        dndeta = np.array([-1+xi,-1-xi,1+xi,1-xi])/4
-
-        x = elem.xy[:,0]
-        y = elem.xy[:,1]
-
-        dxdxi =  np.dot(dndxi,x)
-        dydxi =  np.dot(dndxi,y)
-        dxdeta = np.dot(dndeta,x)
-        dydeta = np.dot(dndeta,y)
-
-        J = np.array([[dxdxi,dydxi],[dxdeta,dydeta]])
-        B = np.zeros((3,8))
-        for i in range(4):
-            Bi = np.dot(np.linalg.inv(J),np.array([dndxi[i],dndeta[i]]).T)
-            B[0,2*i] = Bi[0]
-            B[1,2*i+1] = Bi[1]
-            B[2,2*i] = Bi[1]
-            B[2,2*i+1] = Bi[0]
-        return B , J
+import numpy as np
+from Analysis.SparseAssembly import SparseAssembly
+from Analysis.BatchKernel import BatchKernel
+from Analysis.ElementCache import ElementCache
+from Analysis.Renumbering import Renumbering
+
+class Calc_Q4:
+    @staticmethod
+    def calc_K(fem_model,D,gps,group,dense=False):
+        """
+        全体剛性マトリクスを算出。
+
+        Args:
+            D (array n_group x 3 x 3): (材料, 断面の種類)のグループごとのDマトリクス
+            group (array n_elem): 各要素のグループ
+            dense (bool): Trueの場合は密行列で組み立てる(デバッグ用)
+
+        Returns:
+            K (csr_matrix or array): 全体剛性マトリクス
+        """
+        mesh = fem_model.mesh
+        if not dense:
+            xy = mesh.get_element_xy()
+            thickness = mesh.get_element_thickness()
+            kernel = ElementCache.kernel_for(fem_model,Calc_Q4.calc_Ke_batch)
+            return SparseAssembly.assemble_by_chunks(fem_model,
+                lambda s,e: BatchKernel.by_group(kernel,xy[s:e],D,thickness[s:e],gps,group[s:e]))
+        K = np.zeros((len(mesh.nodes) * 2, len(mesh.nodes) * 2))
+        node_index = Renumbering.get(fem_model).node_index
+        for row,elem in enumerate(mesh.elements.values()):
+            node = node_index[elem.node]
+            Ke = Calc_Q4.calc_Ke(elem,D[group[row]],gps)
+            for i in range(4):
+                for j in range(4):
+                    K[2 * node[i]:2 * node[i]+2,
+                        2 * node[j]:2 * node[j]+2] += Ke[2 * i:2 * i+2, 2 * j:2 * j+2]
+        return K
+    
+    @staticmethod
+    def calc_dN(gps):
+        """
+        各積分点での形状関数の自然座標微分を算出。
+
+        Returns:
+            dN (array n_gp x 2 x 4): [dN/dxi, dN/deta]
+        """
+        xi, eta, _ = BatchKernel.gauss_table(gps)
+        xi, eta = xi[:,None], eta[:,None]
+        dndxi = np.hstack([-1+eta,1-eta,1+eta,-1-eta])/4
+        dndeta = np.hstack([-1+xi,-1-xi,1+xi,1-xi])/4
+        return np.stack([dndxi,dndeta],axis=1)
+
+    @staticmethod
+    def calc_Ke_batch(xy,D,thickness,gps,return_B=False):
+        """
+        複数要素のKeを一括で算出。
+
+        Args:
+            xy (array n_elem x 4 x 2): 要素節点座標
+            D (array 3x3): Dマトリクス
+            thickness (array n_elem): 要素の厚さ
+            gps: set_gpsの積分点
+            return_B (bool): Trueの場合は積分点でのBマトリクスも返す
+
+        Returns:
+            Ke (array n_elem x 8 x 8): 要素剛性マトリクス
+            B (array n_elem x n_gp x 3 x 8): Bマトリクス(return_B=Trueの場合)
+        """
+        _, _, w = BatchKernel.gauss_table(gps)
+        return BatchKernel.calc_Ke(xy,D,thickness,Calc_Q4.calc_dN(gps),w,return_B)
+
+    @staticmethod
+    def calc_Ke(elem,D, gps):
+        """
+        4nodeのKeマトリクスを算出。
+
+        Args:
+            elem (Element): 対象のElementクラス
+            
+        Returns:
+            Ke (array 8x8): 要素剛性マトリクス
+        """  
+        Ke = np.zeros((8, 8))
+        for xi, eta, wi, wj in gps:
+            B, J = Calc_Q4.calc_B(elem, xi, eta)
+            Ke += wi * wj * np.dot(B.T, np.dot(D, B)) * np.linalg.det(J) * elem.section.thickness
+        return Ke
+
+    @staticmethod
+    def calc_B(elem, xi, eta):
+        """
+        Bマトリクス及びヤコビアンを算出。
+
+        Args:
+            elem (Element): 対象のElementクラス
+            xi, eta (float): Bマトリクス算出用の座標
+
+        Returns:
+            B (array 3x8): Bマトリクス
+            J (array 2x2): ヤコビアン
+        """
+        dndxi = np.array([-1+eta,1-eta,1+eta,-1-eta])/4
+        dndeta = np.array([-1+xi,-1-xi,1+xi,1-xi])/4
+
+        x = elem.xy[:,0]
+        y = elem.xy[:,1]
+
+        dxdxi =  np.dot(dndxi,x)
+        dydxi =  np.dot(dndxi,y)
+        dxdeta = np.dot(dndeta,x)
+        dydeta = np.dot(dndeta,y)
+
+        J = np.array([[dxdxi,dydxi],[dxdeta,dydeta]])
+        B = np.zeros((3,8))
+        for i in range(4):
+            Bi = np.dot(np.linalg.inv(J),np.array([dndxi[i],dndeta[i]]).T)
+            B[0,2*i] = Bi[0]
+            B[1,2*i+1] = Bi[1]
+            B[2,2*i] = Bi[1]
+            B[2,2*i+1] = Bi[0]
+        return B , J
         
\ No newline at end of file
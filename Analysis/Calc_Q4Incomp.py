@@ -1,84 +1,172 @@
-import numpy as np
-
-class Calc_Q4Incomp:
-    @staticmethod
-    def calc_K(fem_model,D,gps):
-        mesh = fem_model.mesh
-        K = np.zeros((len(mesh.nodes) * 2, len(mesh.nodes) * 2))
-        for key,elem in mesh.elements.items():
-            Ke,_ = Calc_Q4Incomp.calc_KeBe(elem,0,0,D,gps)
-            for i in range(4):
-                for j in range(4):
-                    K[2 * elem.node[i]:2 * elem.node[i]+2,
-                        2 * elem.node[j]:2 * elem.node[j]+2] += Ke[2 * i:2 * i+2, 2 * j:2 * j+2]
-        return K
-
-    @staticmethod
-    def calc_KeBe(elem, _xi, _eta,D,gps):
-        """
-        4nodeのKeマトリクスを算出。
-
-        Args:
-            elem (Element): 対象のElementクラス
-
-        Returns:
-            Ke (array 8x8): 要素剛性マトリクス
-        """
-        Kcc = np.zeros((8, 8))
-        Kci = np.zeros((8,4))
-        Kic = np.zeros((4,8))
-        Kii = np.zeros((4,4))
-        _Bc,_Bi ,_= Calc_Q4Incomp.calc_BJ(elem, _xi, _eta)
-        for xi, eta, wi, wj in gps:
-            Bc,Bi, J = Calc_Q4Incomp.calc_BJ(elem, xi, eta)
-            Kcc += wi * wj * (Bc.T @ D @ Bc) * np.linalg.det(J) * elem.section.thickness
-            Kci += wi * wj * (Bc.T @ D @ Bi) * np.linalg.det(J) * elem.section.thickness
-            Kic += wi * wj * (Bi.T @ D @ Bc) * np.linalg.det(J) * elem.section.thickness
-            Kii += wi * wj * (Bi.T @ D @ Bi) * np.linalg.det(J) * elem.section.thickness
-
-        Ke = Kcc - Kci @ np.linalg.inv(Kii) @ Kic
-        Be  =  _Bc - _Bi @ np.linalg.inv(Kii) @ Kic
-        return Ke ,Be
-
-    def calc_BJ(elem, xi, eta):
-        """
-        Bマトリクス及びヤコビアンを算出。
-
-        Args:
-            elem (Element): 対象のElementクラス
-            xi, eta (float): Bマトリクス算出用の座標
-
-        Returns:
-            B (array 3x8): Bマトリクス
-            J (array 2x2): ヤコビアン
-        """
-        dndxi = np.array([-1+eta,1-eta,1+eta,-1-eta])/4
-        dndeta = np.array([-1+xi,-1-xi,1+xi,1-xi])/4
-
-        x = elem.xy[:,0]
-        y = elem.xy[:,1]
-
-        dxdxi =  np.dot(dndxi,x)
-        dydxi =  np.dot(dndxi,y)
-        dxdeta = np.dot(dndeta,x)
-        dydeta = np.dot(dndeta,y)
-
-        J = np.array([[dxdxi,dydxi],[dxdeta,dydeta]])
-
-        Bc = np.zeros((3,8))
-        invJ = np.linalg.inv(J)
-        for i in range(4):
-            Bj = np.dot(invJ,np.array([dndxi[i],dndeta[i]]).T)
-            Bc[0,2*i] = Bj[0]
-            Bc[1,2*i+1] = Bj[1]
-            Bc[2,2*i] = Bj[1]
-            Bc[2,2*i+1] = Bj[0]
-
-
-        Bi = np.array([
-            [-2*xi*invJ[0,0],-2*eta*invJ[0,1],0,0],
-            [0,0,-2*xi*invJ[1,0],-2*eta*invJ[1,1]],
-            [-2*xi*invJ[1,0],-2*eta*invJ[1,1],-2*xi*invJ[0,0],-2*eta*invJ[0,1]]
-        ])
-
-        return Bc,Bi,J
+import numpy as np
+from Analysis.SparseAssembly import SparseAssembly
+from Analysis.BatchKernel import BatchKernel
+from Analysis.ElementCache import ElementCache
+from Analysis.Renumbering import Renumbering
+from Analysis.Calc_Q4 import Calc_Q4
+
+class Calc_Q4Incomp:
+    @staticmethod
+    def calc_K(fem_model,D,gps,group,dense=False):
+        """
+        全体剛性マトリクスを算出。
+
+        Args:
+            D (array n_group x 3 x 3): (材料, 断面の種類)のグループごとのDマトリクス
+            group (array n_elem): 各要素のグループ
+            dense (bool): Trueの場合は密行列で組み立てる(デバッグ用)
+
+        Returns:
+            K (csr_matrix or array): 全体剛性マトリクス
+        """
+        mesh = fem_model.mesh
+        if not dense:
+            xy = mesh.get_element_xy()
+            thickness = mesh.get_element_thickness()
+            kernel = ElementCache.kernel_for(fem_model,Calc_Q4Incomp.calc_Ke_batch)
+            return SparseAssembly.assemble_by_chunks(fem_model,
+                lambda s,e: BatchKernel.by_group(kernel,xy[s:e],D,thickness[s:e],gps,group[s:e]))
+        K = np.zeros((len(mesh.nodes) * 2, len(mesh.nodes) * 2))
+        node_index = Renumbering.get(fem_model).node_index
+        for row,elem in enumerate(mesh.elements.values()):
+            node = node_index[elem.node]
+            Ke,_ = Calc_Q4Incomp.calc_KeBe(elem,0,0,D[group[row]],gps)
+            for i in range(4):
+                for j in range(4):
+                    K[2 * node[i]:2 * node[i]+2,
+                        2 * node[j]:2 * node[j]+2] += Ke[2 * i:2 * i+2, 2 * j:2 * j+2]
+        return K
+
+    @staticmethod
+    def calc_Ke_batch(xy,D,thickness,gps,return_B=False):
+        """
+        複数要素の非適合モードを静的縮約したKeを一括で算出。
+
+        Args:
+            xy (array n_elem x 4 x 2): 要素節点座標
+            D (array 3x3): Dマトリクス
+            thickness (array n_elem): 要素の厚さ
+            gps: set_gpsの積分点
+            return_B (bool): Trueの場合は積分点での縮約後のBマトリクス(Be)も返す
+
+        Returns:
+            Ke (array n_elem x 8 x 8): 要素剛性マトリクス
+            Be (array n_elem x n_gp x 3 x 8): Bマトリクス(return_B=Trueの場合)
+        """
+        xy = np.asarray(xy,dtype=float)
+        thickness = np.broadcast_to(np.asarray(thickness,dtype=float),(len(xy),))
+        xi, eta, w = BatchKernel.gauss_table(gps)
+        dN = Calc_Q4.calc_dN(gps)
+        n_elem = len(xy)
+        Ke = np.empty((n_elem,8,8))
+        Be_all = np.empty((n_elem,len(w),3,8)) if return_B else None
+        for s in range(0,n_elem,BatchKernel.CHUNK_SIZE):
+            e = min(s + BatchKernel.CHUNK_SIZE,n_elem)
+            _, invJ, detJ = BatchKernel.calc_J(xy[s:e],dN)
+            Bc = BatchKernel.calc_B(invJ,dN)
+            Bi = Calc_Q4Incomp.calc_Bi_batch(invJ,xi,eta)
+            coef = w[None,:] * detJ * thickness[s:e,None]
+            DBc = np.einsum("kl,eglj->egkj",D,Bc)
+            DBi = np.einsum("kl,eglj->egkj",D,Bi)
+            Kcc = np.einsum("eg,egki,egkj->eij",coef,Bc,DBc,optimize=True)
+            Kic = np.einsum("eg,egki,egkj->eij",coef,Bi,DBc,optimize=True)
+            Kii = np.einsum("eg,egki,egkj->eij",coef,Bi,DBi,optimize=True)
+            X = np.linalg.solve(Kii,Kic) #Kii^-1 Kic
+            Ke[s:e] = Kcc - np.einsum("eji,ejk->eik",Kic,X)
+            if return_B:
+                Be_all[s:e] = Bc - np.einsum("egij,ejk->egik",Bi,X)
+        if return_B:
+            return Ke, Be_all
+        return Ke
+
+    @staticmethod
+    def calc_Bi_batch(invJ,xi,eta):
+        """
+        非適合モードのBマトリクスを一括で算出。
+
+        Args:
+            invJ (array n_elem x n_gp x 2 x 2): ヤコビアンの逆行列
+            xi, eta (array n_gp): 積分点の自然座標
+
+        Returns:
+            Bi (array n_elem x n_gp x 3 x 4): 非適合モードのBマトリクス
+        """
+        a = -2 * xi[None,:] * invJ[...,0,0]
+        b = -2 * eta[None,:] * invJ[...,0,1]
+        c = -2 * xi[None,:] * invJ[...,1,0]
+        d = -2 * eta[None,:] * invJ[...,1,1]
+        Bi = np.zeros(invJ.shape[:2] + (3,4))
+        Bi[...,0,0], Bi[...,0,1] = a, b
+        Bi[...,1,2], Bi[...,1,3] = c, d
+        Bi[...,2,0], Bi[...,2,1], Bi[...,2,2], Bi[...,2,3] = c, d, a, b
+        return Bi
+
+    @staticmethod
+    def calc_KeBe(elem, _xi, _eta,D,gps):
+        """
+        4nodeのKeマトリクスを算出。
+
+        Args:
+            elem (Element): 対象のElementクラス
+
+        Returns:
+            Ke (array 8x8): 要素剛性マトリクス
+        """
+        Kcc = np.zeros((8, 8))
+        Kci = np.zeros((8,4))
+        Kic = np.zeros((4,8))
+        Kii = np.zeros((4,4))
+        _Bc,_Bi ,_= Calc_Q4Incomp.calc_BJ(elem, _xi, _eta)
+        for xi, eta, wi, wj in gps:
+            Bc,Bi, J = Calc_Q4Incomp.calc_BJ(elem, xi, eta)
+            Kcc += wi * wj * (Bc.T @ D @ Bc) * np.linalg.det(J) * elem.section.thickness
+            Kci += wi * wj * (Bc.T @ D @ Bi) * np.linalg.det(J) * elem.section.thickness
+            Kic += wi * wj * (Bi.T @ D @ Bc) * np.linalg.det(J) * elem.section.thickness
+            Kii += wi * wj * (Bi.T @ D @ Bi) * np.linalg.det(J) * elem.section.thickness
+
+        Ke = Kcc - Kci @ np.linalg.inv(Kii) @ Kic
+        Be  =  _Bc - _Bi @ np.linalg.inv(Kii) @ Kic
+        return Ke ,Be
+
+    def calc_BJ(elem, xi, eta):
+        """
+        Bマトリクス及びヤコビアンを算出。
+
+        Args:
+            elem (Element): 対象のElementクラス
+            xi, eta (float): Bマトリクス算出用の座標
+
+        Returns:
+            B (array 3x8): Bマトリクス
+            J (array 2x2): ヤコビアン
+        """
+        dndxi = np.array([-1+eta,1-eta,1+eta,-1-eta])/4
+        dndeta = np.array([-1+xi,-1-xi,1+xi,1-xi])/4
+
+        x = elem.xy[:,0]
+        y = elem.xy[:,1]
+
+        dxdxi =  np.dot(dndxi,x)
+        dydxi =  np.dot(dndxi,y)
+        dxdeta = np.dot(dndeta,x)
+        dydeta = np.dot(dndeta,y)
+
+        J = np.array([[dxdxi,dydxi],[dxdeta,dydeta]])
+
+        Bc = np.zeros((3,8))
+        invJ = np.linalg.inv(J)
+        for i in range(4):
+            Bj = np.dot(invJ,np.array([dndxi[i],dndeta[i]]).T)
+            Bc[0,2*i] = Bj[0]
+            Bc[1,2*i+1] = Bj[1]
+            Bc[2,2*i] = Bj[1]
+            Bc[2,2*i+1] = Bj[0]
+
+
+        Bi = np.array([
+            [-2*xi*invJ[0,0],-2*eta*invJ[0,1],0,0],
+            [0,0,-2*xi*invJ[1,0],-2*eta*invJ[1,1]],
+            [-2*xi*invJ[1,0],-2*eta*invJ[1,1],-2*xi*invJ[0,0],-2*eta*invJ[0,1]]
+        ])
+
+        return Bc,Bi,J
@@ -0,0 +1,135 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+
+class ElementCache:
+    """
+    要素形状のシグネチャをキーにKeと積分点でのBマトリクスを保持するLRUキャッシュ。
+    シグネチャは(要素タイプ, D, 厚さ, 第1節点からの相対座標をtolで丸めた値)で、平行移動に対して不変。
+
+    Attributes:
+        maxsize (int): 保持する要素形状の最大数
+        tol (float): 相対座標の丸め幅
+        hits (int): キャッシュ(または同一チャンク内の同形状要素)から得た要素数
+        misses (int): 新たに計算した要素形状の数
+    """
+    DEFAULT_MAXSIZE = 4096
+    DEFAULT_TOL = 1e-9
+    #(maxsize, tol) -> プロセス内で共有のキャッシュ(丸め幅の異なるシグネチャが同じキャッシュに混ざらないように設定ごとに分ける)
+    shared = {}
+
+    def __init__(self,maxsize=DEFAULT_MAXSIZE,tol=DEFAULT_TOL):
+        self.maxsize = maxsize
+        self.tol = tol
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        #並列組み立て(SparseAssembly.assemble_by_chunks)のスレッドから同時に呼ばれるため
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def from_setting(fem_model):
+        """
+        analysis_settingsの"element_cache"(true または最大数)が指定されていれば、その最大数と"element_cache_tol"の組ごとに
+        プロセス内で共有のキャッシュを返す。
+
+        Returns:
+            cache (ElementCache or None): キャッシュ(無効の場合はNone)
+        """
+        setting = fem_model.analysis_setting.get("element_cache",False)
+        if setting is False or setting is None:
+            return None
+        maxsize = ElementCache.DEFAULT_MAXSIZE if setting is True else int(setting)
+        tol = fem_model.analysis_setting.get("element_cache_tol",ElementCache.DEFAULT_TOL)
+        cache = ElementCache.shared.get((maxsize,tol))
+        if cache is None:
+            cache = ElementCache.shared[(maxsize,tol)] = ElementCache(maxsize,tol)
+        return cache
+
+    @staticmethod
+    def kernel_for(fem_model,calc_Ke_batch):
+        """
+        calc_Ke_batchと同じ引数で呼べる、キャッシュ経由の要素カーネルを作成。
+
+        Args:
+            calc_Ke_batch (function): Calc_*.calc_Ke_batch
+
+        Returns:
+            kernel (function): キャッシュが無効の場合はcalc_Ke_batchそのもの
+        """
+        cache = ElementCache.from_setting(fem_model)
+        if cache is None:
+            return calc_Ke_batch
+        elem_type = fem_model.analysis_setting["element_type"]
+        return lambda xy,D,thickness,gps,return_B=False: cache.get(elem_type,xy,D,thickness,gps,calc_Ke_batch,return_B)
+
+    def signatures(self,xy,thickness):
+        rel = xy - xy[:,:1,:]
+        q = np.round(rel.reshape(len(xy),-1) / self.tol).astype(np.int64)
+        t = np.ascontiguousarray(thickness,dtype=np.float64).view(np.int64)
+        return np.column_stack([q,t])
+
+    def get(self,elem_type,xy,D,thickness,gps,calc_Ke_batch,return_B=False):
+        """
+        キャッシュからKe(及びB)を取得し、未登録の形状のみcalc_Ke_batchで計算。
+
+        Returns:
+            Ke (array n_elem x ndof_e x ndof_e): 要素剛性マトリクス
+            B (array n_elem x n_gp x 3 x ndof_e): Bマトリクス(return_B=Trueの場合)
+        """
+        xy = np.asarray(xy,dtype=float)
+        thickness = np.broadcast_to(np.asarray(thickness,dtype=float),(len(xy),))
+        sig = self.signatures(xy,thickness)
+        unique_sig, first, inverse = np.unique(sig,axis=0,return_index=True,return_inverse=True)
+        prefix = (elem_type,np.asarray(D,dtype=float).tobytes(),np.asarray(gps,dtype=float).tobytes())
+        keys = [prefix + (row.tobytes(),) for row in unique_sig]
+
+        #辞書の参照・登録のみロックし、未登録の形状の計算はロックの外で行う(別スレッドが同じ形状を重複して計算しても結果は同じ)
+        with self.lock:
+            values = [None] * len(keys)
+            missing = []
+            for u,key in enumerate(keys):
+                entry = self.entries.get(key)
+                if entry is None:
+                    missing.append(u)
+                else:
+                    self.entries.move_to_end(key)
+                    values[u] = entry
+            self.misses += len(missing)
+            self.hits += len(xy) - len(missing)
+        if missing:
+            Ke_new, B_new = calc_Ke_batch(xy[first[missing]],D,thickness[first[missing]],gps,return_B=True)
+            for i,u in enumerate(missing):
+                values[u] = (Ke_new[i],B_new[i])
+            with self.lock:
+                for u in missing:
+                    self.entries[keys[u]] = values[u]
+                    self.entries.move_to_end(keys[u])
+                while len(self.entries) > self.maxsize:
+                    self.entries.popitem(last=False)
+
+        inverse = inverse.ravel()
+        Ke = np.stack([v[0] for v in values])[inverse]
+        if return_B:
+            return Ke, np.stack([v[1] for v in values])[inverse]
+        return Ke
+
+    def stats(self,since=None):
+        """
+        Args:
+            since (dict): 以前のstats()の結果(指定した場合はそれ以降のヒット・ミス数のみ数える。1モデル分の記録用)
+
+        Returns:
+            stats (dict): hits, misses, hit_rate, size, maxsize
+        """
+        hits, misses = self.hits, self.misses
+        if since is not None:
+            hits, misses = hits - since["hits"], misses - since["misses"]
+        total = hits + misses
+        return {"hits":hits,"misses":misses,"hit_rate":hits / total if total else 0.0,
+                "size":len(self.entries),"maxsize":self.maxsize}
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
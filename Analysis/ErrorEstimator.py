@@ -0,0 +1,60 @@
+import numpy as np
+from Analysis.BatchKernel import BatchKernel
+from Analysis.Calc_Q4 import Calc_Q4
+from Analysis.CalcStress import CalcStress
+
+class ErrorEstimator:
+    """
+    Zienkiewicz-Zhu型の誤差評価。2x2の積分点応力を双一次関数で隅節点へ外挿して節点ごとに平均した応力(回復応力)σ*を
+    形状関数で積分点へ補間し、積分点応力σとの差のエネルギーノルムを要素ごとの誤差とする。4節点要素(非適合要素を含む)のみ対応。
+    (Solver.nodal_stressの外挿は4点に2次多項式を最小ノルムで当てはめるため、回復応力には使わない)
+
+        ||e||_e^2 = ∫ (σ* - σ)^T D^-1 (σ* - σ) dV
+        ||u||^2   = Σ_e ∫ σ^T D^-1 σ dV
+        相対誤差 η = sqrt(Σ||e||_e^2 / (||u||^2 + Σ||e||_e^2))
+    """
+    ELEMENT_TYPES = ("Quad_4node","Quad_4node_Incomp")
+
+    @staticmethod
+    def calc_N(gps):
+        """
+        Returns:
+            N (array n_gp x 4): 積分点での隅節点の形状関数
+        """
+        xi, eta, _ = BatchKernel.gauss_table(gps)
+        xi, eta = xi[:,None], eta[:,None]
+        return np.hstack([(1 - xi) * (1 - eta),(1 + xi) * (1 - eta),(1 + xi) * (1 + eta),(1 - xi) * (1 + eta)]) / 4
+
+    @staticmethod
+    def estimate(solver):
+        """
+        最初の荷重ケースの要素ごとの誤差を算出。
+
+        Args:
+            solver (Solver): 解析済みのSolver
+
+        Returns:
+            element_error (array n_elem): 要素ごとの誤差のエネルギーノルム ||e||_e
+            energy_norm (float): 解のエネルギーノルム ||u||
+            rel_error (float): 全体の相対誤差 η
+        """
+        if solver.fem_model.analysis_setting["element_type"] not in ErrorEstimator.ELEMENT_TYPES:
+            raise ValueError("Error estimation supports {} only".format(", ".join(ErrorEstimator.ELEMENT_TYPES)))
+        mesh = solver.mesh
+        corner = mesh.get_connectivity()[:,:4]
+        gps = solver.gps
+        _, _, w = BatchKernel.gauss_table(gps)
+        _, _, detJ = BatchKernel.calc_J(mesh.coords[corner],Calc_Q4.calc_dN(gps))
+        dV = w[None,:] * detJ * mesh.get_element_thickness()[:,None]
+
+        stress = solver.gp_stress
+        N = ErrorEstimator.calc_N(gps)
+        nodal = CalcStress.average_nodal(corner,np.einsum("ng,egi->eni",np.linalg.inv(N),stress),len(mesh.node_ids))
+        recovered = np.einsum("gn,eni->egi",N,nodal[corner])
+        C = np.linalg.inv(solver.D)[solver.element_group]
+        diff = recovered - stress
+        error_sq = np.einsum("eg,egi,eij,egj->e",dV,diff,C,diff)
+        energy_sq = float(np.einsum("eg,egi,eij,egj->",dV,stress,C,stress))
+        total_sq = float(error_sq.sum())
+        rel_error = np.sqrt(total_sq / (energy_sq + total_sq)) if energy_sq + total_sq > 0 else 0.0
+        return np.sqrt(error_sq), np.sqrt(energy_sq), float(rel_error)
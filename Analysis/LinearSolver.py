@@ -0,0 +1,418 @@
+import warnings
+import numpy as np
+import scipy.linalg as la
+import scipy.sparse as sp
+import scipy.sparse.linalg as spla
+
+try:
+    from sksparse.cholmod import cholesky as cholmod_cholesky
+except ImportError:
+    cholmod_cholesky = None
+
+def sparse_bytes(A):
+    """
+    Returns:
+        nbytes (int): 疎行列(csr/csc)または配列が保持する配列のバイト数
+    """
+    if sp.issparse(A):
+        return A.data.nbytes + A.indices.nbytes + A.indptr.nbytes
+    return np.asarray(A).nbytes
+
+class DirectSolver:
+    """
+    直接法ソルバー。Kを一度だけ分解して保持し、右辺を変えた求解は前進後退代入のみで行う。
+
+    Attributes:
+        n (int): 自由度数
+        dtype: 分解の精度(np.float64 または np.float32)
+        method (str): 分解方法("cholmod", "splu", "dense_lu")
+        factor: 分解結果
+        order (array n or None): refactorで再利用するspluの順序付け(最初の分解ではNone)
+    """
+    def __init__(self,K,dtype=np.float64):
+        """
+        Args:
+            dtype: 分解の精度(np.float32の場合はKを単精度に変換して分解し、cholmodは使わない)
+        """
+        self.n = K.shape[0]
+        self.dtype = np.dtype(dtype)
+        self.order = None
+        K = K.astype(self.dtype,copy=False)
+        if not sp.issparse(K):
+            self.method = "dense_lu"
+            self.factor = la.lu_factor(K)
+        elif cholmod_cholesky is not None and self.dtype == np.float64:
+            #scikit-sparseがある場合は近似最小次数順序付きのCholesky分解
+            self.method = "cholmod"
+            self.factor = cholmod_cholesky(K.tocsc())
+        else:
+            #対称行列向けの順序付け(A^T+Aの最小次数)でLU分解
+            self.method = "splu"
+            self.factor = spla.splu(K.tocsc(),permc_spec="MMD_AT_PLUS_A",
+                                    diag_pivot_thresh=0.0,options={"SymmetricMode":True})
+
+    def refactor(self,K):
+        """
+        非ゼロ構造が同じ(値のみ異なる)Kを、最初の分解の順序付けを再利用して分解し直す。
+        cholmodは記号分解を再利用し、spluは最初の分解の列の置換でKを対称に並べ替えて順序付けなしで分解する。
+
+        Args:
+            K (csr_matrix or array): 新しい係数行列
+        """
+        K = K.astype(self.dtype,copy=False)
+        if self.method == "dense_lu":
+            self.factor = la.lu_factor(K)
+        elif self.method == "cholmod":
+            self.factor.cholesky_inplace(K.tocsc())
+        else:
+            if self.order is None:
+                #対称モード(対角ピボット)では P K P^T = LU で、Pはperm_cの逆置換
+                self.order = np.argsort(self.factor.perm_c)
+            K = K.tocsr()[self.order][:,self.order]
+            self.factor = spla.splu(K.tocsc(),permc_spec="NATURAL",
+                                    diag_pivot_thresh=0.0,options={"SymmetricMode":True})
+
+    def factor_bytes(self):
+        """
+        Returns:
+            nbytes (int): 分解結果(L, Uの数値と行番号、置換)のバイト数(cholmodの場合はNone)
+        """
+        if self.method == "dense_lu":
+            return self.factor[0].nbytes + self.factor[1].nbytes
+        if self.method == "splu":
+            return self.factor.nnz * (self.dtype.itemsize + 4) + 4 * 4 * self.n + (0 if self.order is None else self.order.nbytes)
+        return None
+
+    def solve(self,f,x0=None):
+        """
+        分解済みの係数で求解。
+
+        Args:
+            f (array n or n x n_rhs): 右辺ベクトル(複数列可、分解の精度に変換する)
+            x0: 反復法ソルバーとの互換用(使用しない)
+
+        Returns:
+            d (array n or n x n_rhs): 解(分解の精度)
+        """
+        f = np.asarray(f,dtype=self.dtype)
+        if self.method == "dense_lu":
+            return la.lu_solve(self.factor,f)
+        if self.method == "cholmod":
+            return self.factor(f)
+        if self.order is None:
+            return self.factor.solve(f)
+        d = np.empty_like(f)
+        d[self.order] = self.factor.solve(f[self.order])
+        return d
+
+class IterativeSolver:
+    """
+    前処理付き共役勾配法(PCG)ソルバー。
+
+    Attributes:
+        K (csr_matrix): 境界条件処理済みの全体剛性マトリクス
+        tol (float): 収束判定値(相対残差 ||r|| / ||f||)
+        max_iter (int): 最大反復回数
+        dof_node (array n): 各自由度の節点(block_jacobiで2x2ブロックをまとめるため。省略時は2自由度ずつ)
+        method (str): "pcg"
+        preconditioner (str): 前処理("jacobi", "block_jacobi", "ichol")
+        dtype: 前処理の精度(icholの分解をnp.float32で保持する場合。残差・解の更新は常にnp.float64)
+        memory_bytes (dict): 実際に保持する配列のバイト数
+            {"matrix": K, "preconditioner": 前処理, "work": 1右辺あたりのPCGの作業ベクトル}
+        iterations (int or list): 直近の求解の反復回数(複数右辺の場合は列ごと)
+        residuals (list): 直近の求解の相対残差の履歴(複数右辺の場合は列ごと)
+    """
+    method = "pcg"
+
+    def __init__(self,K,tol=1e-6,preconditioner="jacobi",max_iter=None,dof_node=None,dtype=np.float64):
+        self.K = K
+        self.n = K.shape[0]
+        self.dof_node = np.arange(self.n) // 2 if dof_node is None else np.asarray(dof_node)
+        self.tol = tol
+        self.max_iter = max_iter if max_iter is not None else 10 * self.n
+        self.preconditioner = preconditioner
+        self.dtype = np.dtype(dtype)
+        self.preconditioner_bytes = 0
+        self.apply_M = self.setup_preconditioner(preconditioner)
+        #x, r, z, p, Kpの5本(倍精度)
+        self.memory_bytes = {"matrix":sparse_bytes(K),"preconditioner":self.preconditioner_bytes,"work":5 * 8 * self.n}
+        self.iterations = None
+        self.residuals = None
+
+    def refactor(self,K):
+        """
+        非ゼロ構造が同じ(値のみ異なる)Kに置き換えて前処理を作り直す(DirectSolver.refactorとの互換用)。
+        """
+        self.K = K
+        self.apply_M = self.setup_preconditioner(self.preconditioner)
+        self.memory_bytes.update(matrix=sparse_bytes(K),preconditioner=self.preconditioner_bytes)
+
+    def setup_preconditioner(self,name):
+        """
+        前処理 z = M^-1 r を行う関数を作成。
+
+        Args:
+            name (str): "jacobi"(対角), "block_jacobi"(節点ごとの2x2ブロック), "ichol"(不完全分解)
+
+        Returns:
+            apply_M (function): 前処理関数
+        """
+        K = self.K
+        if name == "jacobi":
+            inv_diag = 1.0 / K.diagonal()
+            self.preconditioner_bytes = inv_diag.nbytes
+            return lambda r: inv_diag * r
+        elif name == "block_jacobi":
+            #節点ごとの2x2ブロック[[a,b],[b,c]]の逆行列を一括で算出(1自由度のみ自由な節点は対角のみ)
+            diag = K.diagonal()
+            first = np.flatnonzero(self.dof_node[:-1] == self.dof_node[1:])
+            second = first + 1
+            a, c, b = diag[first], diag[second], K.diagonal(1)[first]
+            det = a * c - b * b
+            inv_a, inv_b, inv_c = c / det, -b / det, a / det
+            inv_diag = 1.0 / diag
+            self.preconditioner_bytes = sum(a.nbytes for a in (first,second,inv_a,inv_b,inv_c,inv_diag))
+            def apply_M(r):
+                z = inv_diag * r
+                z[first] = inv_a * r[first] + inv_b * r[second]
+                z[second] = inv_b * r[first] + inv_c * r[second]
+                return z
+            return apply_M
+        elif name == "ichol":
+            #SciPyには不完全Cholesky分解が無いため、対称モード・ピボットなしの不完全LU分解 P_r K P_c ≈ LU から
+            #上三角のUを取り出し、M = U^T |diag(U)|^-1 U として対称正定値の前処理にする
+            n = self.n
+            ilu = spla.spilu(sp.csc_matrix(K,dtype=self.dtype),drop_tol=1e-4,fill_factor=10,permc_spec="MMD_AT_PLUS_A",
+                             diag_pivot_thresh=0.0,options={"SymmetricMode":True})
+            Pr = sp.csr_matrix((np.ones(n),(ilu.perm_r,np.arange(n))),shape=(n,n))
+            Pc = sp.csr_matrix((np.ones(n),(np.arange(n),ilu.perm_c)),shape=(n,n))
+            U = ilu.U.tocsr()
+            Ut = U.T.tocsr()
+            abs_diag = np.abs(U.diagonal())
+            self.preconditioner_bytes = sparse_bytes(U) + sparse_bytes(Ut) + sparse_bytes(Pr) + sparse_bytes(Pc) + abs_diag.nbytes
+            def apply_M(r):
+                y = spla.spsolve_triangular(Ut,Pr @ r,lower=True)
+                return Pc @ spla.spsolve_triangular(U,abs_diag * y,lower=False)
+            return apply_M
+        raise ValueError("Unknown preconditioner: {}".format(name))
+
+    def solve(self,f,x0=None):
+        """
+        PCGで求解。
+
+        Args:
+            f (array n or n x n_rhs): 右辺ベクトル(複数列の場合は列ごとに求解)
+            x0 (array n or n x n_rhs): 初期値(省略時は0)
+
+        Returns:
+            d (array n or n x n_rhs): 解
+        """
+        f = np.asarray(f,dtype=float)
+        if f.ndim == 1:
+            d, self.iterations, self.residuals = self.pcg(f,x0)
+            return d
+        d = np.zeros_like(f)
+        iterations, residuals = [], []
+        for j in range(f.shape[1]):
+            d[:,j], it, res = self.pcg(f[:,j],None if x0 is None else x0[:,j])
+            iterations.append(it)
+            residuals.append(res)
+        self.iterations, self.residuals = iterations, residuals
+        return d
+
+    def pcg(self,f,x0):
+        K = self.K
+        norm_f = np.linalg.norm(f)
+        x = np.zeros(self.n) if x0 is None else np.array(x0,dtype=float)
+        if norm_f == 0.0:
+            return np.zeros(self.n), 0, [0.0]
+        r = f - K @ x
+        residuals = [np.linalg.norm(r) / norm_f]
+        if residuals[-1] <= self.tol:
+            return x, 0, residuals
+        z = self.apply_M(r)
+        p = z.copy()
+        rz = r @ z
+        for it in range(1,self.max_iter + 1):
+            Kp = K @ p
+            alpha = rz / (p @ Kp)
+            x += alpha * p
+            r -= alpha * Kp
+            residuals.append(np.linalg.norm(r) / norm_f)
+            if residuals[-1] <= self.tol:
+                return x, it, residuals
+            z = self.apply_M(r)
+            rz_new = r @ z
+            p = z + (rz_new / rz) * p
+            rz = rz_new
+        warnings.warn("PCG did not converge in {} iterations (residual {:.3e})".format(self.max_iter,residuals[-1]))
+        return x, self.max_iter, residuals
+
+class MixedPrecisionSolver(IterativeSolver):
+    """
+    混合精度ソルバー。K_ffを単精度(float32)に変換して一度だけ分解し、倍精度(float64)のK_ffで計算した残差に対して
+    単精度の分解を前処理とするPCGで反復改良する(相対残差 ||f - K d|| / ||f|| がtol以下になるまで)。
+    単精度になるのは分解結果(フィルインを含む)のみで、残差の計算に使う倍精度のK_ffは保持したままである
+    (K_ffを単精度に丸めると条件数の大きいモデルでは解そのものが変わるため)。分解時には単精度のK_ffの一時的な複製も作成する。
+    K_ffの条件数が大きく単精度の分解の誤差が大きい場合でも、単純な反復改良(d += K32^-1 r)と異なり発散しない。
+
+    Attributes:
+        factor (DirectSolver): 単精度の分解
+        memory_bytes (dict): 実際に保持する配列のバイト数
+            {"matrix": 倍精度のK_ff, "preconditioner": 単精度の分解結果, "work": 1右辺あたりのPCGの作業ベクトル}
+        iterations (int or list): 直近の求解の反復改良の回数(複数右辺の場合は列ごと)
+    """
+    method = "mixed"
+
+    def __init__(self,K,tol=1e-6,max_iter=None,dof_node=None):
+        self.factor = None
+        super().__init__(K,tol,"float32_lu",max_iter,dof_node,np.float32)
+
+    def setup_preconditioner(self,name):
+        #refactorでは単精度の分解の順序付けを再利用する
+        if self.factor is None:
+            self.factor = DirectSolver(self.K,self.dtype)
+        else:
+            self.factor.refactor(self.K)
+        self.preconditioner_bytes = self.factor.factor_bytes()
+        return lambda r: self.factor.solve(r).astype(float)
+
+class ConstrainedSystem:
+    """
+    変位拘束のある剛性方程式を自由自由度(f)と拘束自由度(c)に分割して解くクラス。
+    K_ff d_f = f_f - K_fc u_c のみを分解して解き、反力は R = K_c d - f_c で求める。元のKは変更しない。
+
+    従属自由度(ties、ハンギングノードなど u_s = Σ w u_m)がある場合は、全自由度を d = T d_f + G u_c と表し
+    K_ff = T^T K T, K_fc = T^T K G, K_c = G^T K として同様に解く(従属自由度の主自由度は従属自由度であってはならない)。
+
+    Attributes:
+        n (int): 全自由度数
+        free, constrained (array): 自由自由度・拘束自由度の番号
+        u_c (array n_constrained): 拘束自由度の強制変位
+        K_ff, K_fc, K_c (csr_matrix or array): Kの部分行列(K_cは拘束自由度の行)
+        T, G (csr_matrix): 従属自由度がある場合の d = T d_f + G u_c の変換行列(無い場合はNone)
+        solver (DirectSolver or IterativeSolver): K_ffのソルバー
+    """
+    def __init__(self,K,bc_dist_dict,create_solver,ties=None):
+        """
+        Args:
+            ties ((array n_tie, array n_tie x k, array n_tie x k)): 従属自由度・主自由度・重み(拘束自由度と重なる従属自由度は拘束を優先)
+        """
+        self.n = K.shape[0]
+        self.constrained = np.array(sorted(bc_dist_dict.keys()),dtype=np.int64)
+        self.u_c = np.array([bc_dist_dict[i] for i in self.constrained.tolist()],dtype=float)
+        is_free = np.ones(self.n,dtype=bool)
+        is_free[self.constrained] = False
+        self.T = self.G = None
+        if ties is not None and len(ties[0]):
+            self.build_tied(sp.csr_matrix(K),is_free,*ties)
+        else:
+            self.build(K,is_free)
+        self.solver = create_solver(self.K_ff,self.free // 2)
+
+    def build(self,K,is_free):
+        self.free = np.flatnonzero(is_free)
+        if sp.issparse(K):
+            K = K.tocsr()
+            K_f = K[self.free]
+            self.K_ff = K_f[:,self.free]
+            self.K_fc = K_f[:,self.constrained]
+        else:
+            self.K_ff = K[np.ix_(self.free,self.free)]
+            self.K_fc = K[np.ix_(self.free,self.constrained)]
+        self.K_c = K[self.constrained]
+
+    def build_tied(self,K,is_free,slave,master,weight):
+        """
+        従属自由度を含む変換行列T, Gと部分行列を作成。
+        """
+        slave, master, weight = np.asarray(slave), np.asarray(master), np.asarray(weight,dtype=float)
+        keep = is_free[slave]
+        slave, master, weight = slave[keep], master[keep], weight[keep]
+        is_free[slave] = False
+        self.free = np.flatnonzero(is_free)
+        col_free = np.full(self.n,-1,dtype=np.int64)
+        col_free[self.free] = np.arange(len(self.free))
+        col_c = np.full(self.n,-1,dtype=np.int64)
+        col_c[self.constrained] = np.arange(len(self.constrained))
+        if np.any((col_free[master] < 0) & (col_c[master] < 0)):
+            raise ValueError("A master DOF of a tie must not be tied itself")
+        slave_rep = np.repeat(slave,master.shape[1])
+        master, weight = master.ravel(), weight.ravel()
+        to_free, to_c = col_free[master] >= 0, col_c[master] >= 0
+        self.T = sp.csr_matrix((np.concatenate([np.ones(len(self.free)),weight[to_free]]),
+                                (np.concatenate([self.free,slave_rep[to_free]]),
+                                 np.concatenate([np.arange(len(self.free)),col_free[master[to_free]]]))),
+                               shape=(self.n,len(self.free)))
+        self.G = sp.csr_matrix((np.concatenate([np.ones(len(self.constrained)),weight[to_c]]),
+                                (np.concatenate([self.constrained,slave_rep[to_c]]),
+                                 np.concatenate([np.arange(len(self.constrained)),col_c[master[to_c]]]))),
+                               shape=(self.n,len(self.constrained)))
+        Tt = self.T.T.tocsr()
+        self.K_ff = (Tt @ K @ self.T).tocsr()
+        self.K_fc = (Tt @ K @ self.G).tocsr()
+        self.K_c = (self.G.T @ K).tocsr()
+
+    def solve(self,f,u_c=None,x0=None):
+        """
+        Args:
+            f (array n or n x n_rhs): 全体荷重ベクトル
+            u_c (array n_constrained): 強制変位(省略時は境界条件の値)
+            x0 (array n or n x n_rhs): 反復法ソルバーの初期値(全体変位ベクトル、直接法では使用しない)
+
+        Returns:
+            d (array n or n x n_rhs): 全体変位ベクトル
+        """
+        f = np.asarray(f,dtype=float)
+        u_c = self.u_c if u_c is None else np.asarray(u_c,dtype=float)
+        Ku_c = self.K_fc @ u_c if f.ndim == 1 else (self.K_fc @ u_c)[:,None]
+        x0 = None if x0 is None else np.asarray(x0,dtype=float)[self.free]
+        if self.T is not None:
+            d_f = self.solver.solve(self.T.T @ f - Ku_c,x0)
+            return self.T @ d_f + (self.G @ u_c if f.ndim == 1 else (self.G @ u_c)[:,None])
+        d = np.empty_like(f)
+        d[self.free] = self.solver.solve(f[self.free] - Ku_c,x0)
+        d[self.constrained] = u_c if f.ndim == 1 else u_c[:,None]
+        return d
+
+    def reactions(self,d,f):
+        """
+        Args:
+            d (array n or n x n_rhs): 全体変位ベクトル
+            f (array n or n x n_rhs): 全体荷重ベクトル
+
+        Returns:
+            R (array n or n x n_rhs): 反力(自由自由度では0)
+        """
+        R = np.zeros_like(np.asarray(d,dtype=float))
+        f_c = np.asarray(f)[self.constrained] if self.G is None else self.G.T @ np.asarray(f)
+        R[self.constrained] = self.K_c @ d - f_c
+        return R
+
+class LinearSolver:
+    @staticmethod
+    def create(fem_model,K,dof_node=None):
+        """
+        analysis_settingsの"solver"に応じた連立方程式ソルバーを作成。
+
+        Args:
+            K (csr_matrix or array): 境界条件処理済みの全体剛性マトリクス
+            dof_node (array n): 各自由度の節点(block_jacobi用)
+
+        Returns:
+            solver (DirectSolver, IterativeSolver or MixedPrecisionSolver): ソルバー
+                ("precision"が"mixed"の場合、直接法はMixedPrecisionSolver、反復法はiCholの前処理を単精度で保持)
+        """
+        setting = fem_model.analysis_setting
+        name = setting.get("solver","direct")
+        precision = setting.get("precision","double")
+        if precision not in ("double","mixed"):
+            raise ValueError("Unknown precision: {}".format(precision))
+        if name == "direct":
+            if precision == "mixed":
+                return MixedPrecisionSolver(K,setting.get("tolerance",1e-6),setting.get("max_iterations"),dof_node)
+            return DirectSolver(K)
+        elif name == "iterative":
+            return IterativeSolver(K,setting.get("tolerance",1e-6),setting.get("preconditioner","jacobi"),
+                                   setting.get("max_iterations"),dof_node,np.float32 if precision == "mixed" else np.float64)
+        raise ValueError("Unknown solver: {}".format(name))
@@ -0,0 +1,434 @@
+import argparse
+import os
+import shutil
+import tempfile
+import warnings
+import numpy as np
+import scipy.sparse as sp
+from Model.BinaryModel import BinaryModel
+from Model.FEMModel import FEMModel
+from Model.Material import Material
+from Model.Section import Section
+from Analysis.Calc_Q4 import Calc_Q4
+from Analysis.Calc_Q4Incomp import Calc_Q4Incomp
+from Analysis.CalcStiffness import CalcStifness
+from Analysis.BatchKernel import BatchKernel
+from Analysis.Profiler import Profiler
+
+class OutOfCoreMatrix:
+    """
+    ディスク上の全体剛性マトリクス(CSR)。indices・dataはメモリマップしたファイルとし、
+    行ポインタ(自由度数+1)と節点ごとの2x2ブロックの対角のみメモリに保持する。
+    行列ベクトル積は行の帯(bands)ごとにファイルを読みながら行う。
+
+    Attributes:
+        n (int): 自由度数
+        nnz (int): 非ゼロ数
+        indptr (array n+1): 行ポインタ
+        indices, data (memmap nnz): 列インデックス・値
+        bands ([(int, int)]): 行列ベクトル積・統合で一度に扱う行の範囲
+        diagonal (array n): 対角成分
+        off_diagonal (array n/2): 節点ごとの2x2ブロックの非対角成分 K[2i, 2i+1]
+    """
+    def __init__(self,directory,n,indptr,bands,diagonal,off_diagonal,index_dtype):
+        self.n = n
+        self.indptr = indptr
+        self.nnz = int(indptr[-1])
+        self.bands = bands
+        self.diagonal = diagonal
+        self.off_diagonal = off_diagonal
+        self.indices = np.memmap(os.path.join(directory,"indices.bin"),dtype=index_dtype,mode="r",shape=(self.nnz,))
+        self.data = np.memmap(os.path.join(directory,"data.bin"),dtype=np.float64,mode="r",shape=(self.nnz,))
+
+    @staticmethod
+    def split_rows(row_counts,max_entries):
+        """
+        行ごとの成分数の累積がmax_entriesを超えないように行を帯に分ける(1行でも超える場合はその1行を1つの帯とする)。
+
+        Returns:
+            bands ([(int, int)]): 行の範囲[lo, hi)
+        """
+        cum = np.concatenate([[0],np.cumsum(row_counts)])
+        n = len(row_counts)
+        bands, lo = [], 0
+        while lo < n:
+            hi = int(np.searchsorted(cum,cum[lo] + max_entries,side="right")) - 1
+            hi = min(max(hi,lo + 1),n)
+            bands.append((lo,hi))
+            lo = hi
+        return bands
+
+    @classmethod
+    def merge(cls,directory,n,chunks,row_counts,max_entries):
+        """
+        行・列のキー(row * n + col)で整列済みのCOOチャンクファイルを行の帯ごとに統合し、CSRのファイルを作成。
+        帯ごとに各チャンクから該当範囲を二分探索で読み出し、整列して重複を足し合わせて書き足す。
+
+        Args:
+            chunks ([(str, str)]): チャンクごとのキー・値の.npyファイル
+            row_counts (array n): 行ごとの成分数の上限(全チャンクの重複を含む個数)
+            max_entries (int): 一度に扱う成分数の上限
+
+        Returns:
+            matrix (OutOfCoreMatrix): ディスク上のCSR
+        """
+        bands = OutOfCoreMatrix.split_rows(row_counts,max_entries)
+        index_dtype = np.int32 if n < np.iinfo(np.int32).max else np.int64
+        indptr = np.zeros(n + 1,dtype=np.int64)
+        diagonal = np.zeros(n)
+        off_diagonal = np.zeros(n // 2)
+        sources = [(np.load(keys_file,mmap_mode="r"),np.load(values_file,mmap_mode="r")) for keys_file,values_file in chunks]
+        with open(os.path.join(directory,"indices.bin"),"wb") as f_indices, open(os.path.join(directory,"data.bin"),"wb") as f_data:
+            for lo,hi in bands:
+                keys, values = [], []
+                for chunk_keys,chunk_values in sources:
+                    a, b = np.searchsorted(chunk_keys,[lo * n,hi * n])
+                    keys.append(np.asarray(chunk_keys[a:b]))
+                    values.append(np.asarray(chunk_values[a:b]))
+                keys, values = np.concatenate(keys), np.concatenate(values)
+                order = np.argsort(keys,kind="stable")
+                keys, values = keys[order], values[order]
+                starts = np.flatnonzero(np.concatenate([[True],keys[1:] != keys[:-1]])) if len(keys) else np.zeros(0,dtype=np.int64)
+                keys = keys[starts]
+                values = np.add.reduceat(values,starts) if len(keys) else values
+                rows, cols = keys // n, keys % n
+                indptr[lo + 1:hi + 1] = np.bincount(rows - lo,minlength=hi - lo)
+                on_diagonal = rows == cols
+                diagonal[rows[on_diagonal]] = values[on_diagonal]
+                on_block = (rows % 2 == 0) & (cols == rows + 1)
+                off_diagonal[rows[on_block] // 2] = values[on_block]
+                cols.astype(index_dtype).tofile(f_indices)
+                values.tofile(f_data)
+        del sources
+        np.cumsum(indptr,out=indptr)
+        np.save(os.path.join(directory,"indptr.npy"),indptr)
+        return cls(directory,n,indptr,bands,diagonal,off_diagonal,index_dtype)
+
+    def matvec(self,X):
+        """
+        K @ X を行の帯ごとにファイルを読みながら算出。
+
+        Args:
+            X (array n or n x n_rhs): ベクトル
+
+        Returns:
+            Y (array n or n x n_rhs): K @ X
+        """
+        Y = np.empty_like(X)
+        for lo,hi in self.bands:
+            a, b = int(self.indptr[lo]), int(self.indptr[hi])
+            block = sp.csr_matrix((self.data[a:b],self.indices[a:b],self.indptr[lo:hi + 1] - a),shape=(hi - lo,self.n))
+            Y[lo:hi] = block @ X
+        return Y
+
+class OutOfCoreSolver:
+    """
+    全体剛性マトリクスをメモリに載せずに解析するクラス(メッシュがメモリに収まらない大規模モデル用)。4節点要素(非適合要素を含む)のみ対応。
+
+    1. バイナリ形式(BinaryModel)のメッシュをメモリマップし、要素をブロックごとに読んでKeを算出、
+       (行, 列)で整列・重複を足し合わせたCOOチャンクとして作業ディレクトリに書き出す
+    2. チャンクを行の帯ごとに統合してメモリマップのCSR(OutOfCoreMatrix)を作成
+    3. 行列ベクトル積がCSRのファイルを順に読む、節点ごとの2x2ブロック対角を前処理とするPCGで全荷重ケースを同時に求解
+
+    メモリ使用量の上限(analysis_settingsの"memory_budget_mb"、既定256MB)から要素ブロックの大きさと行の帯の大きさを決める。
+    ただし自由度数に比例する配列(荷重・変位・反力・PCGの作業ベクトル・ブロック対角の逆行列・行ポインタなど、vector_bytes)は
+    メモリに保持するため、その分を上限から差し引き、それだけで上限を超える場合はValueErrorとする。座標・境界条件はメモリマップのまま読む。
+    節点の並べ替え(Renumbering)は全要素の接続を必要とするため行わない(内部自由度は節点番号順 2*node_id+c)。
+
+    Attributes:
+        n_dof (int): 自由度数
+        matrix (OutOfCoreMatrix): ディスク上の全体剛性マトリクス
+        F (array 2node_num x n_case): 荷重ケース・荷重組合せごとの荷重ベクトル
+        load_case_names ([str]): ケース名
+        d_cases (array 2node_num x n_case): 全体変位ベクトル(節点番号順)
+        reaction_cases (array 2node_num x n_case): 反力(拘束のない自由度では0)
+        strain_energy (array n_case): ひずみエネルギー
+        iterations ([int]): ケースごとのPCGの反復回数
+        memory_budget (int): メモリ使用量の上限(byte)
+        profiler (Profiler): 段階ごとの時間・問題規模
+    """
+    ELEMENT_TYPES = {"Quad_4node":Calc_Q4.calc_Ke_batch,"Quad_4node_Incomp":Calc_Q4Incomp.calc_Ke_batch}
+    MEMORY_BUDGET_MB = 256
+    #Keの1成分あたりの作業用メモリの目安(Keの算出の中間配列・Ke・キー・整列の添字とそのコピー、統合時のキー・値と整列の作業配列)
+    #tracemallocで計測した要素ブロックの組み立てのピークは1成分あたり約115byte
+    ENTRY_BYTES = 128
+    #荷重ケースごとにメモリに保持する倍精度の自由度数のベクトルの本数
+    #(F, d, 反力, K d, PCGのx, r, z, p, Kp, 強制変位d_cと更新時の一時配列)
+    CASE_VECTORS = 11
+    #ケースによらず1自由度あたりに保持するバイト数(行ポインタ・行ごとの成分数・対角、ブロック対角の逆行列と非対角、拘束のマスク)
+    DOF_BYTES = 8 + 8 + 8 + 16 + 4 + 1
+
+    def __init__(self,path,work_dir=None,memory_budget_mb=None,profiler=None):
+        """
+        Args:
+            path (str): バイナリ形式のモデル(.femディレクトリ)
+            work_dir (str): チャンク・CSRのファイルの作業ディレクトリ(省略時は一時ディレクトリを作成し、close()で削除)
+            memory_budget_mb (float): メモリ使用量の上限(MB、省略時はanalysis_settingsの"memory_budget_mb")
+        """
+        self.header, self.arrays = BinaryModel.read(path,mmap_mode="r")
+        self.analysis_setting = self.header["analysis_settings"][0]
+        self.profiler = profiler or Profiler.from_setting(self.analysis_setting)
+        element_type = self.analysis_setting["element_type"]
+        if element_type not in OutOfCoreSolver.ELEMENT_TYPES:
+            raise ValueError("Out-of-core analysis supports {} only".format(", ".join(OutOfCoreSolver.ELEMENT_TYPES)))
+        self.calc_Ke_batch = OutOfCoreSolver.ELEMENT_TYPES[element_type]
+        budget = memory_budget_mb or self.analysis_setting.get("memory_budget_mb",OutOfCoreSolver.MEMORY_BUDGET_MB)
+        self.memory_budget = int(budget * 2**20)
+        self.own_work_dir = work_dir is None
+        self.work_dir = tempfile.mkdtemp(prefix="fem_ooc_") if work_dir is None else work_dir
+        os.makedirs(self.work_dir,exist_ok=True)
+        try:
+            self.run()
+        except BaseException:
+            #入力の誤りなどで中断した場合も作成した作業ディレクトリを残さない
+            if self.own_work_dir:
+                shutil.rmtree(self.work_dir,ignore_errors=True)
+            raise
+
+    def run(self):
+        """
+        読み込み・組み立て・求解・反力とひずみエネルギーの算出を行う。
+        """
+        self.read_nodes()
+        n_cases = len(self.header["load_case_names"]) + len(self.header["load_combinations"])
+        vector_bytes = OutOfCoreSolver.vector_bytes(self.n_dof,n_cases)
+        if vector_bytes > self.memory_budget:
+            raise ValueError("Vectors of {} DOFs x {} cases need {:.1f} MB, more than memory_budget_mb {:.1f}".format(
+                self.n_dof,n_cases,vector_bytes / 2**20,self.memory_budget / 2**20))
+        #要素ブロック・行の帯には自由度数のベクトルを除いた残りを使う
+        self.max_entries = max((self.memory_budget - vector_bytes) // OutOfCoreSolver.ENTRY_BYTES,64)
+        self.read_elements()
+        with self.profiler.stage("loads",n_dof=self.n_dof) as counters:
+            self.F, self.load_case_names = self.read_load_cases()
+            counters.update(n_constrained=len(self.constrained),n_cases=len(self.load_case_names),vector_bytes=vector_bytes)
+        self.matrix = self.assemble()
+        with self.profiler.stage("solve",n_dof=self.n_dof) as counters:
+            d = self.solve(self.F)
+            counters.update(method="pcg",n_rhs=self.F.shape[1],iterations=self.iterations)
+        with self.profiler.stage("strain_energy"):
+            Kd = self.matrix.matvec(d)
+            self.d_cases = d
+            self.reaction_cases = np.zeros_like(d)
+            self.reaction_cases[self.constrained] = Kd[self.constrained] - self.F[self.constrained]
+            self.strain_energy = 1/2 * np.sum(d * Kd,axis=0)
+
+    @staticmethod
+    def vector_bytes(n_dof,n_cases):
+        """
+        Returns:
+            nbytes (int): 自由度数に比例してメモリに保持する配列のバイト数の目安
+        """
+        return n_dof * (8 * OutOfCoreSolver.CASE_VECTORS * n_cases + OutOfCoreSolver.DOF_BYTES)
+
+    def read_nodes(self):
+        """
+        節点の配列を読み込み(節点番号が0..n-1の順でない場合のみ並べ替えてメモリに読み込む)。
+        """
+        arrays = self.arrays
+        node_ids = np.asarray(arrays["node_ids"])
+        self.coords, bc_mask, bc_value = arrays["coords"], np.asarray(arrays["bc_mask"]), np.asarray(arrays["bc_value"])
+        if not np.array_equal(node_ids,np.arange(len(node_ids))):
+            order = np.argsort(node_ids)
+            if not np.array_equal(node_ids[order],np.arange(len(node_ids))):
+                raise ValueError("Node ids must be 0..{}".format(len(node_ids) - 1))
+            self.coords, bc_mask, bc_value = np.asarray(self.coords)[order], bc_mask[order], bc_value[order]
+        self.n_dof = 2 * len(node_ids)
+        node, comp = np.nonzero(bc_mask)
+        self.constrained = 2 * node + comp
+        self.u_c = bc_value[node,comp].astype(float)
+
+    def read_elements(self):
+        """
+        材料・断面を読み込み、(材料, 断面の種類)の組ごとのDマトリクスを算出。
+        """
+        self.material_list = [Material(m["id"],m["name"],m["E"],m["nu"]) for m in self.header["materials"]]
+        self.section_list = [Section(s["id"],s["thickness"],s.get("type","plane_stress")) for s in self.header["sections"]]
+        self.section_thickness = np.array([s.thickness for s in self.section_list],dtype=float)
+        self.section_type = np.array([Section.TYPES.index(s.type) for s in self.section_list],dtype=np.int64)
+        #グループ = 材料のインデックス * 断面の種類の数 + 断面の種類のインデックス
+        self.D = np.array([CalcStifness.calc_D_matrix(material,section_type)
+                           for material in self.material_list for section_type in Section.TYPES])
+        self.gps = CalcStifness.set_gps(self.analysis_setting["element_type"])
+        self.n_elements = len(self.arrays["element_ids"])
+
+    def element_block(self,start,stop):
+        """
+        start~stop番目の要素のKeと自由度番号を算出。
+
+        Returns:
+            Ke (array n x 8 x 8): 要素剛性マトリクス
+            dofs (array n x 8): 要素自由度番号
+        """
+        arrays = self.arrays
+        conn = np.asarray(arrays["connectivity"][start:stop],dtype=np.int64)
+        section = FEMModel.id_to_row(arrays["section_ids"][start:stop],self.section_list)
+        material = FEMModel.id_to_row(arrays["material_ids"][start:stop],self.material_list)
+        group = material * len(Section.TYPES) + self.section_type[section]
+        Ke = BatchKernel.by_group(self.calc_Ke_batch,np.asarray(self.coords[conn.ravel()]).reshape(len(conn),4,2),self.D,
+                                  self.section_thickness[section],self.gps,group)
+        dofs = np.empty((len(conn),8),dtype=np.int64)
+        dofs[:,0::2] = 2 * conn
+        dofs[:,1::2] = 2 * conn + 1
+        return Ke, dofs
+
+    def assemble(self):
+        """
+        要素ブロックごとのKeを整列済みのCOOチャンクとして書き出し、行の帯ごとに統合してディスク上のCSRを作成。
+
+        Returns:
+            matrix (OutOfCoreMatrix): 全体剛性マトリクス
+        """
+        n = self.n_dof
+        block_size = max(self.max_entries // 64,1)
+        chunks = []
+        row_counts = np.zeros(n,dtype=np.int64)
+        with self.profiler.stage("element_blocks",n_elements=self.n_elements,n_dof=n) as counters:
+            for start in range(0,self.n_elements,block_size):
+                Ke, dofs = self.element_block(start,min(start + block_size,self.n_elements))
+                keys = (np.repeat(dofs,8,axis=1) * n + np.tile(dofs,(1,8))).ravel()
+                order = np.argsort(keys,kind="stable")
+                keys, values = keys[order], Ke.ravel()[order]
+                starts = np.flatnonzero(np.concatenate([[True],keys[1:] != keys[:-1]]))
+                keys, values = keys[starts], np.add.reduceat(values,starts)
+                row_counts += np.bincount(keys // n,minlength=n)
+                chunk = tuple(os.path.join(self.work_dir,"chunk{:06d}_{}.npy".format(len(chunks),name)) for name in ("keys","values"))
+                np.save(chunk[0],keys)
+                np.save(chunk[1],values)
+                chunks.append(chunk)
+            counters.update(n_chunks=len(chunks),block_size=block_size,
+                            chunk_bytes=sum(os.path.getsize(f) for chunk in chunks for f in chunk))
+        with self.profiler.stage("merge",n_dof=n) as counters:
+            matrix = OutOfCoreMatrix.merge(self.work_dir,n,chunks,row_counts,self.max_entries)
+            for chunk in chunks:
+                for f in chunk:
+                    os.remove(f)
+            counters.update(nnz=matrix.nnz,n_bands=len(matrix.bands))
+        return matrix
+
+    def read_load_cases(self):
+        """
+        荷重ケース及び荷重組合せごとの荷重ベクトルを読み込み。
+
+        Returns:
+            F (array 2node_num x n_case): 荷重ベクトル(1列目は最初の荷重ケース)
+            names ([str]): ケース名(荷重ケース、荷重組合せの順)
+        """
+        names = self.header["load_case_names"]
+        combinations = self.header["load_combinations"]
+        load_case = np.asarray(self.arrays["load_case"])
+        load_node = np.asarray(self.arrays["load_node"])
+        load_value = np.asarray(self.arrays["load_value"])
+        FEMModel.check_load_nodes({name:(load_node[load_case == j],None) for j,name in enumerate(names)},self.n_dof // 2)
+        F = np.zeros((self.n_dof,len(names) + len(combinations)))
+        for j in range(len(names)):
+            in_case = load_case == j
+            np.add.at(F[:,j],2 * load_node[in_case],load_value[in_case,0])
+            np.add.at(F[:,j],2 * load_node[in_case] + 1,load_value[in_case,1])
+        for j,combination in enumerate(combinations):
+            for case_name,factor in combination["factors"].items():
+                if case_name not in names:
+                    raise ValueError("Unknown load case {} in combination {}".format(case_name,combination["name"]))
+                F[:,len(names) + j] += factor * F[:,names.index(case_name)]
+        return F, names + [combination["name"] for combination in combinations]
+
+    def block_jacobi(self):
+        """
+        拘束自由度を除いた節点ごとの2x2ブロック対角の逆行列を作成。
+
+        Returns:
+            inv (array n/2 x 2 x 2): ブロックの逆行列(拘束自由度の行・列は0)
+        """
+        matrix = self.matrix
+        free = np.ones(self.n_dof,dtype=bool)
+        free[self.constrained] = False
+        a = np.where(free[0::2],matrix.diagonal[0::2],1.0)
+        c = np.where(free[1::2],matrix.diagonal[1::2],1.0)
+        b = np.where(free[0::2] & free[1::2],matrix.off_diagonal,0.0)
+        det = a * c - b * b
+        inv = np.stack([np.stack([c,-b],axis=-1),np.stack([-b,a],axis=-1)],axis=-2) / det[:,None,None]
+        inv[:,0,:] *= free[0::2,None]
+        inv[:,1,:] *= free[1::2,None]
+        inv[:,:,0] *= free[0::2,None]
+        inv[:,:,1] *= free[1::2,None]
+        return inv
+
+    def solve(self,F):
+        """
+        拘束自由度を強制変位に固定し、自由自由度をPCGで求解(全ケースを同時に反復し、1回のファイルの読み込みで全ケースの行列ベクトル積を行う)。
+        収束判定はanalysis_settingsの"tolerance"(相対残差)、最大反復回数は"max_iterations"(省略時は10 x 自由度数)。
+
+        Args:
+            F (array n x n_case): 荷重ベクトル
+
+        Returns:
+            d (array n x n_case): 全体変位ベクトル
+        """
+        matrix = self.matrix
+        tol = self.analysis_setting.get("tolerance",1e-6)
+        max_iter = self.analysis_setting.get("max_iterations") or 10 * self.n_dof
+        free = np.ones(self.n_dof,dtype=bool)
+        free[self.constrained] = False
+        inv = self.block_jacobi()
+        apply_M = lambda R: np.einsum("nij,njc->nic",inv,R.reshape(-1,2,R.shape[1])).reshape(R.shape)
+
+        d_c = np.zeros_like(F)
+        d_c[self.constrained] = self.u_c[:,None]
+        r = F - matrix.matvec(d_c)
+        r[~free] = 0.0
+        norm_f = np.linalg.norm(r,axis=0)
+        x = np.zeros_like(F)
+        self.iterations = [0] * F.shape[1]
+        active = norm_f > 0.0
+        z = apply_M(r)
+        p = z.copy()
+        rz = np.sum(r * z,axis=0)
+        for it in range(1,max_iter + 1):
+            if not active.any():
+                break
+            Kp = matrix.matvec(p)
+            Kp[~free] = 0.0
+            alpha = np.where(active,rz / np.where(active,np.sum(p * Kp,axis=0),1.0),0.0)
+            x += alpha * p
+            r -= alpha * Kp
+            residual = np.linalg.norm(r,axis=0) / np.where(norm_f > 0.0,norm_f,1.0)
+            for j in np.flatnonzero(active & (residual <= tol)).tolist():
+                self.iterations[j] = it
+            active &= residual > tol
+            z = apply_M(r)
+            rz_new = np.sum(r * z,axis=0)
+            p = z + np.where(active,rz_new / np.where(active,rz,1.0),0.0) * p
+            rz = rz_new
+        for j in np.flatnonzero(active).tolist():
+            self.iterations[j] = max_iter
+            warnings.warn("PCG did not converge in {} iterations (case {})".format(max_iter,j))
+        return x + d_c
+
+    def close(self):
+        """
+        作業ディレクトリを削除(一時ディレクトリを作成した場合のみ)。
+        """
+        del self.matrix
+        if self.own_work_dir:
+            shutil.rmtree(self.work_dir,ignore_errors=True)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="メモリに収まらない大規模モデルの解析(全体剛性マトリクスをディスク上に保持)")
+    parser.add_argument("model",help="バイナリ形式のモデル(.femディレクトリ、python -m Model.BinaryModelで変換)")
+    parser.add_argument("out",help="結果のnpzファイル(d, reactions, strain_energy, case_names)")
+    parser.add_argument("--work-dir",help="作業ディレクトリ(省略時は一時ディレクトリ)")
+    parser.add_argument("--memory-budget-mb",type=float,help="メモリ使用量の上限(MB)")
+    parser.add_argument("--profile",help="段階ごとの時間をJSONで保存")
+    args = parser.parse_args(argv)
+
+    solver = OutOfCoreSolver(args.model,args.work_dir,args.memory_budget_mb)
+    np.savez(args.out,d=solver.d_cases,reactions=solver.reaction_cases,strain_energy=solver.strain_energy,
+             case_names=np.array(solver.load_case_names))
+    if args.profile:
+        solver.profiler.to_json(args.profile)
+    print(solver.profiler.summary())
+    solver.close()
+    return 0
+
+if __name__ == "__main__":
+    #python -m Analysis.OutOfCore model.fem result.npz --memory-budget-mb 512
+    raise SystemExit(main())
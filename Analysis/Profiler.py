@@ -0,0 +1,119 @@
+import json
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+class Profiler:
+    """
+    解析の各段階の経過時間・CPU時間・ピークメモリ・問題規模(要素数・自由度数・非ゼロ数など)を記録するクラス。
+
+    Attributes:
+        memory (bool): Trueの場合はtracemallocで段階ごとのピークメモリを記録(計算が遅くなる)
+        stages ([dict]): 段階ごとの記録 {"name", "wall", "cpu", "peak_memory", "max_rss", "depth", "counters"}
+            (depthは入れ子の深さで、外側の段階は0。記録は段階の終了順)
+        hooks ([function]): 段階の終了時にhook(event)を呼ぶ関数のリスト
+        global_hooks ([function]): 全てのProfilerで呼ばれる関数のリスト(監視用)
+    """
+    global_hooks = []
+
+    def __init__(self,memory=False,hooks=None):
+        self.memory = memory
+        self.stages = []
+        #実行中の段階ごとに、内側の段階がreset_peakする前のピークメモリを保持するスタック
+        self.peaks = []
+        self.depth = 0
+        self.hooks = list(hooks) if hooks else []
+
+    @staticmethod
+    def from_setting(analysis_setting):
+        """
+        analysis_settingsの"profile_memory"に応じたProfilerを作成。
+        """
+        return Profiler(memory=bool(analysis_setting.get("profile_memory",False)))
+
+    def add_hook(self,hook):
+        self.hooks.append(hook)
+
+    @contextmanager
+    def stage(self,name,**counters):
+        """
+        with文の範囲を1段階として記録。
+
+        Args:
+            name (str): 段階名
+            counters: 問題規模などの値(with内で返される辞書に追加も可)
+
+        Yields:
+            counters (dict): この段階の記録に残す値
+        """
+        if self.memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            memory_start, peak = tracemalloc.get_traced_memory()
+            #reset_peakで外側の段階のピークが消えるため、外側のピークを退避してから計測を始める
+            if self.peaks:
+                self.peaks[-1] = max(self.peaks[-1],peak)
+            self.peaks.append(memory_start)
+            tracemalloc.reset_peak()
+        depth = self.depth
+        self.depth += 1
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield counters
+        finally:
+            self.depth = depth
+            peak_memory = None
+            if self.memory:
+                peak = max(self.peaks.pop(),tracemalloc.get_traced_memory()[1])
+                peak_memory = peak - memory_start
+                if self.peaks:
+                    self.peaks[-1] = max(self.peaks[-1],peak)
+            record = {"name":name,"wall":time.perf_counter() - wall,"cpu":time.process_time() - cpu,
+                      "peak_memory":peak_memory,"max_rss":Profiler.max_rss(),"depth":depth,"counters":counters}
+            self.stages.append(record)
+            for hook in self.hooks + Profiler.global_hooks:
+                hook(dict(record,event="stage"))
+
+    @staticmethod
+    def max_rss():
+        """
+        Returns:
+            max_rss (int or None): プロセスの最大常駐メモリ(byte、取得できない環境ではNone)
+        """
+        if resource is None:
+            return None
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        #ru_maxrssはLinuxではkbyte、macOSではbyte単位
+        return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+    def to_dict(self):
+        """
+        Returns:
+            profile (dict): 段階ごとの記録と合計時間(入れ子の段階は外側に含まれるため最も外側の段階のみ合計)
+        """
+        top = [record for record in self.stages if record["depth"] == 0]
+        return {"stages":self.stages,
+                "total_wall":sum(record["wall"] for record in top),
+                "total_cpu":sum(record["cpu"] for record in top)}
+
+    def to_json(self,path):
+        with open(path,"w",encoding="utf-8") as f:
+            json.dump(self.to_dict(),f,indent=1,default=str)
+
+    def summary(self):
+        """
+        Returns:
+            summary (str): 段階ごとの時間・メモリの表
+        """
+        lines = ["{:<20}{:>10}{:>10}{:>14}".format("stage","wall[s]","cpu[s]","peak[MB]")]
+        for record in self.stages:
+            peak = "-" if record["peak_memory"] is None else "{:.1f}".format(record["peak_memory"] / 2**20)
+            lines.append("{:<20}{:>10.4f}{:>10.4f}{:>14}".format("  " * record["depth"] + record["name"],record["wall"],record["cpu"],peak))
+        return "\n".join(lines)
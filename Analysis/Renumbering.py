@@ -0,0 +1,155 @@
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse import csgraph
+
+class Renumbering:
+    """
+    入力の節点番号と内部の自由度番号との対応をまとめておくクラス。
+    節点番号kの内部自由度は(2*node_index[k], 2*node_index[k]+1)となる。
+
+    Attributes:
+        method (str): 並べ替え方法("none", "rcm", "nd")
+        node_index (array n_node): 節点番号 -> 内部の節点番号
+        perm (array n_node): 内部の節点番号 -> 節点番号
+        bandwidth_before, bandwidth_after (int): 並べ替え前後の半帯幅(自由度単位)
+        profile_before, profile_after (int): 並べ替え前後のプロファイル(下三角の包絡線内の成分数、自由度単位)
+    """
+    ND_MIN_SIZE = 64
+    #既定はRCM(O(nnz)で安価なため常に行い、反復法の前処理・密なKの組み立てのメモリの局所性を良くする)
+    DEFAULT_METHOD = "rcm"
+
+    def __init__(self,graph,method=DEFAULT_METHOD):
+        n = graph.shape[0]
+        self.method = method
+        if method == "none":
+            perm = np.arange(n)
+        elif method == "rcm":
+            perm = np.asarray(csgraph.reverse_cuthill_mckee(graph,symmetric_mode=True),dtype=np.int64)
+        elif method == "nd":
+            perm = Renumbering.nested_dissection(graph)
+        else:
+            raise ValueError("Unknown renumbering: {}".format(method))
+        self.perm = perm
+        self.node_index = np.empty(n,dtype=np.int64)
+        self.node_index[perm] = np.arange(n)
+        self.bandwidth_before, self.profile_before = Renumbering.calc_bandwidth_profile(graph,np.arange(n))
+        self.bandwidth_after, self.profile_after = Renumbering.calc_bandwidth_profile(graph,self.node_index)
+
+    @staticmethod
+    def get(fem_model):
+        """
+        analysis_settingsの"renumbering"("none", "rcm", "nd"、省略時は"rcm")に応じた並べ替えを取得。メッシュごとに一度だけ計算する。
+
+        Returns:
+            renumbering (Renumbering): 節点番号の並べ替え
+        """
+        mesh = fem_model.mesh
+        if mesh.renumbering is None:
+            method = fem_model.analysis_setting.get("renumbering",Renumbering.DEFAULT_METHOD)
+            mesh.renumbering = Renumbering(Renumbering.node_graph(mesh.get_connectivity(),len(mesh.node_ids)),method)
+        return mesh.renumbering
+
+    @staticmethod
+    def node_graph(conn,n_nodes):
+        """
+        同じ要素に属する節点同士を結んだ節点グラフを作成。
+
+        Args:
+            conn (array n_elem x n_nodes_e): 要素の節点番号
+
+        Returns:
+            graph (csr_matrix n_node x n_node): 隣接行列
+        """
+        k = conn.shape[1]
+        rows = np.repeat(conn,k,axis=1).ravel()
+        cols = np.tile(conn,(1,k)).ravel()
+        graph = sp.csr_matrix((np.ones(len(rows),dtype=np.int8),(rows,cols)),shape=(n_nodes,n_nodes))
+        graph.data[:] = 1
+        return graph
+
+    @staticmethod
+    def calc_bandwidth_profile(graph,node_index):
+        """
+        並べ替え後の剛性マトリクスの半帯幅とプロファイルを節点グラフから算出(自由度単位)。
+
+        Returns:
+            bandwidth (int): 半帯幅
+            profile (int): プロファイル
+        """
+        coo = graph.tocoo()
+        i, j = node_index[coo.row], node_index[coo.col]
+        n = graph.shape[0]
+        bandwidth = int(np.abs(i - j).max()) if len(i) else 0
+        first = np.full(n,n,dtype=np.int64)
+        np.minimum.at(first,i,j)
+        first = np.minimum(first,np.arange(n))
+        #節点の2自由度の行2i, 2i+1の包絡線(列2*first~対角)はそれぞれ2(i-first)+1, 2(i-first)+2成分
+        profile = int(np.sum(4 * (np.arange(n) - first) + 3))
+        return 2 * bandwidth + 1, profile
+
+    @staticmethod
+    def nested_dissection(graph):
+        """
+        BFSのレベル構造の中央レベルを分離節点とする入れ子分割で並べ替え。
+
+        Returns:
+            perm (array n_node): 内部の節点番号 -> 節点番号
+        """
+        order = []
+        stack = [np.arange(graph.shape[0])]
+        while stack:
+            nodes = stack.pop()
+            if isinstance(nodes,tuple):
+                #分離節点は両側の部分領域の後に番号付けする
+                order.append(nodes[0])
+                continue
+            if len(nodes) <= Renumbering.ND_MIN_SIZE:
+                order.append(nodes)
+                continue
+            sub = graph[nodes][:,nodes]
+            n_comp, labels = csgraph.connected_components(sub,directed=False)
+            if n_comp > 1:
+                for c in range(n_comp):
+                    stack.append(nodes[labels == c])
+                continue
+            #擬似周辺節点からのBFSでレベル構造を作成
+            level = csgraph.shortest_path(sub,unweighted=True,indices=0)
+            level = csgraph.shortest_path(sub,unweighted=True,indices=int(np.argmax(level)))
+            counts = np.bincount(level.astype(np.int64))
+            mid = int(np.searchsorted(np.cumsum(counts),len(nodes) / 2))
+            if mid == 0 or mid >= len(counts) - 1:
+                order.append(nodes)
+                continue
+            stack.append((nodes[level == mid],))
+            stack.append(nodes[level > mid])
+            stack.append(nodes[level < mid])
+        return np.concatenate(order).astype(np.int64) if order else np.zeros(0,dtype=np.int64)
+
+    def to_internal(self,v):
+        """
+        節点番号順の自由度ベクトル(2*node_id+c)を内部の自由度順に並べ替え。
+
+        Args:
+            v (array 2node_num or 2node_num x n): 節点番号順のベクトル
+
+        Returns:
+            v_int (array): 内部自由度順のベクトル
+        """
+        v = np.asarray(v)
+        return v.reshape((-1,2) + v.shape[1:])[self.perm].reshape(v.shape)
+
+    def to_external(self,v):
+        """
+        内部の自由度順のベクトルを節点番号順(2*node_id+c)に並べ替え。
+        """
+        v = np.asarray(v)
+        return v.reshape((-1,2) + v.shape[1:])[self.node_index].reshape(v.shape)
+
+    def report(self):
+        """
+        Returns:
+            report (dict): 並べ替え方法と前後の半帯幅・プロファイル
+        """
+        return {"method":self.method,
+                "bandwidth_before":self.bandwidth_before,"bandwidth_after":self.bandwidth_after,
+                "profile_before":self.profile_before,"profile_after":self.profile_after}
@@ -1,159 +1,247 @@
-import numpy as np
-from Analysis.CalcStiffness import CalcStifness
-
-class Solver:
-    """
-    有限要素法の計算を行うクラス
-    
-    Attributes:
-        mesh (Mesh): Meshクラス
-        material (Material): Materialクラス
-        D (array 3x3): Dマトリクス
-    """
-    def __init__(self,fem_model):
-        self.fem_model = fem_model
-        self.mesh = self.fem_model.mesh
-        self.f , self.bc_dist_dict = self.read_boundary_cond()
-        #self.D = self.calc_D()
-        #self.K = self.calc_K()
-        #self.d = self.calc_d()
-
-        self.gps = CalcStifness.set_gps(self.fem_model)
-        self.D = CalcStifness.calc_D(self.fem_model)
-        self.K = CalcStifness.calc_K(self.fem_model,self.D,self.gps)
-        self.d = CalcStifness.calc_d(self.fem_model,self.f , self.bc_dist_dict,self.K)
-        self.dx = self.d[::2]
-        self.dy = self.d[1::2]
-        self.stress_dict = self.calc_stress()
-        self.strain_energy = self.calc_strain_energy()
-        
-    def read_boundary_cond(self):
-        """
-        境界条件を読み込み。
-
-        Returns:
-            f (array 2node_num): 全体荷重ベクトル
-            bc_dist_dict (dict): 全体変位ベクトルのうち、変位拘束のあるindをまとめた辞書
-        """
-        bc_dist_dict = {}
-        f = []
-        for k,v in self.mesh.nodes.items():
-            f += v.bc_force
-            if v.bc_dist[0] is not None:
-                bc_dist_dict[k * 2] = v.bc_dist[0]
-            if v.bc_dist[1] is not None:
-                bc_dist_dict[k * 2 + 1] = v.bc_dist[1]
-        return np.array(f), bc_dist_dict
-
-    def calc_d(self):
-        for i in range(len(self.mesh.nodes) * 2):
-            if i in self.bc_dist_dict.keys():
-                self.K[i, :] = np.zeros(len(self.mesh.nodes) * 2)
-                self.K[:, i] = np.zeros(len(self.mesh.nodes) * 2)
-                self.K[i, i] = 1.0
-        d = np.dot(np.linalg.inv(self.K), self.f.T)
-        return d
-
-    def calc_stress(self):
-        """
-        節点応力を算出。
-
-        Args:
-            elem (Element): 対象のElementクラス
-
-        Returns:
-            stress_e (array 3x1): 節点応力
-        """
-        stress_dict = {i : np.zeros(3) for i in range(len(self.fem_model.ori4node))}
-        counts_dict = {i : 0 for i in range(len(self.fem_model.ori4node))}
-
-        for key,elem in self.mesh.elements.items():
-            nodes_ind = []
-            for ind in elem.node:
-                nodes_ind.append(ind * 2)
-                nodes_ind.append(ind * 2 + 1)
-                d_elem = self.d[nodes_ind]
-
-            stress_e = []
-            for i, gp in enumerate(self.gps):
-                xi, eta = gp[0], gp[1]
-                B = CalcStifness.calc_B(self.fem_model,elem, xi, eta,self.D,self.gps) #プロパティに設定してもよい
-                stress_e.append(np.dot(np.dot(self.D, B), d_elem.T))#積分点での応力がもとまる(9)x3materix
-            #最小二乗法で節点力を算出
-            
-            node_stress_e = self.calc_stress_by_lstsq(stress_e,self.gps)
-            
-            #節点位置での平均応力を算出
-            
-            for i in range(4):
-                stress_dict[elem.cornernode[i]] += node_stress_e[i]
-                counts_dict[elem.cornernode[i]] += 1
-
-        for i in range(len(self.fem_model.ori4node)):
-            stress_dict[i] = stress_dict[i]  / counts_dict[i]
-        
-        
-        ##mises応力
-        for key,stress in stress_dict.items():
-            mises_stress = (stress[0]**2-stress[0]*stress[1]+stress[1]**2+3*stress[2]**2)**(1/2)
-            stress_dict[key] = np.append(stress,mises_stress)
-
-        return stress_dict
-    
-    def calc_max_d(self):
-        """
-        最大変位を算出。
-        Returns:
-            max_dx,max_dy: 最大変位
-        """
-        max_dx = max(self.dx)
-        max_dy = max(self.dy)
-
-        return max_dx,max_dy
-
-    def calc_stress_by_lstsq(self,stress_e,gps):
-        integration_points = np.array(gps) #(xi,eta,wi,wj)
-        stress_e = np.array(stress_e)
-        sigX = np.array(stress_e[:,0])
-        sigY = np.array(stress_e[:,1])
-        tauXY = np.array(stress_e[:,2])
-
-        A = np.column_stack([
-            np.ones(len(integration_points)),  # 定数項
-            integration_points[:, 0],          # x
-            integration_points[:, 1],          # y
-            integration_points[:, 0]**2,       # x^2
-            integration_points[:, 1]**2,       # y^2
-            integration_points[:, 0] * integration_points[:, 1]  # xy
-        ])
-
-        # 最小二乗法で係数 a を求める
-        coefficients_sigX, _, _, _ = np.linalg.lstsq(A, sigX, rcond=None)
-        coefficients_sigY, _, _, _ = np.linalg.lstsq(A, sigY, rcond=None)
-        coefficients_tauXY, _, _, _ = np.linalg.lstsq(A, tauXY, rcond=None)
-
-        corner_nodes = np.array([
-            [-1, -1], [1, -1], [1, 1], [-1, 1]
-        ])
-        
-        A_corners = np.column_stack([
-            np.ones(len(corner_nodes)),  
-            corner_nodes[:, 0],  
-            corner_nodes[:, 1],  
-            corner_nodes[:, 0]**2,  
-            corner_nodes[:, 1]**2,  
-            corner_nodes[:, 0] * corner_nodes[:, 1]
-        ])
-
-        sigX_nodes = A_corners @ coefficients_sigX
-        sigY_nodes = A_corners @ coefficients_sigY
-        tauXY_nodes = A_corners @ coefficients_tauXY
-
-        node_stress_e = np.column_stack([sigX_nodes,sigY_nodes,tauXY_nodes])
-        node_stress_e = node_stress_e.tolist()
-        
-        return node_stress_e #4x3
-        
-    def calc_strain_energy(self):
-        strain_energy = 1/2 * self.d.T @ self.K @self.d
+import numpy as np
+from Analysis.CalcStiffness import CalcStifness
+from Analysis.ElementCache import ElementCache
+from Analysis.CalcStress import CalcStress
+from Analysis.BatchKernel import BatchKernel
+from Analysis.Renumbering import Renumbering
+from Analysis.SparseAssembly import SparseAssembly
+from Result.LoadCaseResults import LoadCaseResults
+import scipy.sparse as sp
+
+class Solver:
+    """
+    有限要素法の計算を行うクラス
+    
+    Attributes:
+        mesh (Mesh): Meshクラス
+        D (array n_group x 3 x 3): (材料, 断面の種類)のグループごとのDマトリクス
+        nu_z (array n_group): グループごとの面外応力の係数(平面ひずみはnu、平面応力は0)
+        element_group (array n_elem): 各要素のグループ(Dのインデックス)
+        renumbering (Renumbering): 節点番号と内部自由度番号の対応(K, f, bc_dist_dictは内部自由度順、dは節点番号順)
+        system (ConstrainedSystem): 自由自由度・拘束自由度に分割した剛性方程式
+        linear_solver (DirectSolver, IterativeSolver or MixedPrecisionSolver): K_ffの連立方程式ソルバー
+        element_cache (ElementCache): 要素マトリクスのキャッシュ(analysis_settingsの"element_cache"指定時のみ。このモデルのヒット率はprofilerの"K"段階に記録)
+        gp_stress (array n_elem x n_gp x 3): 積分点応力
+        nodal_stress (array n_node x 4): 隅節点の平均応力(sigX, sigY, tauXY, von Mises)
+        F (array 2node_num x n_case): 荷重ケース・荷重組合せごとの荷重ベクトル(内部自由度順)
+        d_cases (array 2node_num x n_case): 荷重ケース・荷重組合せごとの全体変位ベクトル
+        reactions (array 2node_num): 最初の荷重ケースの反力(節点番号順、拘束のない自由度では0)
+        reaction_cases (array 2node_num x n_case): 荷重ケース・荷重組合せごとの反力
+        load_case_results (LoadCaseResults): 荷重ケース・荷重組合せごとの結果
+        profiler (Profiler): モデル作成から応力算出までの段階ごとの時間・メモリ・問題規模(fem_model.profilerと共通)
+    """
+    def __init__(self,fem_model,d0=None):
+        """
+        Args:
+            d0 (array 2node_num or 2node_num x n_case): 反復法ソルバーの初期値(節点番号順、細分割前の解からの補間など)
+        """
+        self.fem_model = fem_model
+        self.d0 = d0
+        self.mesh = self.fem_model.mesh
+        self.profiler = self.fem_model.profiler
+        profiler = self.profiler
+        n_dof = 2 * len(self.mesh.node_ids)
+        with profiler.stage("renumbering") as counters:
+            self.renumbering = Renumbering.get(self.fem_model)
+            counters.update(self.renumbering.report())
+        with profiler.stage("loads",n_dof=n_dof) as counters:
+            self.f , self.bc_dist_dict = self.read_boundary_cond()
+            self.ties = self.read_hanging_nodes()
+            self.F, self.load_case_names = self.read_load_cases()
+            counters.update(n_constrained=len(self.bc_dist_dict),n_cases=len(self.load_case_names))
+        #self.D = self.calc_D()
+        #self.K = self.calc_K()
+        #self.d = self.calc_d()
+
+        self.element_cache = ElementCache.from_setting(self.fem_model)
+        #キャッシュはプロセス内で共有のため、このモデルの組み立て(1要素1回)の分のみ記録する
+        cache_before = self.element_cache.stats() if self.element_cache is not None else None
+        with profiler.stage("K",n_elements=len(self.mesh.element_ids),n_dof=n_dof) as counters:
+            self.gps = CalcStifness.set_gps(self.fem_model.analysis_setting["element_type"])
+            self.D, self.element_group = CalcStifness.calc_D(self.fem_model)
+            self.nu_z = CalcStifness.calc_nu_z(self.fem_model)
+            self.K = CalcStifness.calc_K(self.fem_model,self.D,self.gps,self.element_group)
+            counters["nnz"] = self.K.nnz if sp.issparse(self.K) else self.K.size
+            counters["n_groups"] = len(self.D)
+            counters["workers"] = SparseAssembly.n_workers(self.fem_model)
+            if sp.issparse(self.K):
+                n_elem = len(self.mesh.element_ids)
+                counters["n_chunks"] = -(-n_elem // SparseAssembly.chunk_size(self.fem_model,n_elem))
+            if self.element_cache is not None:
+                counters["element_cache"] = self.element_cache.stats(since=cache_before)
+        with profiler.stage("solve",n_dof=n_dof) as counters:
+            self.d = self.calc_d()
+            counters.update(method=self.linear_solver.method,n_rhs=self.F.shape[1])
+            if self.linear_solver.method in ("pcg","mixed"):
+                counters["iterations"] = self.linear_solver.iterations
+                counters["memory"] = self.linear_solver.memory_bytes
+        self.dx = self.d[::2]
+        self.dy = self.d[1::2]
+        with profiler.stage("stress",n_elements=len(self.mesh.element_ids)):
+            self.stress_dict = self.calc_stress()
+        with profiler.stage("strain_energy"):
+            self.strain_energy = self.calc_strain_energy()
+            self.load_case_results = LoadCaseResults(self.load_case_names,self.d_cases,self.case_nodal_stress,
+                                                     self.calc_strain_energy(self.d_cases))
+        
+    def read_boundary_cond(self):
+        """
+        境界条件を読み込み。
+
+        Returns:
+            f (array 2node_num): 全体荷重ベクトル(内部自由度順)
+            bc_dist_dict (dict): 全体変位ベクトルのうち、変位拘束のあるind(内部自由度番号)をまとめた辞書
+        """
+        mesh = self.mesh
+        node_index = self.renumbering.node_index
+        f = np.zeros(len(mesh.node_ids) * 2)
+        f.reshape(-1,2)[node_index] = mesh.forces
+        node, comp = np.nonzero(mesh.bc_mask)
+        bc_dist_dict = dict(zip((2 * node_index[node] + comp).tolist(),mesh.bc_value[node,comp].tolist()))
+        return f, bc_dist_dict
+
+    def read_hanging_nodes(self):
+        """
+        ハンギングノードの変位を辺の両端の平均に従属させる関係を読み込み。
+
+        Returns:
+            ties ((array, array n x 2, array n x 2) or None): 従属自由度・主自由度・重み(内部自由度番号、ハンギングノードが無い場合はNone)
+        """
+        mesh = self.mesh
+        if len(mesh.hanging_nodes) == 0:
+            return None
+        node_index = self.renumbering.node_index
+        hanging, parents = node_index[mesh.hanging_nodes], node_index[mesh.hanging_parents]
+        slave = np.concatenate([2 * hanging,2 * hanging + 1])
+        master = np.concatenate([2 * parents,2 * parents + 1])
+        return slave, master, np.full(master.shape,0.5)
+
+    def read_load_cases(self):
+        """
+        荷重ケース及び荷重組合せごとの荷重ベクトルを読み込み。
+
+        Returns:
+            F (array 2node_num x n_case): 荷重ベクトル(内部自由度順、1列目は最初の荷重ケース)
+            names ([str]): ケース名(荷重ケース、荷重組合せの順)
+        """
+        node_index = self.renumbering.node_index
+        load_cases = self.fem_model.load_cases
+        combinations = self.fem_model.load_combinations
+        names = list(load_cases.keys())
+        F = np.zeros((len(self.mesh.node_ids) * 2,len(names) + len(combinations)))
+        for j,name in enumerate(names):
+            node_ids, values = load_cases[name]
+            i = node_index[np.asarray(node_ids,dtype=np.int64)]
+            np.add.at(F[:,j],2 * i,values[:,0])
+            np.add.at(F[:,j],2 * i + 1,values[:,1])
+        for j,(name,factors) in enumerate(combinations.items()):
+            for case_name,factor in factors.items():
+                F[:,len(load_cases) + j] += factor * F[:,names.index(case_name)]
+        return F, names + list(combinations.keys())
+
+    def calc_d(self):
+        """
+        Kを一度だけ分解し、全荷重ケースを複数右辺として一括で求解。全ケースの変位はself.d_casesに保持する。
+
+        Returns:
+            d (array 2node_num): 最初の荷重ケースの全体変位ベクトル(節点番号順 2*node_id+c)
+        """
+        x0 = None
+        if self.d0 is not None:
+            x0 = self.renumbering.to_internal(np.asarray(self.d0,dtype=float).reshape(len(self.F),-1))
+            x0 = np.broadcast_to(x0,self.F.shape)
+        d, self.system = CalcStifness.calc_d(self.fem_model,self.F,self.bc_dist_dict,self.K,self.ties,x0)
+        self.linear_solver = self.system.solver
+        self.d_cases = self.renumbering.to_external(d)
+        self.reaction_cases = self.renumbering.to_external(self.system.reactions(d,self.F))
+        self.reactions = self.reaction_cases[:,0]
+        return self.d_cases[:,0]
+
+    def solve(self,f):
+        """
+        分解済みのK_ffを用いて、別の荷重ベクトルに対する変位を算出(強制変位は境界条件の値)。
+
+        Args:
+            f (array 2node_num or 2node_num x n_rhs): 全体荷重ベクトル(節点番号順)
+
+        Returns:
+            d (array 2node_num or 2node_num x n_rhs): 全体変位ベクトル(節点番号順)
+        """
+        d = self.system.solve(self.renumbering.to_internal(f))
+        return self.renumbering.to_external(d)
+
+    def calc_stress(self):
+        """
+        節点応力を算出。全荷重ケースの節点応力はself.case_nodal_stressに保持する。
+
+        Returns:
+            stress_dict ({node_id: array 4}): 最初の荷重ケースの節点応力(sigX, sigY, tauXY, von Mises)
+        """
+        self.case_nodal_stress, self.gp_stress = self.calc_nodal_stress(self.d_cases)
+        self.nodal_stress = self.case_nodal_stress[0]
+        return {i : self.nodal_stress[i] for i in range(len(self.nodal_stress))}
+
+    def calc_nodal_stress(self,d):
+        """
+        積分点応力を全要素一括で求め、積分則ごとに共通の外挿マトリクスで隅節点へ外挿し、節点ごとに平均する。
+        von Mises応力は平面ひずみの要素の面外応力 sigZ = nu (sigX + sigY) も節点ごとに平均して含める。
+
+        Args:
+            d (array 2node_num x n_case): 全体変位ベクトル(節点番号順)
+
+        Returns:
+            nodal_stress (array n_case x n_node x 4): 隅節点の平均応力(sigX, sigY, tauXY, von Mises)
+            gp_stress (array n_elem x n_gp x 3): 1列目のケースの積分点応力
+        """
+        n_nodes = self.mesh.n_corner_nodes
+        n_case = d.shape[1]
+        conn = self.mesh.get_connectivity()
+        xy = self.mesh.get_element_xy()
+        thickness = self.mesh.get_element_thickness()
+        E = CalcStress.calc_extrapolation_matrix(self.gps)
+
+        gp_stress = np.empty((len(conn),len(self.gps),3))
+        node_stress_e = np.empty((n_case,len(conn),4,4))
+        for s in range(0,len(conn),BatchKernel.CHUNK_SIZE):
+            e = min(s + BatchKernel.CHUNK_SIZE,len(conn))
+            group = self.element_group[s:e]
+            B = CalcStifness.calc_B_batch(self.fem_model,xy[s:e],self.D,thickness[s:e],self.gps,group)
+            d_elem = np.stack([d[2 * conn[s:e]],d[2 * conn[s:e] + 1]],axis=2).reshape(e - s,-1,n_case)
+            for c in range(n_case):
+                stress = CalcStress.calc_gp_stress(self.D[group],B,d_elem[:,:,c])
+                node_stress_e[c,s:e,:,:3] = np.einsum("cg,egi->eci",E,stress)
+                node_stress_e[c,s:e,:,3] = CalcStress.calc_sigma_z(node_stress_e[c,s:e,:,:3],self.nu_z[group])
+                if c == 0:
+                    gp_stress[s:e] = stress
+
+        #節点位置での平均応力を算出
+        nodal_stress = np.empty((n_case,n_nodes,4))
+        for c in range(n_case):
+            stress = CalcStress.average_nodal(conn[:,:4],node_stress_e[c],n_nodes)
+            nodal_stress[c] = np.column_stack([stress[:,:3],CalcStress.calc_mises(stress)])
+        return nodal_stress, gp_stress
+
+    def calc_max_d(self):
+        """
+        最大変位を算出。
+        Returns:
+            max_dx,max_dy: 最大変位
+        """
+        max_dx = max(self.dx)
+        max_dy = max(self.dy)
+
+        return max_dx,max_dy
+
+    def calc_strain_energy(self,d=None):
+        """
+        Args:
+            d (array 2node_num or 2node_num x n_case): 全体変位ベクトル(省略時はself.d)
+
+        Returns:
+            strain_energy (float or array n_case): ひずみエネルギー
+        """
+        d = self.renumbering.to_internal(self.d if d is None else d)
+        if d.ndim == 2:
+            return 1/2 * np.einsum("ic,ic->c",d,self.K @ d)
+        strain_energy = 1/2 * d.T @ self.K @d
         return strain_energy
\ No newline at end of file
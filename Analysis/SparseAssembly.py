@@ -0,0 +1,174 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import scipy.sparse as sp
+from Analysis.BatchKernel import BatchKernel
+from Analysis.Renumbering import Renumbering
+
+class SparsityPattern:
+    """
+    全体剛性マトリクスの非ゼロ構造(CSR)と、要素自由度からCSRのdataスロットへの対応をまとめておくクラス
+
+    Attributes:
+        ndof (int): 全体自由度数
+        dofs (array n_elem x ndof_e): 各要素の全体自由度番号
+        indptr, indices (array): CSRの行ポインタ・列インデックス
+        slot (array n_elem x ndof_e^2): Keの各成分が加算されるdataのインデックス
+    """
+    def __init__(self,ndof,dofs):
+        self.ndof = ndof
+        self.dofs = dofs
+        n_elem, ndof_e = dofs.shape
+        #COOの(行,列)を一意化してCSRのスロットを決定
+        rows = np.repeat(dofs,ndof_e,axis=1).ravel()
+        cols = np.tile(dofs,(1,ndof_e)).ravel()
+        keys = rows.astype(np.int64) * ndof + cols
+        unique_keys, slot = np.unique(keys,return_inverse=True)
+        self.slot = slot.reshape(n_elem,ndof_e * ndof_e)
+        index_dtype = np.int32 if len(unique_keys) < np.iinfo(np.int32).max else np.int64
+        self.indices = (unique_keys % ndof).astype(index_dtype)
+        row_counts = np.bincount(unique_keys // ndof,minlength=ndof)
+        self.indptr = np.concatenate([[0],np.cumsum(row_counts)]).astype(index_dtype)
+
+    @property
+    def nnz(self):
+        return len(self.indices)
+
+    def assemble(self,Ke):
+        """
+        要素剛性マトリクスを非ゼロ構造に足し込んでCSR行列を作成。
+
+        Args:
+            Ke (array n_elem x ndof_e x ndof_e): 要素剛性マトリクス(要素順はdofsと同じ)
+
+        Returns:
+            K (csr_matrix): 全体剛性マトリクス
+        """
+        data = np.bincount(self.slot.ravel(),weights=np.asarray(Ke).ravel(),minlength=self.nnz)
+        return self.to_csr(data)
+
+    def add_elements(self,data,start,Ke):
+        """
+        start番目以降の要素のKeをCSRのdata配列に足し込む。
+
+        Args:
+            data (array nnz): CSRのdata配列
+            start (int): Keの先頭要素のインデックス
+            Ke (array n x ndof_e x ndof_e): 要素剛性マトリクス
+        """
+        Ke = np.asarray(Ke)
+        np.add.at(data,self.slot[start:start + len(Ke)].ravel(),Ke.ravel())
+
+    def local_data(self,start,Ke):
+        """
+        start番目以降の要素のKeを、それらが触れるdataの範囲[lo, lo+len(local))のみの配列に足し込む(並列組み立て用)。
+
+        Returns:
+            lo (int): 範囲の先頭のdataのインデックス
+            local (array): 範囲内のdataへの加算値
+        """
+        Ke = np.asarray(Ke)
+        slot = self.slot[start:start + len(Ke)]
+        lo = int(slot.min())
+        return lo, np.bincount((slot - lo).ravel(),weights=Ke.ravel(),minlength=int(slot.max()) - lo + 1)
+
+    def to_csr(self,data):
+        return sp.csr_matrix((data,self.indices.copy(),self.indptr.copy()),shape=(self.ndof,self.ndof))
+
+class SparseAssembly:
+    @staticmethod
+    def element_dofs(fem_model):
+        """
+        各要素の内部自由度番号(2*node_index[node_id], 2*node_index[node_id]+1)を算出。
+
+        Returns:
+            dofs (array n_elem x ndof_e): 要素自由度番号
+        """
+        mesh = fem_model.mesh
+        conn = Renumbering.get(fem_model).node_index[mesh.get_connectivity()]
+        dofs = np.empty((conn.shape[0],conn.shape[1] * 2),dtype=np.int64)
+        dofs[:,0::2] = 2 * conn
+        dofs[:,1::2] = 2 * conn + 1
+        return dofs
+
+    @staticmethod
+    def get_pattern(fem_model):
+        """
+        非ゼロ構造を取得。メッシュごとに一度だけ計算し、以降は再利用する。
+
+        Returns:
+            pattern (SparsityPattern): 非ゼロ構造
+        """
+        mesh = fem_model.mesh
+        if mesh.sparse_pattern is None:
+            mesh.sparse_pattern = SparsityPattern(len(mesh.node_ids) * 2,SparseAssembly.element_dofs(fem_model))
+        return mesh.sparse_pattern
+
+    @staticmethod
+    def assemble(fem_model,Ke):
+        """
+        要素剛性マトリクスから疎な全体剛性マトリクスを組み立て。
+
+        Args:
+            Ke (array n_elem x ndof_e x ndof_e): mesh.elementsの順に並んだ要素剛性マトリクス
+
+        Returns:
+            K (csr_matrix): 全体剛性マトリクス
+        """
+        return SparseAssembly.get_pattern(fem_model).assemble(Ke)
+
+    @staticmethod
+    def n_workers(fem_model):
+        """
+        analysis_settingsの"assembly_workers"(0または"auto"はCPU数)から組み立てのスレッド数を取得。
+
+        Returns:
+            n_workers (int): スレッド数(1の場合は逐次)
+        """
+        setting = fem_model.analysis_setting.get("assembly_workers",1)
+        if setting in (0,"auto"):
+            return os.cpu_count() or 1
+        return max(int(setting),1)
+
+    @staticmethod
+    def chunk_size(fem_model,n_elem):
+        """
+        組み立ての1チャンクの要素数。スレッド数が2以上の場合は、スレッド間で仕事の量が偏らないように
+        各スレッドに4チャンク程度が行き渡る大きさ(BatchKernel.CHUNK_SIZE以下)にする。
+
+        Returns:
+            chunk_size (int): 1チャンクの要素数
+        """
+        n_workers = SparseAssembly.n_workers(fem_model)
+        if n_workers <= 1:
+            return BatchKernel.CHUNK_SIZE
+        return max(min(BatchKernel.CHUNK_SIZE,-(-n_elem // (4 * n_workers))),1)
+
+    @staticmethod
+    def assemble_by_chunks(fem_model,calc_Ke):
+        """
+        要素をチャンクに分けてKeを算出しながら組み立て(全要素のKeを同時に保持しない)。
+        組み立てのスレッド数が2以上の場合は、チャンクごとのKeの算出と、そのチャンクが触れるdataの範囲への足し込みをスレッドで並列に行い、
+        結果をチャンク順に足し合わせる(座標・接続の配列はスレッド間で共有し、書き込みの競合は起きない)。
+
+        Args:
+            calc_Ke (function): calc_Ke(start, stop)でstart~stop番目の要素のKeを返す関数
+
+        Returns:
+            K (csr_matrix): 全体剛性マトリクス
+        """
+        pattern = SparseAssembly.get_pattern(fem_model)
+        data = np.zeros(pattern.nnz)
+        n_elem = pattern.dofs.shape[0]
+        n_workers = SparseAssembly.n_workers(fem_model)
+        chunk_size = SparseAssembly.chunk_size(fem_model,n_elem)
+        if n_workers <= 1:
+            for s in range(0,n_elem,chunk_size):
+                e = min(s + chunk_size,n_elem)
+                pattern.add_elements(data,s,calc_Ke(s,e))
+            return pattern.to_csr(data)
+        starts = range(0,n_elem,chunk_size)
+        with ThreadPoolExecutor(max_workers=n_workers) as executor:
+            for lo,local in executor.map(lambda s: pattern.local_data(s,calc_Ke(s,min(s + chunk_size,n_elem))),starts):
+                data[lo:lo + len(local)] += local
+        return pattern.to_csr(data)
@@ -0,0 +1,207 @@
+import numpy as np
+import scipy.sparse as sp
+from scipy.spatial import cKDTree
+from Analysis.Solver import Solver
+from Analysis.CalcStiffness import CalcStifness
+from Analysis.LinearSolver import LinearSolver, ConstrainedSystem
+from Analysis.SparseAssembly import SparseAssembly
+
+class TopologyOptimization:
+    """
+    SIMP法(密度法)による位相最適化(コンプライアンス最小化、体積制約)を行うクラス。4節点・8節点・非適合要素に対応。
+
+    要素密度ρに対する要素剛性を Ke(ρ) = (E_min + ρ^p (1 - E_min)) Ke0 とし、密度1のKe0は最初に一度だけ算出する。
+    Kのdataは Ke0 の各成分を非ゼロ構造のスロットに対応させた疎行列Pを使い data = P @ E(ρ) で組み立て直すため、
+    1反復の計算は数値的な組み立て・分解1回・前進後退代入のみである。Kの非ゼロ構造は反復によらないため、2回目以降の分解は
+    最初の分解の順序付けを再利用する(LinearSolverのrefactor)。ハンギングノードの従属自由度はSolverと同様に扱う。密度はフィルター半径内の要素の重み付き平均(密度フィルター)で平滑化し、
+    最適性規準法(OC法)で更新する。荷重ケースが複数ある場合は各ケースのコンプライアンスの和を最小化する。
+
+    Attributes:
+        solver (Solver): 最初の解析結果(mesh, renumbering, D, gps, F, 境界条件を共有)
+        x (array n_elem): 設計変数(フィルター前の密度)
+        densities (array n_elem): フィルター後の密度(剛性の算出に使う密度)
+        element_strain_energy (array n_elem): 現在の密度での要素ごとのひずみエネルギー(全荷重ケースの和)
+        compliance (float): 現在のコンプライアンス(= 2 x ひずみエネルギー)
+        d_internal (array 2node_num x n_case): 現在の密度での全体変位ベクトル(内部自由度順、最初の反復の前はNone)
+        linear_solver (DirectSolver, IterativeSolver or MixedPrecisionSolver): 直近の分解(最初の解析の前はNone)
+        history ([dict]): 反復ごとの記録 {"iteration", "compliance", "volume", "change"}
+    """
+    PENAL = 3.0
+    E_MIN = 1e-9
+    MOVE = 0.2
+
+    def __init__(self,fem_model,volume_fraction=0.5,penal=PENAL,filter_radius=None,E_min=E_MIN,move=MOVE):
+        """
+        Args:
+            volume_fraction (float): 体積制約(全体積に対する比)
+            penal (float): ペナルティ係数p
+            filter_radius (float): 密度フィルターの半径(省略時は要素の平均寸法の1.5倍)
+            E_min (float): 密度0の要素の剛性の比(Kの特異化を防ぐ)
+            move (float): 1反復での密度の変更量の上限
+        """
+        if fem_model.analysis_setting.get("assembly","sparse") == "dense":
+            raise ValueError("TopologyOptimization requires sparse assembly")
+        self.solver = Solver(fem_model)
+        self.fem_model = fem_model
+        self.mesh = fem_model.mesh
+        self.volume_fraction = volume_fraction
+        self.penal = penal
+        self.E_min = E_min
+        self.move = move
+
+        mesh = self.mesh
+        self.pattern = SparseAssembly.get_pattern(fem_model)
+        n_elem = len(mesh.element_ids)
+        kernel = CalcStifness.element_kernel(fem_model)
+        self.Ke0 = kernel(mesh.coords[mesh.connectivity],self.solver.D,mesh.get_element_thickness(),self.solver.gps,
+                          group=self.solver.element_group)
+        #data = P @ E(ρ) となる疎行列 P (nnz x n_elem)
+        n_entries = self.Ke0.shape[1] * self.Ke0.shape[2]
+        self.P = sp.csr_matrix((self.Ke0.ravel(),(self.pattern.slot.ravel(),np.repeat(np.arange(n_elem),n_entries))),
+                               shape=(self.pattern.nnz,n_elem))
+
+        corner = mesh.coords[mesh.connectivity[:,:4]]
+        x, y = corner[...,0], corner[...,1]
+        self.area = 0.5 * np.abs(np.sum(x * np.roll(y,-1,axis=1) - np.roll(x,-1,axis=1) * y,axis=1))
+        self.filter_radius = filter_radius or 1.5 * np.sqrt(np.mean(self.area))
+        self.H = TopologyOptimization.filter_matrix(corner.mean(axis=1),self.filter_radius)
+        self.thickness = mesh.get_element_thickness()
+
+        self.x = np.full(n_elem,float(volume_fraction))
+        self.densities = self.filter(self.x)
+        self.element_strain_energy = None
+        self.compliance = None
+        self.d_internal = None
+        self.linear_solver = None
+        self.history = []
+
+    @staticmethod
+    def filter_matrix(centroids,radius):
+        """
+        密度フィルターの重み行列 H_ij = max(0, radius - |x_i - x_j|) を算出。
+
+        Returns:
+            H (csr_matrix n_elem x n_elem): 重み行列
+        """
+        tree = cKDTree(centroids)
+        pairs = tree.sparse_distance_matrix(tree,radius,output_type="ndarray")
+        n = len(centroids)
+        H = sp.csr_matrix((radius - pairs["v"],(pairs["i"],pairs["j"])),shape=(n,n))
+        H.eliminate_zeros()
+        return H
+
+    def filter(self,x):
+        """
+        密度フィルター(フィルター半径内の要素密度の、重みH_ij x 要素面積による加重平均)。
+        """
+        return self.H @ (self.area * x) / (self.H @ self.area)
+
+    def filter_gradient(self,g):
+        """
+        フィルター後の密度に対する感度を設計変数に対する感度に変換(filterの転置)。
+        """
+        return self.area * (self.H.T @ (g / (self.H @ self.area)))
+
+    def stiffness_scale(self,densities):
+        return self.E_min + densities**self.penal * (1.0 - self.E_min)
+
+    def analyze(self,densities):
+        """
+        密度からKを組み立て直して分解し、全荷重ケースの変位・要素ごとのひずみエネルギーを算出。
+
+        Returns:
+            d (array 2node_num x n_case): 全体変位ベクトル(内部自由度順)
+            ce (array n_elem): 密度1とした場合の要素ごとのひずみエネルギーの2倍 u_e^T Ke0 u_e (全荷重ケースの和)
+        """
+        K = self.pattern.to_csr(self.P @ self.stiffness_scale(densities))
+        system = ConstrainedSystem(K,self.solver.bc_dist_dict,self.create_solver,self.solver.ties)
+        d = system.solve(self.solver.F)
+        ue = d[self.pattern.dofs]
+        ce = np.einsum("eic,eij,ejc->e",ue,self.Ke0,ue)
+        return d, ce
+
+    def create_solver(self,K_ff,dof_node):
+        """
+        最初はK_ffのソルバーを作成し、2回目以降は同じソルバーで順序付けを再利用して分解し直す(ConstrainedSystem用)。
+        """
+        if self.linear_solver is None:
+            self.linear_solver = LinearSolver.create(self.fem_model,K_ff,dof_node)
+        else:
+            self.linear_solver.refactor(K_ff)
+        return self.linear_solver
+
+    def oc_update(self,dc,dv):
+        """
+        最適性規準法で設計変数を更新(体積制約のラグランジュ乗数は二分法で決定)。
+
+        Args:
+            dc (array n_elem): コンプライアンスの設計変数に対する感度(<=0)
+            dv (array n_elem): 体積の設計変数に対する感度
+
+        Returns:
+            x_new (array n_elem): 更新後の設計変数
+        """
+        x = self.x
+        target = self.volume_fraction * self.area.sum()
+        lower, upper = np.maximum(x - self.move,0.0), np.minimum(x + self.move,1.0)
+        ratio = np.sqrt(np.maximum(-dc,0.0) / dv)
+        l1, l2 = 0.0, 1e9
+        while (l2 - l1) / (l1 + l2) > 1e-4:
+            lmid = 0.5 * (l1 + l2)
+            x_new = np.clip(x * ratio / np.sqrt(lmid),lower,upper)
+            if np.dot(self.area,self.filter(x_new)) > target:
+                l1 = lmid
+            else:
+                l2 = lmid
+        return x_new
+
+    def iterate(self):
+        """
+        1反復(解析・感度・フィルター・OC法による更新)を行う。
+
+        Returns:
+            record (dict): {"iteration", "compliance", "volume", "change"}
+        """
+        profiler = self.solver.profiler
+        with profiler.stage("topology_iteration",iteration=len(self.history)) as counters:
+            d, ce = self.analyze(self.densities)
+            scale = self.stiffness_scale(self.densities)
+            self.element_strain_energy = 1/2 * scale * ce
+            self.compliance = float(np.sum(scale * ce))
+            dc = -self.penal * self.densities**(self.penal - 1) * (1.0 - self.E_min) * ce
+            dc = self.filter_gradient(dc)
+            dv = self.filter_gradient(np.ones_like(self.x))
+            x_new = self.oc_update(dc,dv)
+            change = float(np.max(np.abs(x_new - self.x)))
+            self.x = x_new
+            self.densities = self.filter(x_new)
+            self.d_internal = d
+            record = {"iteration":len(self.history),"compliance":self.compliance,
+                      "volume":float(np.dot(self.area,self.densities) / self.area.sum()),"change":change}
+            counters.update(compliance=self.compliance,change=change)
+        self.history.append(record)
+        return record
+
+    def run(self,max_iterations=100,tol=0.01,callback=None):
+        """
+        設計変数の変更量がtol以下になるまで(またはmax_iterations回)反復。
+
+        Args:
+            callback (function): 各反復の後にcallback(self, record)を呼ぶ
+
+        Returns:
+            densities (array n_elem): フィルター後の密度(elementsの順)
+        """
+        for _ in range(max_iterations):
+            record = self.iterate()
+            if callback is not None:
+                callback(self,record)
+            if record["change"] <= tol:
+                break
+        return self.densities
+
+    def apply_thickness(self):
+        """
+        現在の密度を要素の厚さ(最初の厚さ x 密度)としてメッシュに反映(壁厚の最適化として結果を通常の解析に渡す場合)。
+        """
+        self.mesh.set_element_thickness(np.arange(len(self.mesh.element_ids)),self.thickness * self.densities)
@@ -0,0 +1,244 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import time
+import numpy as np
+import scipy
+
+from Model.FEMModel import FEMModel
+from Analysis.Solver import Solver
+from Analysis.Profiler import Profiler
+from Benchmark.MeshGenerator import MeshGenerator
+
+class Benchmark:
+    """
+    構造格子の片持ち梁・平板を要素分割数を変えて解析し、段階ごとの時間と理論解に対する誤差を記録するクラス。
+
+    問題:
+        cantilever: 先端せん断荷重を受ける片持ち梁(L/H=10, nx=10ny)。固定端・載荷端から離れた断面 x = 0.3L, 0.5L, 0.7L の
+                    断面内のy変位の平均 v の2階差分 v(0.3L) - 2v(0.5L) + v(0.7L) を梁の理論解 (0.2L)^2 x P(L - 0.5L)/(EI) と比較する。
+                    Timoshenko梁のせん断変形の項 Px/(κGA) やポアソン効果の項はxの1次式で2階差分では消え、固定端の拘束・
+                    載荷端の荷重分布の局所的な影響(Saint-Venantの原理)も端から3H離れた断面では無視できるため、差は離散化誤差のみとなる
+        plate: 一様引張を受ける平板(nx=ny)。右端のx変位の平均を σL/E と比較する(一定応力のパッチテストで、
+               8節点要素も中間節点に等価節点荷重を与えるため、全要素タイプで厳密解と一致する)
+    """
+    ELEMENT_TYPES = ("Quad_4node","Quad_8node","Quad_4node_Incomp")
+    PROBLEMS = ("cantilever","plate")
+    SIZES = (4,8,16,32)
+    #cantileverの変位を比較する断面(梁の長さに対する位置、等間隔)
+    STATIONS = (0.3,0.5,0.7)
+    #要素の変位の収束次数p(4節点・非適合要素は双1次でh^2、8節点要素は2次でh^3)
+    CONVERGENCE_ORDER = {"Quad_4node":2,"Quad_8node":3,"Quad_4node_Incomp":2}
+    #plateは一定応力のパッチテストで、全要素タイプで丸め誤差を除き厳密解と一致する
+    PATCH_TOLERANCE = 1e-8
+
+    @staticmethod
+    def tolerance(problem,element_type,ny):
+        """
+        理論解との相対誤差の許容値。cantileverは離散化誤差 C h^p の上限として、高さ方向1要素(ny=1)の誤差が100%未満
+        (C < 1)であることと収束次数pから ny^-p とする。
+
+        Returns:
+            tolerance (float): 分割数nyでの許容値
+        """
+        if problem == "plate":
+            return Benchmark.PATCH_TOLERANCE
+        return float(ny)**-Benchmark.CONVERGENCE_ORDER[element_type]
+
+    @staticmethod
+    def generate(problem,element_type,ny,**analysis_settings):
+        """
+        Returns:
+            data (dict): FEMModelの入力データ
+            nx (int): x方向の要素分割数
+        """
+        if problem == "cantilever":
+            nx = 10 * ny
+            return MeshGenerator.cantilever(nx,ny,element_type,**analysis_settings), nx
+        elif problem == "plate":
+            return MeshGenerator.plate(ny,ny,element_type,**analysis_settings), ny
+        raise ValueError("Unknown problem: {}".format(problem))
+
+    @staticmethod
+    def analytic(problem,data):
+        """
+        Returns:
+            value (float): 理論解(cantileverは断面のy変位の2階差分、plateは右端のx変位)
+        """
+        E = data["materials"][0]["E"]
+        t = data["sections"][0]["thickness"]
+        x = np.array([node["x"] for node in data["nodes"]])
+        y = np.array([node["y"] for node in data["nodes"]])
+        L, H = x.max() - x.min(), y.max() - y.min()
+        load = np.sum([load["value"] for load in data["loads"]],axis=0)
+        if problem == "cantilever":
+            P = load[1]
+            I = t * H**3 / 12
+            #v = P/(EI) (Lx^2/2 - x^3/6) の2階差分 a^2 v''(x_mid) (3次式のため厳密)
+            a = (Benchmark.STATIONS[1] - Benchmark.STATIONS[0]) * L
+            return a**2 * P * (L - Benchmark.STATIONS[1] * L) / (E * I)
+        return load[0] / (H * t) * L / E
+
+    @staticmethod
+    def measure(problem,solver,nx,ny):
+        """
+        Returns:
+            value (float): 解析結果(cantileverは断面の隅節点の平均y変位の2階差分、plateは右端の節点の平均x変位)
+        """
+        section = lambda i: np.arange(ny + 1) * (nx + 1) + i
+        if problem == "cantilever":
+            v = [np.mean(solver.d[2 * section(int(round(s * nx))) + 1]) for s in Benchmark.STATIONS]
+            return float(v[0] - 2 * v[1] + v[2])
+        return float(np.mean(solver.d[2 * section(nx)]))
+
+    @staticmethod
+    def run_case(problem,element_type,ny,repeat=1,**analysis_settings):
+        """
+        1ケースをrepeat回解析し、段階ごとの最小時間と誤差を記録。
+
+        Returns:
+            result (dict): 問題規模・段階ごとの時間・理論解との誤差
+        """
+        best = None
+        for _ in range(repeat):
+            profiler = Profiler()
+            with profiler.stage("generate"):
+                data, nx = Benchmark.generate(problem,element_type,ny,**analysis_settings)
+                text = json.dumps(data)
+            with profiler.stage("read_json"):
+                data = json.loads(text)
+            analytic = Benchmark.analytic(problem,data)
+            solver = Solver(FEMModel(data,profiler))
+            stages = {record["name"]:record for record in profiler.stages}
+            if best is None:
+                best = stages
+            else:
+                for name,record in stages.items():
+                    if record["wall"] < best[name]["wall"]:
+                        best[name] = record
+        value = Benchmark.measure(problem,solver,nx,ny)
+        rel_error = abs(value - analytic) / abs(analytic)
+        return {"problem":problem,"element_type":element_type,"nx":nx,"ny":ny,
+                "n_elements":len(solver.mesh.element_ids),"n_dof":2 * len(solver.mesh.node_ids),
+                "nnz":best["K"]["counters"]["nnz"],"n_chunks":best["K"]["counters"].get("n_chunks"),"solver":best["solve"]["counters"]["method"],
+                "wall":{name:record["wall"] for name,record in best.items()},
+                "cpu":{name:record["cpu"] for name,record in best.items()},
+                "total_wall":sum(record["wall"] for name,record in best.items() if name != "generate" and record["depth"] == 0),
+                "max_rss":max(record["max_rss"] or 0 for record in best.values()),
+                "value":value,"analytic":analytic,"rel_error":rel_error,
+                "tolerance":Benchmark.tolerance(problem,element_type,ny),
+                "passed":bool(rel_error <= Benchmark.tolerance(problem,element_type,ny))}
+
+    @staticmethod
+    def run(problems=PROBLEMS,element_types=ELEMENT_TYPES,sizes=SIZES,repeat=1,verbose=True,**analysis_settings):
+        """
+        全ケースを解析。
+
+        Returns:
+            report (dict): {"meta": 実行環境, "results": [run_caseの結果]}
+        """
+        results = []
+        for problem in problems:
+            for element_type in element_types:
+                for ny in sizes:
+                    result = Benchmark.run_case(problem,element_type,ny,repeat,**analysis_settings)
+                    results.append(result)
+                    if verbose:
+                        print("{:<11}{:<18}{:>9} dof {:>9.4f} s  err {:.2e} {}".format(
+                            problem,element_type,result["n_dof"],result["total_wall"],result["rel_error"],
+                            "ok" if result["passed"] else "NG"))
+        return {"meta":Benchmark.meta(analysis_settings),"results":results}
+
+    @staticmethod
+    def scaling(problem,element_type,ny,workers,repeat=1,verbose=True,**analysis_settings):
+        """
+        組み立てのスレッド数(analysis_settingsの"assembly_workers")を変えて同じケースを解析し、Kの組み立て時間の速度向上率を記録。
+
+        Args:
+            workers ([int]): スレッド数のリスト(先頭を基準とする)
+
+        Returns:
+            rows ([dict]): スレッド数ごとのKの組み立て時間・全体の時間・速度向上率・組み立てのチャンク数
+        """
+        rows = []
+        for n in workers:
+            result = Benchmark.run_case(problem,element_type,ny,repeat,**dict(analysis_settings,assembly_workers=n))
+            rows.append({"problem":problem,"element_type":element_type,"n_dof":result["n_dof"],"workers":n,
+                         "n_chunks":result["n_chunks"],"cpu_count":os.cpu_count(),"K_wall":result["wall"]["K"],"K_cpu":result["cpu"]["K"],"total_wall":result["total_wall"],
+                         "speedup":rows[0]["K_wall"] / result["wall"]["K"] if rows else 1.0})
+            if verbose:
+                print("{:<11}{:<18}{:>9} dof {:>3} workers {:>4} chunks  K {:>9.4f} s  x{:.2f}".format(
+                    problem,element_type,result["n_dof"],n,result["n_chunks"],result["wall"]["K"],rows[-1]["speedup"]))
+        return rows
+
+    @staticmethod
+    def meta(analysis_settings):
+        """
+        Returns:
+            meta (dict): 実行日時・gitのコミット・Python/NumPy/SciPyのバージョン・CPU数など
+        """
+        try:
+            commit = subprocess.run(["git","rev-parse","HEAD"],cwd=os.path.dirname(os.path.abspath(__file__)),
+                                    capture_output=True,text=True,check=True).stdout.strip()
+        except (OSError,subprocess.CalledProcessError):
+            commit = None
+        return {"time":time.strftime("%Y-%m-%dT%H:%M:%S"),"commit":commit,"platform":platform.platform(),
+                "python":platform.python_version(),"numpy":np.__version__,"scipy":scipy.__version__,
+                "cpu_count":os.cpu_count(),"analysis_settings":analysis_settings}
+
+    @staticmethod
+    def compare(base,new):
+        """
+        2つのベンチマーク結果の段階ごとの時間を比較(new / base)。
+
+        Args:
+            base, new (dict): runの結果
+
+        Returns:
+            rows ([dict]): ケースごとの時間の比と誤差
+        """
+        key = lambda result: (result["problem"],result["element_type"],result["ny"])
+        base_results = {key(result):result for result in base["results"]}
+        rows = []
+        for result in new["results"]:
+            old = base_results.get(key(result))
+            if old is None:
+                continue
+            ratio = {name:result["wall"][name] / old["wall"][name] for name in result["wall"]
+                     if name in old["wall"] and old["wall"][name] > 0}
+            rows.append({"problem":result["problem"],"element_type":result["element_type"],"n_dof":result["n_dof"],
+                         "total_ratio":result["total_wall"] / old["total_wall"],"stage_ratio":ratio,
+                         "rel_error":(old["rel_error"],result["rel_error"])})
+        return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="解析パイプラインのベンチマーク")
+    parser.add_argument("-o","--out",default="benchmark.json",help="結果のJSONファイル")
+    parser.add_argument("--problems",nargs="+",default=list(Benchmark.PROBLEMS),choices=Benchmark.PROBLEMS)
+    parser.add_argument("--elements",nargs="+",default=list(Benchmark.ELEMENT_TYPES),choices=Benchmark.ELEMENT_TYPES)
+    parser.add_argument("--sizes",nargs="+",type=int,default=list(Benchmark.SIZES),help="y方向の要素分割数")
+    parser.add_argument("--repeat",type=int,default=1,help="各ケースの繰り返し回数(段階ごとの最小時間を記録)")
+    parser.add_argument("--settings",default="{}",help="analysis_settingsに追加する設定(JSON)")
+    parser.add_argument("--compare",help="比較対象のベンチマーク結果(JSON)")
+    parser.add_argument("--workers",nargs="+",type=int,help="組み立てのスレッド数を変えた速度向上率も記録(最大の要素分割数のみ)")
+    args = parser.parse_args(argv)
+
+    report = Benchmark.run(args.problems,args.elements,args.sizes,args.repeat,**json.loads(args.settings))
+    if args.workers:
+        report["scaling"] = [row for problem in args.problems for element_type in args.elements
+                             for row in Benchmark.scaling(problem,element_type,max(args.sizes),args.workers,args.repeat,
+                                                          **json.loads(args.settings))]
+    with open(args.out,"w",encoding="utf-8") as f:
+        json.dump(report,f,indent=1)
+    if args.compare:
+        with open(args.compare,"r",encoding="utf-8") as f:
+            base = json.load(f)
+        for row in Benchmark.compare(base,report):
+            print("{:<11}{:<18}{:>9} dof  x{:.2f}".format(row["problem"],row["element_type"],row["n_dof"],row["total_ratio"]))
+    return 0 if all(result["passed"] for result in report["results"]) else 1
+
+if __name__ == "__main__":
+    #python -m Benchmark.Benchmark -o benchmark.json
+    raise SystemExit(main())
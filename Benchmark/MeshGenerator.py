@@ -0,0 +1,123 @@
+import numpy as np
+from Model.FEMModel import FEMModel
+
+class MeshGenerator:
+    """
+    ベンチマーク用の構造格子メッシュをFEMModelの入力形式(JSONと同じ辞書)で作成するクラス。
+    節点番号は j*(nx+1)+i (i: x方向, j: y方向)、要素は左下から反時計回りの4節点で、8節点要素の中間節点はFEMModelで生成される。
+    8節点要素の辺の分布荷重は、FEMModelと同じ番号付けで求めた中間節点にも等価節点荷重として配分する。
+    """
+    MATERIAL = {"id":0,"name":"Steel","E":205000.0,"nu":0.3}
+
+    @staticmethod
+    def grid(nx,ny,L,H):
+        """
+        Returns:
+            nodes ([dict]): 節点
+            elements ([dict]): 要素
+        """
+        i, j = np.meshgrid(np.arange(nx + 1),np.arange(ny + 1))
+        x, y = (L * i / nx).ravel(), (H * j / ny).ravel()
+        nodes = [{"id":k,"x":float(x[k]),"y":float(y[k])} for k in range(len(x))]
+        i, j = np.meshgrid(np.arange(nx),np.arange(ny))
+        n0 = (j * (nx + 1) + i).ravel()
+        conn = np.column_stack([n0,n0 + 1,n0 + nx + 2,n0 + nx + 1]).tolist()
+        elements = [{"id":k,"nodes":nodes_e,"section_id":0} for k,nodes_e in enumerate(conn)]
+        return nodes, elements
+
+    @staticmethod
+    def mid_nodes(elements,n_nodes,nodes_on_edge):
+        """
+        Returns:
+            mid ([int]): 辺上の隅節点の間(nodes_on_edge[k] - nodes_on_edge[k+1])の8節点要素の中間節点番号
+        """
+        a, b, _ = FEMModel.number_mid_nodes([elem["nodes"] for elem in elements],n_nodes)
+        edge_mid = {(int(p),int(q)):n_nodes + i for i,(p,q) in enumerate(zip(np.minimum(a,b),np.maximum(a,b)))}
+        return [edge_mid[(min(p,q),max(p,q))] for p,q in zip(nodes_on_edge[:-1],nodes_on_edge[1:])]
+
+    @staticmethod
+    def edge_loads(nodes_on_edge,total,mid_nodes=None):
+        """
+        辺上の節点に等分布の荷重を配分。中間節点が無い場合は台形則(1/2, 1/2)、
+        中間節点がある場合は2次要素の等価節点荷重(隅節点1/6, 中間節点2/3)。
+
+        Args:
+            nodes_on_edge ([int]): 辺上の隅節点番号(等間隔)
+            total ([float, float]): 合計荷重[x方向、y方向]
+            mid_nodes ([int]): 隣り合う隅節点の間の中間節点番号(8節点要素の場合)
+
+        Returns:
+            loads ([dict]): 節点荷重
+        """
+        n_edge = len(nodes_on_edge) - 1
+        weight = np.zeros(len(nodes_on_edge))
+        corner_share = 1 / 2 if mid_nodes is None else 1 / 6
+        weight[:-1] += corner_share / n_edge
+        weight[1:] += corner_share / n_edge
+        nodes = list(nodes_on_edge)
+        if mid_nodes is not None:
+            nodes += list(mid_nodes)
+            weight = np.concatenate([weight,np.full(n_edge,2 / 3 / n_edge)])
+        return [{"node":int(n),"value":[total[0] * w,total[1] * w]} for n,w in zip(nodes,weight)]
+
+    @staticmethod
+    def right_edge_loads(elements,nx,ny,element_type,total):
+        """
+        右端(x = L)の辺に等分布の荷重を配分。
+
+        Returns:
+            loads ([dict]): 節点荷重
+        """
+        right = [j * (nx + 1) + nx for j in range(ny + 1)]
+        mid = MeshGenerator.mid_nodes(elements,(nx + 1) * (ny + 1),right) if element_type == "Quad_8node" else None
+        return MeshGenerator.edge_loads(right,total,mid)
+
+    @staticmethod
+    def settings(element_type,**analysis_settings):
+        setting = {"analysis_type":"static","solver":"direct","tolerance":1e-6,"element_type":element_type}
+        setting.update(analysis_settings)
+        return [setting]
+
+    @staticmethod
+    def cantilever(nx,ny,element_type,L=10.0,H=1.0,P=-100.0,t=1.0,**analysis_settings):
+        """
+        左端を固定し、右端にせん断荷重Pを受ける片持ち梁。
+
+        Args:
+            nx, ny (int): x, y方向の要素分割数
+            element_type (str): "Quad_4node", "Quad_8node", "Quad_4node_Incomp"
+            L, H, t (float): 梁の長さ・高さ・厚さ
+            P (float): 先端荷重(y方向)
+            analysis_settings: analysis_settingsに追加する設定
+
+        Returns:
+            data (dict): FEMModelの入力データ
+        """
+        nodes, elements = MeshGenerator.grid(nx,ny,L,H)
+        left = [j * (nx + 1) for j in range(ny + 1)]
+        return {"analysis_settings":MeshGenerator.settings(element_type,**analysis_settings),
+                "materials":[dict(MeshGenerator.MATERIAL)],
+                "sections":[{"id":0,"type":"plane_stress","thickness":t}],
+                "nodes":nodes,"elements":elements,
+                "boundary_conditions":[{"node":n,"type":[0,0]} for n in left],
+                "loads":MeshGenerator.right_edge_loads(elements,nx,ny,element_type,[0.0,P])}
+
+    @staticmethod
+    def plate(nx,ny,element_type,L=1.0,H=1.0,sigma=100.0,t=1.0,**analysis_settings):
+        """
+        左端をx方向、右下の節点をy方向に拘束し、右端に一様な引張応力sigmaを受ける平板。
+
+        Returns:
+            data (dict): FEMModelの入力データ
+        """
+        nodes, elements = MeshGenerator.grid(nx,ny,L,H)
+        left = [j * (nx + 1) for j in range(ny + 1)]
+        right = [j * (nx + 1) + nx for j in range(ny + 1)]
+        #左下ではなく右下の節点をy方向に拘束する(8節点要素の中間節点が左端のx方向拘束を引き継ぐように)
+        bcs = [{"node":n,"type":[0,None]} for n in left] + [{"node":right[0],"type":[None,0]}]
+        return {"analysis_settings":MeshGenerator.settings(element_type,**analysis_settings),
+                "materials":[dict(MeshGenerator.MATERIAL)],
+                "sections":[{"id":0,"type":"plane_stress","thickness":t}],
+                "nodes":nodes,"elements":elements,
+                "boundary_conditions":bcs,
+                "loads":MeshGenerator.right_edge_loads(elements,nx,ny,element_type,[sigma * H * t,0.0])}
@@ -1,18 +1,143 @@
-from Model.FEMModel import FEMModel
-from Model.Visualize import Visualize as ModelV
-from Analysis.Solver import Solver
-from Result.Visualize import Visualize as ResultV
-import json
-
-if __name__ == "__main__":
-     json_file = r"C:\Users\syuhe\Desktop\02_開発\02_Finite Element Analysis\inputFromGH.json"
-    #json = r"C:\Users\syuhe\Desktop\02_開発\02_Finite Element Analysis\8-node quadrilateral element\input\input.json"
-     with open(json_file,"r",encoding="utf-8") as f:
-        data = json.load(f)
-        fem_model = FEMModel(data)
-        #print(fem_model.analysis_setting)
-        #modelv = ModelV(fem_model)
-        #modelv.plot_mesh()
-        solver = Solver(fem_model)
-        visualize = ResultV(solver)
-        visualize.plot_stress()
\ No newline at end of file
+import argparse
+import csv
+import glob
+import json
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+def collect_inputs(paths):
+    """
+    入力ファイルを集める(ディレクトリの場合は直下の*.jsonとバイナリ形式の*.fem)。
+    """
+    from Model.BinaryModel import BinaryModel
+    files = []
+    for path in paths:
+        if os.path.isdir(path) and not BinaryModel.is_binary_model(path):
+            files += sorted(glob.glob(os.path.join(path,"*.json")) + glob.glob(os.path.join(path,"*.fem")))
+        else:
+            files.append(path)
+    return files
+
+def output_names(files):
+    """
+    入力ファイルごとの結果ファイル名(拡張子なし)を決める。ファイル名が重複する入力はそれらに共通のディレクトリからの相対パス
+    (区切りは"_")とし、それでも重複する場合は入力の順番を付ける。
+
+    Returns:
+        names ([str]): filesと同じ順の名前
+    """
+    stems = [os.path.splitext(os.path.normpath(path))[0] for path in files]
+    names = [os.path.basename(stem) for stem in stems]
+    counts = {}
+    for name in names:
+        counts[name] = counts.get(name,0) + 1
+    if any(count > 1 for count in counts.values()):
+        common = os.path.commonpath([os.path.abspath(stem) for stem,name in zip(stems,names) if counts[name] > 1])
+        #同じファイルが重複する場合は相対パスが"."になるため、ファイル名のまま順番を付ける
+        relative = [os.path.relpath(os.path.abspath(stem),common) if counts[name] > 1 else os.curdir
+                    for stem,name in zip(stems,names)]
+        names = [name if rel == os.curdir else rel.replace(os.sep,"_") for rel,name in zip(relative,names)]
+    seen = set()
+    for i,name in enumerate(names):
+        if name in seen:
+            names[i] = "{}_{}".format(name,i)
+        seen.add(names[i])
+    return names
+
+def run_model(json_file,out_dir,fmt="json",plot=False,profile=False,name=None):
+    """
+    1モデルを解析し、結果ファイルを書き出す(ワーカープロセスで実行)。
+
+    Args:
+        name (str): 結果ファイル名(拡張子なし、省略時は入力ファイル名)
+
+    Returns:
+        row (dict): サマリー表の1行
+    """
+    from Model.FEMModel import FEMModel
+    from Model.BinaryModel import BinaryModel
+    from Analysis.Solver import Solver
+    from Result.Export import Export
+
+    name = name or os.path.splitext(os.path.basename(os.path.normpath(json_file)))[0]
+    row = {"input":json_file,"status":"ok"}
+    try:
+        t0 = time.perf_counter()
+        if BinaryModel.is_binary_model(json_file):
+            fem_model = BinaryModel.load(json_file)
+        else:
+            with open(json_file,"r",encoding="utf-8") as f:
+                data = json.load(f)
+            fem_model = FEMModel(data)
+        t1 = time.perf_counter()
+        solver = Solver(fem_model)
+        t2 = time.perf_counter()
+        result_file = os.path.join(out_dir,name + "." + fmt)
+        if fmt == "npz":
+            Export.to_npz(solver,result_file)
+        elif fmt == "vtu":
+            Export.to_vtu(solver,result_file)
+        else:
+            Export.to_json(solver,result_file)
+        if plot:
+            from Result.Visualize import Visualize as ResultV
+            ResultV(solver).plot_stress(save_path=os.path.join(out_dir,name + ".png"))
+        if profile:
+            solver.profiler.to_json(os.path.join(out_dir,name + ".profile.json"))
+        t3 = time.perf_counter()
+        row.update({"n_nodes":len(fem_model.mesh.nodes),"n_elements":len(fem_model.mesh.elements),
+                    "n_dof":2 * len(fem_model.mesh.nodes),
+                    "t_model":t1 - t0,"t_solve":t2 - t1,"t_output":t3 - t2,"t_total":t3 - t0,
+                    "strain_energy":float(solver.strain_energy),
+                    "max_dx":float(max(abs(solver.dx))),"max_dy":float(max(abs(solver.dy))),
+                    "result":result_file})
+    except Exception as e:
+        row.update({"status":"error","error":"{}: {}".format(type(e).__name__,e)})
+        traceback.print_exc()
+    return row
+
+SUMMARY_COLUMNS = ["input","status","n_nodes","n_elements","n_dof","t_model","t_solve","t_output","t_total",
+                   "strain_energy","max_dx","max_dy","result","error"]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="2次元有限要素解析のバッチ実行")
+    parser.add_argument("inputs",nargs="+",help="入力JSONファイル、バイナリ形式(.fem)またはそれらを含むディレクトリ")
+    parser.add_argument("-o","--out-dir",default="results",help="結果の出力先ディレクトリ")
+    parser.add_argument("-j","--workers",type=int,default=os.cpu_count(),help="ワーカープロセス数")
+    parser.add_argument("--format",choices=["json","npz","vtu"],default="json",help="結果ファイルの形式")
+    parser.add_argument("--plot",action="store_true",help="応力図をPNGで保存する")
+    parser.add_argument("--profile",action="store_true",help="段階ごとの時間・メモリをJSONで保存する")
+    parser.add_argument("--threads-per-worker",type=int,default=1,help="ワーカーごとのBLASスレッド数")
+    args = parser.parse_args(argv)
+
+    #numpyの読み込み前にBLASのスレッド数を制限(プロセス数 x スレッド数がコア数を超えないように)
+    for var in ("OMP_NUM_THREADS","OPENBLAS_NUM_THREADS","MKL_NUM_THREADS"):
+        os.environ.setdefault(var,str(args.threads_per_worker))
+
+    files = collect_inputs(args.inputs)
+    os.makedirs(args.out_dir,exist_ok=True)
+    t0 = time.perf_counter()
+    names = output_names(files)
+    if args.workers <= 1:
+        rows = [run_model(json_file,args.out_dir,args.format,args.plot,args.profile,name) for json_file,name in zip(files,names)]
+    else:
+        rows = [None] * len(files)
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            futures = {executor.submit(run_model,json_file,args.out_dir,args.format,args.plot,args.profile,name):i
+                       for i,(json_file,name) in enumerate(zip(files,names))}
+            for future in as_completed(futures):
+                rows[futures[future]] = future.result()
+
+    summary_file = os.path.join(args.out_dir,"summary.csv")
+    with open(summary_file,"w",newline="",encoding="utf-8") as f:
+        writer = csv.DictWriter(f,fieldnames=SUMMARY_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+    n_error = sum(row["status"] != "ok" for row in rows)
+    print("{} models ({} errors) in {:.2f} s -> {}".format(len(rows),n_error,time.perf_counter() - t0,summary_file))
+    return 1 if n_error else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
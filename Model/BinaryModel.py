@@ -0,0 +1,169 @@
+import json
+import os
+import sys
+import numpy as np
+
+class BinaryModel:
+    """
+    モデルを型付き配列のバイナリ形式で保存・読み込みするクラス。
+    1モデルを1ディレクトリ(拡張子.fem)とし、配列は個別の.npyファイル(メモリマップ可能)、
+    材料・断面・解析設定などの小さな情報はheader.jsonに保存する。
+
+    配列:
+        node_ids (n_node), coords (n_node x 2)
+        bc_mask (n_node x 2, bool), bc_value (n_node x 2): 変位拘束の有無と値
+        element_ids (n_elem), connectivity (n_elem x 4), section_ids (n_elem), material_ids (n_elem)
+        load_case (n_load), load_node (n_load), load_value (n_load x 2): 荷重(load_caseはload_case_namesの番号)
+    """
+    FORMAT = "fem-binary"
+    VERSION = 2
+    ARRAYS = ("node_ids","coords","bc_mask","bc_value","element_ids","connectivity","section_ids","material_ids",
+              "load_case","load_node","load_value")
+
+    @staticmethod
+    def is_binary_model(path):
+        return os.path.isdir(path) and os.path.isfile(os.path.join(path,"header.json"))
+
+    @staticmethod
+    def from_json(data):
+        """
+        JSONの入力データを配列に変換。
+
+        Returns:
+            header (dict): 材料・断面・解析設定・荷重ケース名・荷重組合せ
+            arrays ({name: array}): 節点・要素・境界条件・荷重の配列
+        """
+        nodes = data["nodes"]
+        node_ids = np.array([node["id"] for node in nodes],dtype=np.int64)
+        coords = np.array([[node["x"],node["y"]] for node in nodes],dtype=np.float64)
+        row = {node_id:i for i,node_id in enumerate(node_ids.tolist())}
+
+        bc_mask = np.zeros((len(nodes),2),dtype=bool)
+        bc_value = np.zeros((len(nodes),2),dtype=np.float64)
+        for bc_data in data["boundary_conditions"]:
+            for c,value in enumerate(bc_data["type"]):
+                if value is not None:
+                    bc_mask[row[bc_data["node"]],c] = True
+                    bc_value[row[bc_data["node"]],c] = value
+
+        elements = data["elements"]
+        element_ids = np.array([elem["id"] for elem in elements],dtype=np.int64)
+        connectivity = np.array([elem["nodes"][:4] for elem in elements],dtype=np.int64)
+        section_ids = np.array([elem["section_id"] for elem in elements],dtype=np.int64)
+        #材料の指定が無い要素は最初の材料
+        default_material = data["materials"][0]["id"]
+        material_ids = np.array([elem.get("material_id",default_material) for elem in elements],dtype=np.int64)
+
+        loads = data["loads"]
+        if isinstance(loads,dict):
+            cases = loads["cases"]
+            combinations = loads.get("combinations",[])
+        else:
+            cases = [{"name":"default","loads":loads}]
+            combinations = []
+        load_case, load_node, load_value = [], [], []
+        for j,case in enumerate(cases):
+            for load_data in case["loads"]:
+                load_case.append(j)
+                load_node.append(load_data["node"])
+                load_value.append(load_data["value"])
+
+        header = {"format":BinaryModel.FORMAT,"version":BinaryModel.VERSION,
+                  "analysis_settings":data["analysis_settings"],
+                  "materials":data["materials"],"sections":data["sections"],
+                  "load_case_names":[case["name"] for case in cases],
+                  "load_combinations":combinations}
+        arrays = {"node_ids":node_ids,"coords":coords,"bc_mask":bc_mask,"bc_value":bc_value,
+                  "element_ids":element_ids,"connectivity":connectivity,"section_ids":section_ids,"material_ids":material_ids,
+                  "load_case":np.array(load_case,dtype=np.int64),
+                  "load_node":np.array(load_node,dtype=np.int64),
+                  "load_value":np.array(load_value,dtype=np.float64).reshape(-1,2)}
+        return header, arrays
+
+    @staticmethod
+    def from_fem_model(fem_model):
+        """
+        FEMModelの現在のメッシュ(隅節点のみ)・材料・断面・荷重を配列に変換(細分割したモデルの作成・保存用)。
+
+        Returns:
+            header (dict), arrays ({name: array})
+        """
+        mesh = fem_model.mesh
+        n = mesh.n_corner_nodes
+        names = list(fem_model.load_cases.keys())
+        cases = [fem_model.load_cases[name] for name in names]
+        header = {"format":BinaryModel.FORMAT,"version":BinaryModel.VERSION,
+                  "analysis_settings":[fem_model.analysis_setting],
+                  "materials":[{"id":m.id,"name":m.name,"E":m.E,"nu":m.nu} for m in mesh.material_list],
+                  "sections":[{"id":s.id,"type":s.type,"thickness":s.thickness} for s in mesh.section_list],
+                  "load_case_names":names,
+                  "load_combinations":[{"name":name,"factors":factors} for name,factors in fem_model.load_combinations.items()]}
+        arrays = {"node_ids":mesh.node_ids[:n],"coords":mesh.coords[:n],"bc_mask":mesh.bc_mask[:n],"bc_value":mesh.bc_value[:n],
+                  "element_ids":mesh.element_ids,"connectivity":mesh.connectivity[:,:4],
+                  "section_ids":np.array([s.id for s in mesh.section_list],dtype=np.int64)[mesh.element_section],
+                  "material_ids":np.array([m.id for m in mesh.material_list],dtype=np.int64)[mesh.element_material],
+                  "load_case":np.concatenate([np.full(len(node_ids),j,dtype=np.int64) for j,(node_ids,_) in enumerate(cases)]),
+                  "load_node":np.concatenate([np.asarray(node_ids,dtype=np.int64) for node_ids,_ in cases]),
+                  "load_value":np.concatenate([np.asarray(values,dtype=np.float64).reshape(-1,2) for _,values in cases])}
+        return header, arrays
+
+    @staticmethod
+    def save(path,header,arrays):
+        """
+        配列とヘッダーをディレクトリに保存。
+        """
+        os.makedirs(path,exist_ok=True)
+        for name in BinaryModel.ARRAYS:
+            np.save(os.path.join(path,name + ".npy"),np.ascontiguousarray(arrays[name]))
+        with open(os.path.join(path,"header.json"),"w",encoding="utf-8") as f:
+            json.dump(header,f)
+
+    @staticmethod
+    def convert(json_file,path):
+        """
+        JSON入力ファイルをバイナリ形式に変換。
+        """
+        with open(json_file,"r",encoding="utf-8") as f:
+            data = json.load(f)
+        header, arrays = BinaryModel.from_json(data)
+        BinaryModel.save(path,header,arrays)
+
+    @staticmethod
+    def read(path,mmap_mode="c"):
+        """
+        バイナリ形式の配列とヘッダーを読み込み(既定ではコピーオンライトのメモリマップ)。
+
+        Returns:
+            header (dict), arrays ({name: array})
+        """
+        with open(os.path.join(path,"header.json"),"r",encoding="utf-8") as f:
+            header = json.load(f)
+        if header.get("format") != BinaryModel.FORMAT:
+            raise ValueError("{} is not a {} model".format(path,BinaryModel.FORMAT))
+        names = [name for name in BinaryModel.ARRAYS if not (name == "material_ids" and header.get("version",1) < 2)]
+        arrays = {name:np.load(os.path.join(path,name + ".npy"),mmap_mode=mmap_mode) for name in names}
+        if "material_ids" not in arrays:
+            #version 1は単一材料(最初の材料)
+            arrays["material_ids"] = np.full(len(arrays["element_ids"]),header["materials"][0]["id"],dtype=np.int64)
+        return header, arrays
+
+    @staticmethod
+    def load(path,mmap_mode="c"):
+        """
+        バイナリ形式からFEMModelを作成。
+
+        Returns:
+            fem_model (FEMModel): モデル
+        """
+        from Model.FEMModel import FEMModel
+        from Analysis.Profiler import Profiler
+        profiler = Profiler()
+        with profiler.stage("parse") as counters:
+            header, arrays = BinaryModel.read(path,mmap_mode)
+            counters.update(n_nodes=len(arrays["node_ids"]),n_elements=len(arrays["element_ids"]))
+        profiler.memory = bool(header["analysis_settings"][0].get("profile_memory",False))
+        return FEMModel.from_arrays(header,arrays,profiler)
+
+if __name__ == "__main__":
+    #python -m Model.BinaryModel input.json output.fem
+    BinaryModel.convert(sys.argv[1],sys.argv[2])
@@ -1,103 +1,201 @@
-from Model.Material import Material
-from Model.Section import Section
-from Model.Node import Node
-from Model.Element import Element
-from Model.Mesh import Mesh
-import numpy as np
-
-class FEMModel:
-
-    def __init__(self,data):
-        self.data = data
-        self.materials = self.read_materials()
-        self.sections = self.read_sections()
-        self.nodes = self.read_nodes()
-        self.read_boundary_conditions()
-        self.ori4node = self.nodes.copy()
-        self.elements = self.read_elements()
-        self.read_loads()
-        self.mesh = Mesh(self.nodes,self.elements,self.materials[0])#materialはElementが保持すべき？
-        self.analysis_setting = self.read_analysis_settings()
-        self.generate_mid_nodes()
-
-    def read_materials(self):
-        material_dict = {}
-        for material_data in self.data["materials"]:
-            material_dict[material_data["id"]] = Material(material_data["id"],material_data["name"],material_data["E"],material_data["nu"])
-        return material_dict
-
-    def read_sections(self):
-        section_dict = {}
-        for section_data in self.data["sections"]:
-            section_dict[section_data["id"]] = Section(section_data["id"],section_data["thickness"])
-        return section_dict
-    
-    def read_nodes(self):
-        node_dict = {}
-        for node_data in self.data["nodes"]:
-            node_dict[node_data["id"]] = Node(node_data["id"],node_data["x"],node_data["y"])
-        return node_dict
-
-    def read_elements(self):
-        element_dict = {}
-        for element_data in self.data["elements"]:
-            section = self.sections[element_data["section_id"]]
-            element_dict[element_data["id"]] = Element(element_data["id"],element_data["nodes"],section)
-        return element_dict
-
-    def read_boundary_conditions(self):
-        for bc_data in self.data["boundary_conditions"]:
-            node = self.nodes[bc_data["node"]]
-            node.set_bc_dist(bc_data["type"])
-
-    def read_loads(self):
-        for load_data in self.data["loads"]:
-            node = self.nodes[load_data["node"]]
-            node.set_bc_force(load_data["value"])
-
-    def read_analysis_settings(self):
-        return self.data["analysis_settings"][0]
-
-    def generate_mid_nodes(self):
-        if self.analysis_setting["element_type"] != "Quad_8node":
-            return
-        
-        mid_nodes = {}  # 中間節点の座標を管理 {id:(x,y)}
-        next_node_id = max(self.nodes.keys()) + 1  # 新規節点のID
-
-        for key,elem in self.elements.items():
-            corner_nodes = [self.nodes[id] for id in elem.node[:4]]  # コーナー節点（前4つ）
-            mid_point_ids = []
-            mid_point_xy = []
-            node_dict = {}
-            # 各辺の中間節点を生成
-            for i in range(4):
-                n1 = corner_nodes[i]
-                n2 = corner_nodes[(i + 1) % 4]
-                mid_x = (n1.x + n2.x) / 2
-                mid_y = (n1.y + n2.y) / 2
-                
-                #両端の拘束条件がおなじなら、中間節点にも同じ拘束条件を与える
-                if n1.bc_dist == n2.bc_dist:
-                    mid_bc =  n1.bc_dist
-                else:
-                    mid_bc = [None,None]
-                    
-                # 座標がすでに登録されている場合は共有
-                if (mid_x, mid_y) in mid_nodes:
-                    mid_node_id = mid_nodes[(mid_x, mid_y)]
-                else:
-                    mid_node_id = next_node_id
-                    self.nodes[mid_node_id] = Node(mid_node_id, mid_x, mid_y)
-                    self.nodes[mid_node_id].bc_dist = mid_bc
-                    mid_nodes[(mid_x, mid_y)] = mid_node_id
-                    next_node_id += 1
-
-                mid_point_ids.append(mid_node_id)
-                mid_point_xy.append(np.array([[mid_x, mid_y]]))
-                node_dict = {id_: coord for id_,coord in zip(mid_point_ids,mid_point_xy)}
-
-            # 要素の節点リストを更新（コーナー節点 + 中間節点）
-            elem.nodes = elem.node[:4] + mid_point_ids
-            elem.add_node(node_dict)
-            
\ No newline at end of file
+from Model.Material import Material
+from Model.Section import Section
+from Model.Mesh import Mesh
+from Model.BinaryModel import BinaryModel
+from Analysis.Profiler import Profiler
+import numpy as np
+
+class FEMModel:
+
+    def __init__(self,data,profiler=None):
+        self.data = data
+        self.profiler = profiler or Profiler.from_setting(data["analysis_settings"][0])
+        with self.profiler.stage("parse") as counters:
+            header, arrays = BinaryModel.from_json(data)
+            counters.update(n_nodes=len(arrays["node_ids"]),n_elements=len(arrays["element_ids"]))
+        self.build(header,arrays)
+
+    @classmethod
+    def from_arrays(cls,header,arrays,profiler=None):
+        """
+        型付き配列からモデルを作成(JSONの節点・要素ごとの辞書を経由しない)。
+
+        Args:
+            header (dict): analysis_settings, materials, sections, load_case_names, load_combinations
+            arrays ({name: array}): BinaryModel.ARRAYSの配列
+            profiler (Profiler): 処理時間の記録先(省略時は新規作成)
+
+        Returns:
+            fem_model (FEMModel): モデル
+        """
+        model = cls.__new__(cls)
+        model.data = header
+        model.profiler = profiler or Profiler.from_setting(header["analysis_settings"][0])
+        model.build(header,arrays)
+        return model
+
+    def build(self,header,arrays):
+        """
+        配列からMeshを作成し、必要に応じて中間節点を生成。
+        """
+        with self.profiler.stage("build_mesh") as counters:
+            self.build_mesh(header,arrays)
+            counters.update(n_nodes=len(self.mesh.node_ids),n_elements=len(self.mesh.element_ids))
+        with self.profiler.stage("mid_nodes") as counters:
+            self.generate_mid_nodes()
+            counters.update(n_nodes=len(self.mesh.node_ids))
+        #荷重は中間節点にも与えられるため、中間節点の生成後に全荷重ケースの節点番号を確認し、最初の荷重ケースをforcesに設定する
+        FEMModel.check_load_nodes(self.load_cases,len(self.mesh.node_ids))
+        first_nodes, first_values = self.load_cases[header["load_case_names"][0]]
+        np.add.at(self.mesh.forces,first_nodes,first_values)
+
+    @staticmethod
+    def check_load_nodes(load_cases,n_nodes):
+        """
+        全荷重ケースの荷重の節点番号が0~n_nodes-1(8節点要素では生成した中間節点を含む)の範囲にあるか確認。
+
+        Args:
+            load_cases ({name: (array n_load, array n_load x 2)}): 荷重ケースごとの(節点番号, 荷重)
+            n_nodes (int): 節点数
+        """
+        for name,(nodes,_) in load_cases.items():
+            bad = np.asarray(nodes)[(np.asarray(nodes) < 0) | (np.asarray(nodes) >= n_nodes)]
+            if len(bad):
+                raise ValueError("Load on unknown node {} in load case {}".format(int(bad[0]),name))
+
+    def build_mesh(self,header,arrays):
+        self.materials = self.read_materials()
+        self.sections = self.read_sections()
+        self.analysis_setting = self.read_analysis_settings()
+        self.load_cases, self.load_combinations = self.read_loads(header,arrays)
+
+        section_list = list(self.sections.values())
+        element_section = FEMModel.id_to_row(arrays["section_ids"],section_list)
+        material_list = list(self.materials.values())
+        element_material = FEMModel.id_to_row(arrays["material_ids"],material_list)
+
+        n_nodes = len(arrays["node_ids"])
+        self.mesh = Mesh(arrays["node_ids"],arrays["coords"],arrays["bc_mask"],arrays["bc_value"],np.zeros((n_nodes,2)),
+                         arrays["element_ids"],arrays["connectivity"],element_section,section_list,
+                         element_material,material_list)
+
+    @staticmethod
+    def id_to_row(ids,items):
+        """
+        要素ごとの断面・材料のidをリストのインデックスに変換。
+
+        Args:
+            ids (array n_elem): id
+            items ([Section] or [Material]): 断面・材料のリスト
+
+        Returns:
+            rows (array n_elem): itemsのインデックス
+        """
+        item_row = {item.id:i for i,item in enumerate(items)}
+        unique_ids, inverse = np.unique(np.asarray(ids),return_inverse=True)
+        return np.array([item_row[i] for i in unique_ids.tolist()],dtype=np.int64)[inverse.ravel()]
+
+    @property
+    def nodes(self):
+        return self.mesh.nodes
+
+    @property
+    def ori4node(self):
+        return self.mesh.ori4node
+
+    @property
+    def elements(self):
+        return self.mesh.elements
+
+    def read_materials(self):
+        material_dict = {}
+        for material_data in self.data["materials"]:
+            material_dict[material_data["id"]] = Material(material_data["id"],material_data["name"],material_data["E"],material_data["nu"])
+        return material_dict
+
+    def read_sections(self):
+        section_dict = {}
+        for section_data in self.data["sections"]:
+            section_dict[section_data["id"]] = Section(section_data["id"],section_data["thickness"],
+                                                       section_data.get("type","plane_stress"))
+        return section_dict
+
+    def read_loads(self,header,arrays):
+        """
+        荷重を読み込み。"loads"は荷重のリスト(単一ケース)か、名前付き荷重ケースとその線形結合をまとめた辞書
+        {"cases": [{"name": str, "loads": [...]}], "combinations": [{"name": str, "factors": {case_name: factor}}]}。
+        8節点要素では荷重の節点番号に生成される中間節点の番号(number_mid_nodesの番号)も指定できる(等価節点荷重の入力用)。
+        節点番号の確認とMeshのforces(最初の荷重ケース)の設定は中間節点の生成後にbuildで行う。
+
+        Returns:
+            load_cases ({name: (array n_load, array n_load x 2)}): 荷重ケースごとの(節点番号, 荷重)
+            load_combinations ({name: {case_name: factor}}): 荷重組合せ
+        """
+        names = header["load_case_names"]
+        load_case = np.asarray(arrays["load_case"])
+        load_node = np.asarray(arrays["load_node"])
+        load_value = np.asarray(arrays["load_value"])
+        load_cases = {}
+        for j,name in enumerate(names):
+            in_case = load_case == j
+            load_cases[name] = (load_node[in_case],load_value[in_case])
+        load_combinations = {}
+        for combination in header["load_combinations"]:
+            for case_name in combination["factors"]:
+                if case_name not in load_cases:
+                    raise ValueError("Unknown load case {} in combination {}".format(case_name,combination["name"]))
+            load_combinations[combination["name"]] = combination["factors"]
+        return load_cases, load_combinations
+
+    def read_analysis_settings(self):
+        return self.data["analysis_settings"][0]
+
+    def generate_mid_nodes(self):
+        """
+        8節点要素の場合、隅節点の組(辺)ごとに中間節点を生成。
+        辺は両端の節点番号を昇順に並べた組で一意化し、隣接要素とは同じ中間節点を共有する。
+        中間節点の番号は辺が最初に現れた順に隅節点の後ろへ付ける。
+        """
+        if self.analysis_setting["element_type"] != "Quad_8node":
+            return
+
+        mesh = self.mesh
+        n_nodes = len(mesh.node_ids)
+        corner = mesh.connectivity[:,:4]
+        a, b, mid_conn = FEMModel.number_mid_nodes(corner,n_nodes)
+
+        coords = (mesh.coords[a] + mesh.coords[b]) / 2
+        #両端の拘束条件がおなじなら、中間節点にも同じ拘束条件を与える
+        same = np.all(mesh.bc_mask[a] == mesh.bc_mask[b],axis=1) & np.all(mesh.bc_value[a] == mesh.bc_value[b],axis=1)
+        bc_mask = mesh.bc_mask[a] & same[:,None]
+        bc_value = np.where(bc_mask,mesh.bc_value[a],0.0)
+
+        # 要素の節点リストを更新（コーナー節点 + 中間節点）
+        mesh.add_nodes(coords,bc_mask,bc_value)
+        mesh.set_connectivity(np.hstack([corner,mid_conn]))
+
+    @staticmethod
+    def number_mid_nodes(corner,n_nodes):
+        """
+        8節点要素の中間節点の番号付け(generate_mid_nodesと同じ番号を入力データの作成側でも求められるように分けたもの)。
+        辺は両端の節点番号を昇順に並べた組で一意化し、辺が最初に現れた順に n_nodes から番号を付ける。
+
+        Args:
+            corner (array n_elem x 4): 隅節点番号
+            n_nodes (int): 隅節点数
+
+        Returns:
+            a, b (array n_edge): 中間節点番号順の辺の両端の節点番号
+            mid_conn (array n_elem x 4): 各要素の辺(隅節点i -> i+1)の中間節点番号
+        """
+        corner = np.asarray(corner,dtype=np.int64)
+        n1 = corner.ravel()
+        n2 = np.roll(corner,-1,axis=1).ravel()
+        keys = np.minimum(n1,n2) * n_nodes + np.maximum(n1,n2)
+        _, first, inverse = np.unique(keys,return_index=True,return_inverse=True)
+        #np.uniqueはキー順に並ぶため、辺の出現順に番号を付け直す
+        order = np.argsort(first,kind="stable")
+        rank = np.empty(len(order),dtype=np.int64)
+        rank[order] = np.arange(len(order))
+        edge = first[order]
+        return n1[edge], n2[edge], n_nodes + rank[inverse.ravel()].reshape(-1,4)
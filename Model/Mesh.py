@@ -1,17 +1,215 @@
-class Mesh:
-    """
-    NodeオブジェクトとElementオブジェクトをまとめておくクラス
-    
-    Attributes:
-        nodes ({Node.id: Node}): Nodeの辞書
-        elements ({Element.id: Element}): Elementの辞書
-    """
-    def __init__(self,nodes,elements,material):
-        self.nodes = nodes
-        self.elements = elements
-        self.material = material
-        self.get_element_coord()
-
-    def get_element_coord(self):
-        for key,elm in self.elements.items():
-            elm.get_cordination(self.nodes)
+from collections.abc import Mapping
+import numpy as np
+from Model.Node import Node
+from Model.Element import Element
+from Model.Section import Section
+
+class Mesh:
+    """
+    節点・要素の情報を連続した配列(struct-of-arrays)でまとめておくクラス。
+    節点番号は0~n_node-1の連番とし、配列の行番号と一致させる。
+
+    Attributes:
+        node_ids (array n_node): 節点番号
+        coords (array n_node x 2): 節点座標
+        bc_mask (array n_node x 2, bool): 変位拘束の有無
+        bc_value (array n_node x 2): 拘束変位
+        forces (array n_node x 2): 節点荷重(最初の荷重ケース)
+        n_corner_nodes (int): 入力された(隅)節点の数。中間節点はその後ろに追加される
+        element_ids (array n_elem): 要素番号
+        connectivity (array n_elem x n_nodes_e): 要素の節点番号
+        element_section (array n_elem): 要素の断面(section_listのインデックス)
+        section_list ([Section]): 断面のリスト
+        element_material (array n_elem): 要素の材料(material_listのインデックス)
+        material_list ([Material]): 材料のリスト
+        hanging_nodes (array n_hanging): ハンギングノード(細分割した要素の辺上にあり、隣接する要素の節点ではない節点)
+        hanging_parents (array n_hanging x 2): ハンギングノードが乗る辺の両端の節点(変位は両端の平均に従属させる)
+        nodes ({Node.id: Node}): Nodeビューの辞書
+        elements ({Element.id: Element}): Elementビューの辞書
+        sparse_pattern (SparsityPattern): 全体剛性マトリクスの非ゼロ構造(初回の組み立て時に作成)
+        renumbering (Renumbering): 節点番号と内部自由度番号の対応(初回の組み立て時に作成)
+    """
+    def __init__(self,node_ids,coords,bc_mask,bc_value,forces,element_ids,connectivity,element_section,section_list,
+                 element_material,material_list):
+        node_ids = np.asarray(node_ids,dtype=np.int64)
+        if not np.array_equal(node_ids,np.arange(len(node_ids))):
+            order = np.argsort(node_ids)
+            if not np.array_equal(node_ids[order],np.arange(len(node_ids))):
+                raise ValueError("Node ids must be 0..{}".format(len(node_ids) - 1))
+            coords, bc_mask, bc_value, forces = coords[order], bc_mask[order], bc_value[order], forces[order]
+            node_ids = node_ids[order]
+        self.node_ids = node_ids
+        self.coords = coords
+        self.bc_mask = bc_mask
+        self.bc_value = bc_value
+        self.forces = forces
+        self.n_corner_nodes = len(node_ids)
+        self.element_ids = np.asarray(element_ids,dtype=np.int64)
+        self.connectivity = np.asarray(connectivity,dtype=np.int64)
+        self.element_section = np.asarray(element_section,dtype=np.int64)
+        self.section_list = section_list
+        self.element_material = np.asarray(element_material,dtype=np.int64)
+        self.material_list = material_list
+        self.hanging_nodes = np.zeros(0,dtype=np.int64)
+        self.hanging_parents = np.zeros((0,2),dtype=np.int64)
+        self.nodes = NodeMap(self,0)
+        self.elements = ElementMap(self)
+        self.sparse_pattern = None
+        self.renumbering = None
+
+    @property
+    def material(self):
+        """
+        Returns:
+            material (Material): 最初の材料
+        """
+        return self.material_list[0]
+
+    @property
+    def ori4node(self):
+        """
+        Returns:
+            ori4node ({Node.id: Node}): 入力された(隅)節点のみのNodeビューの辞書
+        """
+        return NodeMap(self,self.n_corner_nodes)
+
+    def add_nodes(self,coords,bc_mask,bc_value):
+        """
+        節点を末尾に追加。
+
+        Returns:
+            node_ids (array): 追加した節点番号
+        """
+        n = len(self.node_ids)
+        new_ids = np.arange(n,n + len(coords))
+        self.node_ids = np.concatenate([self.node_ids,new_ids])
+        self.coords = np.concatenate([self.coords,coords])
+        self.bc_mask = np.concatenate([self.bc_mask,bc_mask])
+        self.bc_value = np.concatenate([self.bc_value,bc_value])
+        self.forces = np.concatenate([self.forces,np.zeros((len(coords),2))])
+        self.sparse_pattern = None
+        self.renumbering = None
+        return new_ids
+
+    def set_connectivity(self,connectivity):
+        self.connectivity = np.asarray(connectivity,dtype=np.int64)
+        self.sparse_pattern = None
+        self.renumbering = None
+
+    def get_connectivity(self):
+        """
+        Returns:
+            conn (array n_elem x n_nodes): 要素の節点番号(elementsの順)
+        """
+        return self.connectivity
+
+    def get_element_xy(self):
+        """
+        全要素の節点座標を配列にまとめる。
+
+        Returns:
+            xy (array n_elem x n_nodes x 2): 要素節点座標(elementsの順)
+        """
+        return self.coords[self.connectivity]
+
+    def set_element_thickness(self,rows,thickness):
+        """
+        要素の厚さを変更。同じ厚さ・種類の断面があればそれを使い、無ければ断面を追加する(断面の種類は変更しない)。
+
+        Args:
+            rows (array): 要素の行番号(connectivityの行)
+            thickness (float or array): 新しい厚さ
+        """
+        rows = np.asarray(rows,dtype=np.int64)
+        thickness = np.broadcast_to(np.asarray(thickness,dtype=float),rows.shape)
+        section_type = np.array([Section.TYPES.index(section.type) for section in self.section_list])[self.element_section[rows]]
+        values, inverse = np.unique(np.column_stack([thickness,section_type]),axis=0,return_inverse=True)
+        section_row = {(section.thickness,section.type):i for i,section in enumerate(self.section_list)}
+        next_id = max(section.id for section in self.section_list) + 1
+        index = []
+        for value,type_index in values.tolist():
+            key = (value,Section.TYPES[int(type_index)])
+            if key not in section_row:
+                section_row[key] = len(self.section_list)
+                self.section_list.append(Section(next_id,*key))
+                next_id += 1
+            index.append(section_row[key])
+        self.element_section[rows] = np.array(index,dtype=np.int64)[inverse.ravel()]
+
+    def get_element_thickness(self):
+        """
+        Returns:
+            thickness (array n_elem): 要素の厚さ(elementsの順)
+        """
+        section_thickness = np.array([section.thickness for section in self.section_list],dtype=float)
+        return section_thickness[self.element_section]
+
+    def get_element_groups(self):
+        """
+        要素を(材料, 断面の種類)の組でグループ分けする(グループごとにDマトリクスが共通)。
+
+        Returns:
+            keys ([(Material, str)]): グループごとの材料と断面の種類
+            group (array n_elem): 各要素のグループ(keysのインデックス)
+        """
+        n_types = len(Section.TYPES)
+        section_type = np.array([Section.TYPES.index(section.type) for section in self.section_list])[self.element_section]
+        unique_keys, group = np.unique(self.element_material * n_types + section_type,return_inverse=True)
+        keys = [(self.material_list[k // n_types],Section.TYPES[k % n_types]) for k in unique_keys.tolist()]
+        return keys, group.ravel()
+
+class NodeMap(Mapping):
+    """
+    節点番号 -> Nodeビューの読み取り用辞書(n_nodesが0の場合は全節点)
+    """
+    def __init__(self,mesh,n_nodes=0):
+        self.mesh = mesh
+        self.n_nodes = n_nodes
+
+    def __len__(self):
+        return self.n_nodes if self.n_nodes else len(self.mesh.node_ids)
+
+    def __iter__(self):
+        return iter(range(len(self)))
+
+    def __getitem__(self,node_id):
+        if not 0 <= node_id < len(self):
+            raise KeyError(node_id)
+        return Node(self.mesh,node_id)
+
+    def copy(self):
+        return dict(self)
+
+class ElementMap(Mapping):
+    """
+    要素番号 -> Elementビューの読み取り用辞書(connectivityの行順)
+    """
+    def __init__(self,mesh):
+        self.mesh = mesh
+        self.index = None
+
+    def __len__(self):
+        return len(self.mesh.element_ids)
+
+    def __iter__(self):
+        return iter(self.mesh.element_ids.tolist())
+
+    def __getitem__(self,elem_id):
+        return Element(self.mesh,self.index_of(elem_id))
+
+    def index_of(self,elem_id):
+        """
+        Returns:
+            row (int): 要素番号elem_idのconnectivityの行番号
+        """
+        if self.index is None:
+            self.index = {elem_id:i for i,elem_id in enumerate(self.mesh.element_ids.tolist())}
+        return self.index[elem_id]
+
+    def items(self):
+        for i,elem_id in enumerate(self.mesh.element_ids.tolist()):
+            yield elem_id, Element(self.mesh,i)
+
+    def values(self):
+        for i in range(len(self)):
+            yield Element(self.mesh,i)
@@ -1,24 +1,57 @@
-
-class Node:
-    """
-    Nodeのインデックス、座標および境界条件をまとめておくクラス(2次元用)
-
-    Attributes:
-        id (int): Nodeのインデックス番号(重複不可)
-        x, y (float): Nodeのx, y座標
-    """
-    def __init__(self,idx,x,y):
-        self.id = idx
-        self.x = x
-        self.y = y
-        self.bc_dist = [None, None] # 節点拘束[x方向、y方向](None:拘束なし)
-        self.bc_force = [0, 0] # 節点荷重[x方向、y方向]
-
-    def __str__(self):
-        return "Node {}: x {}, y {}".format(self.id,self.x,self.y)
-    
-    def set_bc_dist(self,xy):
-        self.bc_dist = xy
-    
-    def set_bc_force(self,xy):
-        self.bc_force = xy
\ No newline at end of file
+
+class Node:
+    """
+    Meshの節点配列の1行を参照するビュー(2次元用)。値はMeshの配列に保持される。
+
+    Attributes:
+        id (int): Nodeのインデックス番号(重複不可)
+        x, y (float): Nodeのx, y座標
+        bc_dist ([float or None, float or None]): 節点拘束[x方向、y方向](None:拘束なし)
+        bc_force ([float, float]): 節点荷重[x方向、y方向]
+    """
+    __slots__ = ("mesh","index")
+
+    def __init__(self,mesh,index):
+        self.mesh = mesh
+        self.index = index
+
+    def __str__(self):
+        return "Node {}: x {}, y {}".format(self.id,self.x,self.y)
+
+    @property
+    def id(self):
+        return int(self.mesh.node_ids[self.index])
+
+    @property
+    def x(self):
+        return float(self.mesh.coords[self.index,0])
+
+    @property
+    def y(self):
+        return float(self.mesh.coords[self.index,1])
+
+    @property
+    def bc_dist(self):
+        mask = self.mesh.bc_mask[self.index]
+        value = self.mesh.bc_value[self.index]
+        return [float(value[c]) if mask[c] else None for c in range(2)]
+
+    @bc_dist.setter
+    def bc_dist(self,xy):
+        self.set_bc_dist(xy)
+
+    @property
+    def bc_force(self):
+        return self.mesh.forces[self.index].tolist()
+
+    @bc_force.setter
+    def bc_force(self,xy):
+        self.set_bc_force(xy)
+
+    def set_bc_dist(self,xy):
+        for c in range(2):
+            self.mesh.bc_mask[self.index,c] = xy[c] is not None
+            self.mesh.bc_value[self.index,c] = 0.0 if xy[c] is None else xy[c]
+
+    def set_bc_force(self,xy):
+        self.mesh.forces[self.index] = xy
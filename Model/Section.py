@@ -1,15 +1,20 @@
-class Section:
-    """
-    断面の情報をまとめておくクラス
-    
-    Attributes:
-        id (int): id
-        thickness (float): 厚さ
-    """
-
-    def __init__(self,id,thickness):
-        self.id = id
-        self.thickness = thickness
-
-    def __str__(self):
-        return "Section {}: thickness {}".format(self.id,self.thickness)
+class Section:
+    """
+    断面の情報をまとめておくクラス
+    
+    Attributes:
+        id (int): id
+        thickness (float): 厚さ
+        type (str): "plane_stress"(平面応力) または "plane_strain"(平面ひずみ)
+    """
+    TYPES = ("plane_stress","plane_strain")
+
+    def __init__(self,id,thickness,type="plane_stress"):
+        if type not in Section.TYPES:
+            raise ValueError("Unknown section type: {}".format(type))
+        self.id = id
+        self.thickness = thickness
+        self.type = type
+
+    def __str__(self):
+        return "Section {}: thickness {}, type {}".format(self.id,self.thickness,self.type)
@@ -0,0 +1,63 @@
+import json
+import numpy as np
+from Result.VTUWriter import VTUWriter
+
+class Export:
+    @staticmethod
+    def to_dict(solver):
+        """
+        解析結果を辞書にまとめる。
+
+        Returns:
+            result (dict): 節点変位・節点応力・ひずみエネルギー・荷重ケースごとの概要
+        """
+        fem_model = solver.fem_model
+        n_nodes = len(solver.mesh.nodes)
+        return {
+            "element_type":fem_model.analysis_setting["element_type"],
+            "n_nodes":n_nodes,
+            "n_elements":len(solver.mesh.elements),
+            "n_dof":2 * n_nodes,
+            "strain_energy":float(solver.strain_energy),
+            "max_dx":float(np.max(np.abs(solver.dx))),
+            "max_dy":float(np.max(np.abs(solver.dy))),
+            "displacement":Export.to_list(solver.d.reshape(-1,2)),          #[node_id] -> [dx, dy]
+            "nodal_stress":Export.to_list(solver.nodal_stress),            #[node_id] -> [sigX, sigY, tauXY, mises]
+            "reactions":Export.to_list(solver.reactions.reshape(-1,2)),      #[node_id] -> [Rx, Ry]
+            "load_cases":solver.load_case_results.summary(),
+        }
+
+    @staticmethod
+    def to_list(array):
+        """
+        配列をJSONに書き出せるリストに変換(nanはNone)。
+        """
+        array = np.asarray(array,dtype=float)
+        return np.where(np.isnan(array),None,array).tolist()
+
+    @staticmethod
+    def to_json(solver,path):
+        """
+        解析結果をJSONファイルに書き出す。
+        """
+        with open(path,"w",encoding="utf-8") as f:
+            json.dump(Export.to_dict(solver),f)
+
+    @staticmethod
+    def to_npz(solver,path):
+        """
+        解析結果を圧縮npzファイルに書き出す(大規模モデル向け)。
+        """
+        results = solver.load_case_results
+        np.savez_compressed(path,
+                            d=solver.d_cases,
+                            nodal_stress=results.nodal_stress,
+                            strain_energy=results.strain_energy,
+                            case_names=np.array(results.names))
+
+    @staticmethod
+    def to_vtu(solver,path):
+        """
+        解析結果をParaViewで読めるバイナリの.vtuファイルに書き出す(VTUWriter参照)。
+        """
+        VTUWriter.write(solver,path)
@@ -0,0 +1,46 @@
+import numpy as np
+
+class LoadCaseResults:
+    """
+    荷重ケース(及び荷重組合せ)ごとの解析結果をまとめておくクラス
+
+    Attributes:
+        names ([str]): ケース名(荷重ケース、荷重組合せの順)
+        d (array 2node_num x n_case): 全体変位ベクトル(節点番号順)
+        nodal_stress (array n_case x n_node x 4): 隅節点の平均応力(sigX, sigY, tauXY, von Mises)
+        strain_energy (array n_case): ひずみエネルギー
+    """
+    def __init__(self,names,d,nodal_stress,strain_energy):
+        self.names = list(names)
+        self.d = d
+        self.nodal_stress = nodal_stress
+        self.strain_energy = strain_energy
+
+    def __len__(self):
+        return len(self.names)
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __getitem__(self,name):
+        """
+        Args:
+            name (str or int): ケース名またはケース番号
+
+        Returns:
+            result (dict): d, dx, dy, nodal_stress, strain_energy
+        """
+        i = self.names.index(name) if isinstance(name,str) else name
+        return {"d":self.d[:,i],"dx":self.d[0::2,i],"dy":self.d[1::2,i],
+                "nodal_stress":self.nodal_stress[i],"strain_energy":self.strain_energy[i]}
+
+    def summary(self):
+        """
+        Returns:
+            summary ([dict]): ケースごとの最大変位・最大ミーゼス応力・ひずみエネルギー
+        """
+        return [{"name":name,
+                 "max_abs_dx":float(np.max(np.abs(self.d[0::2,i]))),
+                 "max_abs_dy":float(np.max(np.abs(self.d[1::2,i]))),
+                 "max_mises":float(np.nanmax(self.nodal_stress[i][:,3])),
+                 "strain_energy":float(self.strain_energy[i])} for i,name in enumerate(self.names)]
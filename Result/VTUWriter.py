@@ -0,0 +1,96 @@
+import numpy as np
+from xml.sax.saxutils import quoteattr
+
+class VTUWriter:
+    """
+    解析結果をVTK XML UnstructuredGrid(.vtu)形式で書き出すクラス。
+    配列はAppendedData(encoding="raw", base64なし)にチャンクごとに書き込み、全体をPythonのリストに変換しない。
+
+    出力する配列:
+        PointData: 荷重ケースごとの節点変位(3成分)・節点応力(sigX, sigY, tauXY, von Mises)
+        CellData: 要素番号、最初の荷重ケースの積分点応力(n_gp x 3成分)と要素平均応力
+    """
+    CHUNK_SIZE = 1 << 16
+    #VTKのセルタイプ(8節点要素の中間節点の順序はVTK_QUADRATIC_QUADと同じ)
+    CELL_TYPES = {4:9,8:23}
+    VTK_TYPES = {np.dtype(np.float64):"Float64",np.dtype(np.int64):"Int64",np.dtype(np.uint8):"UInt8"}
+
+    @staticmethod
+    def write(solver,path):
+        """
+        Solverの結果を.vtuファイルに書き出す。
+
+        Args:
+            solver (Solver): 解析済みのSolver
+            path (str): 出力ファイル名
+        """
+        mesh = solver.mesh
+        conn = mesh.get_connectivity()
+        n_nodes, n_elem, k = len(mesh.node_ids), len(conn), conn.shape[1]
+        results = solver.load_case_results
+        chunk = VTUWriter.CHUNK_SIZE
+
+        point_data = []
+        for c,name in enumerate(results.names):
+            d = results.d[:,c].reshape(-1,2)
+            point_data.append(("displacement:" + name,np.float64,3,n_nodes,
+                               lambda s,e,d=d: np.column_stack([d[s:e],np.zeros(e - s)])))
+            stress = VTUWriter.point_stress(mesh,results.nodal_stress[c])
+            point_data.append(("stress:" + name,np.float64,4,n_nodes,lambda s,e,stress=stress: stress[s:e]))
+        gp_stress = solver.gp_stress
+        cell_data = [("element_id",np.int64,1,n_elem,lambda s,e: mesh.element_ids[s:e]),
+                     ("gp_stress:" + results.names[0],np.float64,gp_stress.shape[1] * 3,n_elem,
+                      lambda s,e: gp_stress[s:e].reshape(e - s,-1)),
+                     ("element_stress:" + results.names[0],np.float64,3,n_elem,lambda s,e: gp_stress[s:e].mean(axis=1))]
+        points = [("Points",np.float64,3,n_nodes,lambda s,e: np.column_stack([mesh.coords[s:e],np.zeros(e - s)]))]
+        cells = [("connectivity",np.int64,k,n_elem,lambda s,e: conn[s:e]),
+                 ("offsets",np.int64,1,n_elem,lambda s,e: k * np.arange(s + 1,e + 1,dtype=np.int64)),
+                 ("types",np.uint8,1,n_elem,lambda s,e: np.full(e - s,VTUWriter.CELL_TYPES[k],dtype=np.uint8))]
+
+        #各配列は(UInt64のバイト数 + データ)としてAppendedDataに並ぶ
+        groups = [("PointData",point_data),("CellData",cell_data),("Points",points),("Cells",cells)]
+        offset = 0
+        xml = []
+        for tag,arrays in groups:
+            xml.append("<{}>".format(tag))
+            for name,dtype,n_comp,n_rows,_ in arrays:
+                xml.append('<DataArray type="{}" Name={} NumberOfComponents="{}" format="appended" offset="{}"/>'.format(
+                    VTUWriter.VTK_TYPES[np.dtype(dtype)],quoteattr(name),n_comp,offset))
+                offset += 8 + n_rows * n_comp * np.dtype(dtype).itemsize
+            xml.append("</{}>".format(tag))
+
+        with open(path,"wb") as f:
+            f.write(('<?xml version="1.0"?>\n'
+                     '<VTKFile type="UnstructuredGrid" version="1.0" byte_order="LittleEndian" header_type="UInt64">\n'
+                     '<UnstructuredGrid>\n<Piece NumberOfPoints="{}" NumberOfCells="{}">\n{}\n'
+                     '</Piece>\n</UnstructuredGrid>\n<AppendedData encoding="raw">\n_').format(
+                         n_nodes,n_elem,"\n".join(xml)).encode("ascii"))
+            for _,arrays in groups:
+                for name,dtype,n_comp,n_rows,get_chunk in arrays:
+                    dtype = np.dtype(dtype).newbyteorder("<")
+                    f.write(np.array(n_rows * n_comp * dtype.itemsize,dtype="<u8").tobytes())
+                    for s in range(0,n_rows,chunk):
+                        e = min(s + chunk,n_rows)
+                        f.write(np.ascontiguousarray(get_chunk(s,e),dtype=dtype).tobytes())
+            f.write(b"\n</AppendedData>\n</VTKFile>\n")
+
+    @staticmethod
+    def point_stress(mesh,nodal_stress):
+        """
+        隅節点の平均応力を全節点に拡張(8節点要素の中間節点は辺の両端の平均)。
+
+        Args:
+            nodal_stress (array n_corner_node x 4): 隅節点の平均応力
+
+        Returns:
+            stress (array n_node x 4): 節点応力
+        """
+        n_nodes = len(mesh.node_ids)
+        if len(nodal_stress) == n_nodes:
+            return nodal_stress
+        conn = mesh.get_connectivity()
+        stress = np.full((n_nodes,nodal_stress.shape[1]),np.nan)
+        stress[:len(nodal_stress)] = nodal_stress
+        corner = conn[:,:4]
+        stress[conn[:,4:]] = (nodal_stress[corner] + nodal_stress[np.roll(corner,-1,axis=1)]) / 2
+        return stress
@@ -1,61 +1,104 @@
-import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib import patches
-import matplotlib.tri as tri
-
-class Visualize:
-
-    def __init__(self,solver):
-         self.solver = solver
-
-    def plot_deform(self,ratio=50):
-            x = np.array([[node.x, node.y] for idx, node in self.solver.fem_model.ori4node.items()])
-            x_new = x + self.solver.d.reshape(len(self.solver.fem_model.ori4node), 2) * ratio
-            fig, ax = plt.subplots()
-            for v in self.solver.mesh.elements:
-                patch = patches.Polygon(xy=v.xy[:4], ec='black', alpha=0.3, fill=False,linestyle='--')
-                ax.add_patch(patch)
-            for v in self.solver.mesh.elements:
-                xy_new = [(x_new[idx, 0], x_new[idx, 1]) for idx in v.node[:4]]
-                patch = patches.Polygon(xy=xy_new, fc='red', ec='red', alpha=0.3, fill=False)
-                ax.add_patch(patch)
-            ax.autoscale()
-            ax.set_aspect('equal', 'box')
-            plt.show()  
-
-    def plot_stress(self, stress_idx=3, ratio=100):
-        """
-        応力プロットを作成。
-
-        Args:
-            stress_idx (int(0~3)): 0-x応力, 1-y応力, 2-せん断応力, 3-von Mises
-            ratio (float): 変形の倍率
-        """
-        x = np.array([[node.x, node.y] for idx, node in self.solver.fem_model.ori4node.items()])
-        d = np.array([[self.solver.d[2*idx], self.solver.d[2*idx+1]]for idx, node in self.solver.fem_model.ori4node.items()])
-        x_new = x + d * ratio
-        nodal_values = []
-        for i in range(len(self.solver.fem_model.ori4node)):
-            nodal_values.append(self.solver.stress_dict[i][stress_idx])
-
-        nodes_x = x_new[:, 0]
-        nodes_y = x_new[:, 1]
-        elements_tris = []
-        for key,elm in self.solver.mesh.elements.items():
-            elements_tris.append([elm.node[0], elm.node[1], elm.node[2]])
-            elements_tris.append([elm.node[0], elm.node[2], elm.node[3]])
-        triangulation = tri.Triangulation(nodes_x, nodes_y, elements_tris)
-        fig, ax = plt.subplots()
-        result = ax.tricontourf(triangulation, nodal_values,cmap='jet')
-        for key,v in self.solver.mesh.elements.items():#要素境界の表示
-            xy_new = [(x_new[idx, 0], x_new[idx, 1]) for idx in v.node[:4]]
-            patch = patches.Polygon(xy=xy_new,ec='grey', fill=False)
-            ax.add_patch(patch)
-        ax.autoscale()
-        ax.set_aspect('equal', 'box')
-        ax.axis('off')
-        fig.colorbar(result, ax=ax)
-        max_dx,max_dy = self.solver.calc_max_d()
-        fig.text(0.1, 0.1,f"max_dx:{max_dx:.4f} \nmax_dy:{max_dy:.4f}")
-
-        plt.show()
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from matplotlib.collections import PolyCollection, LineCollection
+import matplotlib.tri as tri
+
+class Visualize:
+    """
+    解析結果の図を作成するクラス。
+    要素境界はPolyCollection(要素数がmax_outlinesを超える場合はメッシュ外周のLineCollectionのみ)で一括描画し、
+    コンター図はラスタライズする。save_pathを指定した場合は画面に表示せず、pyplotを介さないFigureで直接ファイルに保存する。
+    """
+    MAX_OUTLINES = 20000
+
+    def __init__(self,solver):
+         self.solver = solver
+
+    def plot_deform(self,ratio=50,save_path=None,max_outlines=MAX_OUTLINES):
+        """
+        変形図を作成。
+
+        Args:
+            ratio (float): 変形の倍率
+            save_path (str): 保存先(.png, .svgなど。省略時は画面に表示)
+            max_outlines (int): 全要素の境界を描く最大の要素数
+        """
+        x, x_new, corner = self.deformed_coords(ratio)
+        fig, ax = self.new_figure(save_path)
+        ax.add_collection(self.outline_collection(x,corner,max_outlines,ec='black',alpha=0.3,linestyle='--'))
+        ax.add_collection(self.outline_collection(x_new,corner,max_outlines,ec='red',alpha=0.3))
+        ax.autoscale()
+        ax.set_aspect('equal', 'box')
+        self.finish(fig,save_path)
+
+    def plot_stress(self, stress_idx=3, ratio=100, save_path=None, max_outlines=MAX_OUTLINES):
+        """
+        応力プロットを作成。
+
+        Args:
+            stress_idx (int(0~3)): 0-x応力, 1-y応力, 2-せん断応力, 3-von Mises
+            ratio (float): 変形の倍率
+            save_path (str): 保存先(.png, .svgなど。省略時は画面に表示)
+            max_outlines (int): 全要素の境界を描く最大の要素数
+        """
+        _, x_new, corner = self.deformed_coords(ratio)
+        nodal_values = self.solver.nodal_stress[:,stress_idx]
+
+        elements_tris = np.concatenate([corner[:,[0,1,2]],corner[:,[0,2,3]]])
+        triangulation = tri.Triangulation(x_new[:,0], x_new[:,1], elements_tris)
+        fig, ax = self.new_figure(save_path)
+        result = ax.tricontourf(triangulation, nodal_values,cmap='jet')
+        result.set_rasterized(True)
+        ax.add_collection(self.outline_collection(x_new,corner,max_outlines,ec='grey'))#要素境界の表示
+        ax.autoscale()
+        ax.set_aspect('equal', 'box')
+        ax.axis('off')
+        fig.colorbar(result, ax=ax)
+        max_dx,max_dy = self.solver.calc_max_d()
+        fig.text(0.1, 0.1,f"max_dx:{max_dx:.4f} \nmax_dy:{max_dy:.4f}")
+        self.finish(fig,save_path)
+
+    def deformed_coords(self,ratio):
+        """
+        Returns:
+            x, x_new (array n_corner_node x 2): 変形前・変形後の隅節点座標
+            corner (array n_elem x 4): 要素の隅節点番号
+        """
+        mesh = self.solver.mesh
+        n = mesh.n_corner_nodes
+        x = mesh.coords[:n]
+        x_new = x + self.solver.d.reshape(-1,2)[:n] * ratio
+        return x, x_new, mesh.get_connectivity()[:,:4]
+
+    @staticmethod
+    def outline_collection(x,corner,max_outlines,**kwargs):
+        """
+        要素境界をまとめて描くコレクションを作成。要素数がmax_outlinesを超える場合はメッシュの外周(1要素にのみ属する辺)のみ。
+
+        Returns:
+            collection (PolyCollection or LineCollection): 要素境界
+        """
+        if max_outlines is None or len(corner) <= max_outlines:
+            return PolyCollection(x[corner],facecolors='none',**kwargs)
+        n1 = corner.ravel()
+        n2 = np.roll(corner,-1,axis=1).ravel()
+        keys = np.minimum(n1,n2) * len(x) + np.maximum(n1,n2)
+        _, first, counts = np.unique(keys,return_index=True,return_counts=True)
+        edge = first[counts == 1]
+        return LineCollection(np.stack([x[n1[edge]],x[n2[edge]]],axis=1),colors=kwargs.pop('ec'),**kwargs)
+
+    @staticmethod
+    def new_figure(save_path):
+        if save_path is None:
+            return plt.subplots()
+        #ファイル保存時はpyplotの状態・GUIバックエンドを使わない
+        fig = Figure()
+        return fig, fig.add_subplot()
+
+    @staticmethod
+    def finish(fig,save_path,dpi=150):
+        if save_path is None:
+            plt.show()
+        else:
+            fig.savefig(save_path,dpi=dpi)
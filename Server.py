@@ -0,0 +1,203 @@
+import argparse
+import hashlib
+import io
+import json
+import os
+import socketserver
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+#ワーカープロセス内で保持するキャッシュ(モデルのハッシュ -> 解析済みのSolver、要素接続のハッシュ -> (非ゼロ構造, 並べ替え))
+MODEL_CACHE = OrderedDict()
+PATTERN_CACHE = OrderedDict()
+CACHE_SIZE = 16
+
+def warm_up(cache_size):
+    """
+    ワーカープロセスの初期化(解析モジュールの読み込みを最初の依頼の前に済ませる)。
+    """
+    global CACHE_SIZE
+    CACHE_SIZE = cache_size
+    import Model.FEMModel
+    import Analysis.Solver
+    import Result.Export
+
+def model_hash(data,with_loads=True):
+    """
+    Returns:
+        hash (str): 入力データのハッシュ(with_loads=Falseの場合は荷重を除く)
+    """
+    if not with_loads:
+        data = {k:v for k,v in data.items() if k != "loads"}
+    return hashlib.sha1(json.dumps(data,sort_keys=True,separators=(",",":")).encode("utf-8")).hexdigest()
+
+def cache_put(cache,key,value):
+    cache[key] = value
+    cache.move_to_end(key)
+    while len(cache) > CACHE_SIZE:
+        cache.popitem(last=False)
+
+def analyze(data,structure_key):
+    """
+    1モデルを解析(ワーカープロセスで実行)。荷重以外が同じモデルは分解済みのKを再利用し、
+    要素接続が同じモデルは非ゼロ構造と節点の並べ替えを再利用する。
+
+    Returns:
+        result (dict): 節点変位・節点応力・反力・ひずみエネルギー・荷重ケースごとの概要(配列はnumpy)
+    """
+    import numpy as np
+    from Model.FEMModel import FEMModel
+    from Analysis.Solver import Solver
+    from Analysis.Renumbering import Renumbering
+    from Result.LoadCaseResults import LoadCaseResults
+
+    fem_model = FEMModel(data)
+    solver = MODEL_CACHE.get(structure_key)
+    if solver is not None:
+        #荷重のみ異なる: 分解済みの係数で前進後退代入のみ
+        MODEL_CACHE.move_to_end(structure_key)
+        cache = "factorization"
+        solver.fem_model.load_cases = fem_model.load_cases
+        solver.fem_model.load_combinations = fem_model.load_combinations
+        F, names = solver.read_load_cases()
+        d = solver.system.solve(F)
+        d_cases = solver.renumbering.to_external(d)
+        reactions = solver.renumbering.to_external(solver.system.reactions(d,F))
+        nodal_stress, _ = solver.calc_nodal_stress(d_cases)
+        results = LoadCaseResults(names,d_cases,nodal_stress,solver.calc_strain_energy(d_cases))
+    else:
+        mesh = fem_model.mesh
+        topology_key = hashlib.sha1(mesh.connectivity.tobytes() + repr((len(mesh.node_ids),
+                                    fem_model.analysis_setting.get("renumbering",Renumbering.DEFAULT_METHOD))).encode()).hexdigest()
+        pattern = PATTERN_CACHE.get(topology_key)
+        cache = "none"
+        if pattern is not None:
+            cache = "pattern"
+            mesh.sparse_pattern, mesh.renumbering = pattern
+        solver = Solver(fem_model)
+        cache_put(PATTERN_CACHE,topology_key,(mesh.sparse_pattern,mesh.renumbering))
+        cache_put(MODEL_CACHE,structure_key,solver)
+        results = solver.load_case_results
+        reactions = solver.reaction_cases
+    return {"cache":cache,"pid":os.getpid(),
+            "element_type":fem_model.analysis_setting["element_type"],
+            "n_nodes":len(fem_model.mesh.node_ids),"n_elements":len(fem_model.mesh.element_ids),
+            "case_names":results.names,"d":results.d,"nodal_stress":results.nodal_stress,
+            "reactions":reactions,"strain_energy":np.asarray(results.strain_energy,dtype=float),
+            "load_cases":results.summary()}
+
+class WorkerPool:
+    """
+    1プロセスずつのワーカーの集まり。荷重以外が同じモデルは同じワーカーに送り、そのワーカーのキャッシュを使う。
+    """
+    def __init__(self,n_workers,cache_size=CACHE_SIZE):
+        self.executors = [ProcessPoolExecutor(max_workers=1,initializer=warm_up,initargs=(cache_size,))
+                          for _ in range(n_workers)]
+        #プロセスを起動してモジュールを読み込んでおく
+        for executor in self.executors:
+            executor.submit(os.getpid).result()
+
+    def submit(self,data):
+        structure_key = model_hash(data,with_loads=False)
+        executor = self.executors[int(structure_key[:8],16) % len(self.executors)]
+        return executor.submit(analyze,data,structure_key)
+
+    def shutdown(self):
+        for executor in self.executors:
+            executor.shutdown()
+
+def encode_result(result,fmt):
+    """
+    Returns:
+        body (bytes): レスポンスの本文
+        content_type (str): Content-Type
+    """
+    import numpy as np
+    from Result.Export import Export
+    if fmt == "npz":
+        buffer = io.BytesIO()
+        np.savez(buffer,d=result["d"],nodal_stress=result["nodal_stress"],reactions=result["reactions"],
+                 strain_energy=result["strain_energy"],case_names=np.array(result["case_names"]))
+        return buffer.getvalue(), "application/octet-stream"
+    body = {"cache":result["cache"],"element_type":result["element_type"],
+            "n_nodes":result["n_nodes"],"n_elements":result["n_elements"],
+            "strain_energy":float(result["strain_energy"][0]),
+            "displacement":Export.to_list(result["d"][:,0].reshape(-1,2)),         #[node_id] -> [dx, dy]
+            "nodal_stress":Export.to_list(result["nodal_stress"][0]),             #[node_id] -> [sigX, sigY, tauXY, mises]
+            "reactions":Export.to_list(result["reactions"][:,0].reshape(-1,2)),     #[node_id] -> [Rx, Ry]
+            "load_cases":result["load_cases"]}
+    return json.dumps(body).encode("utf-8"), "application/json"
+
+class AnalysisHandler(BaseHTTPRequestHandler):
+    """
+    POST /analyze   : 入力JSON(FEMModelの形式)を解析(?format=npzでnpz形式のバイナリを返す)
+    GET  /health    : 稼働確認
+    """
+    pool = None
+
+    def do_GET(self):
+        if urlparse(self.path).path == "/health":
+            self.send(200,json.dumps({"status":"ok","workers":len(self.pool.executors)}).encode("utf-8"),"application/json")
+        else:
+            self.send(404,b'{"error":"not found"}',"application/json")
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/analyze":
+            self.send(404,b'{"error":"not found"}',"application/json")
+            return
+        fmt = parse_qs(url.query).get("format",["json"])[0]
+        try:
+            data = json.loads(self.rfile.read(int(self.headers.get("Content-Length",0))))
+            result = self.pool.submit(data).result()
+            body, content_type = encode_result(result,fmt)
+            self.send(200,body,content_type)
+        except Exception as e:
+            traceback.print_exc()
+            self.send(400,json.dumps({"error":"{}: {}".format(type(e).__name__,e)}).encode("utf-8"),"application/json")
+
+    def send(self,status,body,content_type):
+        self.send_response(status)
+        self.send_header("Content-Type",content_type)
+        self.send_header("Content-Length",str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        #Unixソケットの場合はclient_addressが空
+        return self.client_address[0] if self.client_address else "unix"
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn,socketserver.UnixStreamServer):
+    daemon_threads = True
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="2次元有限要素解析の常駐サーバー(localhostのみ)")
+    parser.add_argument("--port",type=int,default=8765,help="HTTPのポート番号(127.0.0.1で待ち受け)")
+    parser.add_argument("--unix",help="HTTPの代わりに待ち受けるUnixソケットのパス")
+    parser.add_argument("-j","--workers",type=int,default=os.cpu_count(),help="ワーカープロセス数")
+    parser.add_argument("--cache-size",type=int,default=CACHE_SIZE,help="ワーカーごとに保持するモデル数")
+    args = parser.parse_args(argv)
+
+    AnalysisHandler.pool = WorkerPool(args.workers,args.cache_size)
+    if args.unix:
+        if os.path.exists(args.unix):
+            os.remove(args.unix)
+        server = ThreadingUnixHTTPServer(args.unix,AnalysisHandler)
+        print("listening on {}".format(args.unix))
+    else:
+        server = ThreadingHTTPServer(("127.0.0.1",args.port),AnalysisHandler)
+        print("listening on http://127.0.0.1:{}".format(args.port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        AnalysisHandler.pool.shutdown()
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,38 @@
+import copy
+import numpy as np
+from Model.FEMModel import FEMModel
+from Analysis.Solver import Solver
+from Benchmark.MeshGenerator import MeshGenerator
+
+ELEMENT_TYPES = ("Quad_4node","Quad_8node","Quad_4node_Incomp")
+
+def beam(element_type,nx=8,ny=4,**analysis_settings):
+    """
+    条件数の小さい(L/H = 2の)片持ち梁。基準の解析との比較は丸め誤差程度(1e-11)で一致する。
+    """
+    return MeshGenerator.cantilever(nx,ny,element_type,L=2.0,H=1.0,**analysis_settings)
+
+def solve(data,**analysis_settings):
+    """
+    入力データを複製し、analysis_settingsを上書きして解析。
+
+    Returns:
+        solver (Solver): 解析結果
+    """
+    data = copy.deepcopy(data)
+    data["analysis_settings"][0].update(analysis_settings)
+    return Solver(FEMModel(data))
+
+def reference(data):
+    """
+    基準の解析(密なKの組み立て・直接法、並べ替え・キャッシュなし)。
+    """
+    return solve(data,assembly="dense",solver="direct",renumbering="none",element_cache=False)
+
+def rel_error(a,b):
+    """
+    Returns:
+        error (float): bに対するaの最大値ノルムの相対誤差
+    """
+    a, b = np.asarray(a), np.asarray(b)
+    return float(np.abs(a - b).max() / np.abs(b).max())
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+from Benchmark.MeshGenerator import MeshGenerator
+from Model.FEMModel import FEMModel
+from Analysis.Solver import Solver
+from Analysis.AdaptiveRefinement import AdaptiveRefinement
+from Analysis.ErrorEstimator import ErrorEstimator
+from tests.common import beam, reference, rel_error
+
+E, NU = MeshGenerator.MATERIAL["E"], MeshGenerator.MATERIAL["nu"]
+
+def prescribed_beam(nx,ny):
+    """
+    右端に強制変位を与えた片持ち梁(細分割で荷重の配分が変わらないように)。
+    """
+    data = beam("Quad_4node",nx,ny)
+    data["loads"] = []
+    data["boundary_conditions"] += [{"node":j * (nx + 1) + nx,"type":[None,-0.001]} for j in range(ny + 1)]
+    return data
+
+def displacement_by_coords(solver):
+    coords = np.round(solver.mesh.coords,12)
+    return {tuple(c):solver.d[2 * i:2 * i + 2] for i,c in enumerate(coords.tolist())}
+
+@pytest.mark.parametrize("element_type",ErrorEstimator.ELEMENT_TYPES)
+def test_patch_with_hanging_nodes(element_type):
+    #右端(荷重を与える辺)に接しない要素を2段階細分割しても一様応力の解は厳密
+    sigma = 100.0
+    ar = AdaptiveRefinement(FEMModel(MeshGenerator.plate(8,8,element_type,sigma=sigma)))
+    s = Solver(ar.fem_model)
+    x = s.mesh.coords[s.mesh.connectivity[:,:4]].mean(axis=1)[:,0]
+    d0 = ar.refine((x < 0.25) | (s.mesh.element_ids == 29),s.d_cases)
+    #要素29の子要素を細分割する場合は、ハンギングノードを持つ辺の隣接要素も細分割される
+    s = Solver(ar.fem_model,d0)
+    center = s.mesh.coords[s.mesh.connectivity[:,:4]].mean(axis=1)
+    flags = (center[:,0] > 0.625) & (center[:,0] < 0.75) & (center[:,1] > 0.375) & (center[:,1] < 0.5)
+    balanced = ar.balance(flags)
+    assert balanced.sum() == flags.sum() + 4
+    ar.refine(balanced,s.d_cases)
+    mesh = ar.fem_model.mesh
+    assert len(mesh.hanging_nodes) > 0
+
+    s = Solver(ar.fem_model)
+    exact = np.column_stack([sigma * mesh.coords[:,0] / E,-NU * sigma * mesh.coords[:,1] / E]).ravel()
+    assert rel_error(s.d,exact) < 1e-10
+    assert np.allclose(s.gp_stress[...,0],sigma,rtol=1e-10)
+    _, _, eta = ErrorEstimator.estimate(s)
+    assert eta < 1e-10
+
+def test_uniform_refinement_matches_reference():
+    ar = AdaptiveRefinement(FEMModel(prescribed_beam(4,2)))
+    s = Solver(ar.fem_model)
+    ar.refine(np.ones(len(s.mesh.element_ids),dtype=bool),s.d_cases)
+    assert len(ar.fem_model.mesh.hanging_nodes) == 0
+    s = Solver(ar.fem_model)
+    ref = reference(prescribed_beam(8,4))
+    assert abs(s.strain_energy - ref.strain_energy) < 1e-11 * ref.strain_energy
+    d, d_ref = displacement_by_coords(s), displacement_by_coords(ref)
+    assert d.keys() == d_ref.keys()
+    assert rel_error([d[k] for k in d_ref],list(d_ref.values())) < 1e-11
+
+def test_run_reduces_error():
+    ar = AdaptiveRefinement(FEMModel(prescribed_beam(4,2)),target_error=0.05,max_iterations=6)
+    ar.run()
+    errors = [record["rel_error"] for record in ar.history]
+    assert errors[-1] < errors[0]
+    assert len(ar.fem_model.mesh.hanging_nodes) > 0
@@ -0,0 +1,71 @@
+import copy
+import numpy as np
+import pytest
+from Benchmark.MeshGenerator import MeshGenerator
+from Model.FEMModel import FEMModel
+from Analysis.Solver import Solver
+from Analysis.AnalysisSession import AnalysisSession
+
+def model():
+    data = MeshGenerator.cantilever(8,4,"Quad_4node",L=2.0,H=1.0)
+    data["loads"] = {"cases":[{"name":"dead","loads":data["loads"]},
+                              {"name":"wind","loads":[{"node":22,"value":[3.0,0.0]}]}],
+                     "combinations":[{"name":"dead+2wind","factors":{"dead":1.0,"wind":2.0}},
+                                     {"name":"wind_only","factors":{"wind":-1.5}}]}
+    return data
+
+def thicken(data,element_ids,thickness):
+    #厚さを変えた要素に別の断面を割り当てた入力データ
+    data["sections"].append({"id":9,"type":"plane_stress","thickness":thickness})
+    for element in data["elements"]:
+        if element["id"] in element_ids:
+            element["section_id"] = 9
+
+def assert_same(session,fresh):
+    scale = np.abs(fresh.d_cases).max()
+    assert np.abs(session.solve() - fresh.d_cases).max() < 1e-11 * scale
+    assert np.abs(session.reactions() - fresh.reaction_cases).max() < 1e-11 * np.abs(fresh.reaction_cases).max()
+
+def test_set_thickness_woodbury():
+    data = model()
+    session = AnalysisSession(FEMModel(copy.deepcopy(data)))
+    session.set_thickness([3,11],2.5)
+    thicken(data,[3,11],2.5)
+    assert_same(session,Solver(FEMModel(data)))
+    assert session.update is not None
+    assert session.n_factorizations == 0
+
+def test_set_load_updates_combinations():
+    data = model()
+    session = AnalysisSession(FEMModel(copy.deepcopy(data)))
+    session.set_load([22,31],[[0.0,-7.0],[1.0,2.0]],case="wind")
+    data["loads"]["cases"][1]["loads"] = [{"node":22,"value":[0.0,-7.0]},{"node":31,"value":[1.0,2.0]}]
+    fresh = Solver(FEMModel(data))
+    assert_same(session,fresh)
+    assert np.allclose(session.F,fresh.F,rtol=0.0,atol=1e-14)
+
+def test_set_load_rejects_combination():
+    session = AnalysisSession(FEMModel(model()))
+    with pytest.raises(ValueError):
+        session.set_load([22],[1.0,0.0],case="dead+2wind")
+
+def test_set_support_and_thickness():
+    data = model()
+    session = AnalysisSession(FEMModel(copy.deepcopy(data)))
+    session.set_support([44],[None,0.0])
+    session.set_thickness([20],0.4)
+    session.set_load([44],[0.0,5.0],case=0)
+    data["boundary_conditions"].append({"node":44,"type":[None,0.0]})
+    thicken(data,[20],0.4)
+    #set_loadは節点荷重を置き換える(節点44の先端荷重も置き換わる)
+    loads = data["loads"]["cases"][0]["loads"]
+    data["loads"]["cases"][0]["loads"] = [load for load in loads if load["node"] != 44] + [{"node":44,"value":[0.0,5.0]}]
+    assert_same(session,Solver(FEMModel(data)))
+
+def test_refactorize_beyond_max_rank():
+    data = model()
+    session = AnalysisSession(FEMModel(copy.deepcopy(data)),max_rank=4)
+    session.set_thickness(list(range(8)),1.5)
+    thicken(data,list(range(8)),1.5)
+    assert_same(session,Solver(FEMModel(data)))
+    assert session.n_factorizations == 1
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+from Model.FEMModel import FEMModel
+from Analysis.CalcStiffness import CalcStifness
+from Analysis.BatchKernel import BatchKernel
+from Analysis.Calc_Q4 import Calc_Q4
+from Analysis.Calc_Q8 import Calc_Q8
+from Analysis.Calc_Q4Incomp import Calc_Q4Incomp
+from tests.common import ELEMENT_TYPES, beam
+
+BATCH = {"Quad_4node":Calc_Q4.calc_Ke_batch,"Quad_8node":Calc_Q8.calc_Ke_batch,"Quad_4node_Incomp":Calc_Q4Incomp.calc_Ke_batch}
+
+def distorted_model(element_type):
+    """
+    内部の節点を乱数で動かした(要素ごとに形状の異なる)片持ち梁のモデル。
+    """
+    data = beam(element_type,nx=6,ny=3)
+    rng = np.random.default_rng(1)
+    for node in data["nodes"]:
+        if 0.0 < node["x"] < 2.0 and 0.0 < node["y"] < 1.0:
+            node["x"] += rng.uniform(-0.08,0.08)
+            node["y"] += rng.uniform(-0.08,0.08)
+    return FEMModel(data)
+
+def element_by_element(fem_model,D,gps):
+    """
+    変更前の要素ごとの計算(Element 1つずつ、積分点ごとのループ)によるKeと積分点のB。
+    """
+    element_type = fem_model.analysis_setting["element_type"]
+    Ke, B = [], []
+    for elem in fem_model.mesh.elements.values():
+        if element_type == "Quad_4node_Incomp":
+            Ke.append(Calc_Q4Incomp.calc_KeBe(elem,0.0,0.0,D,gps)[0])
+            B.append([Calc_Q4Incomp.calc_KeBe(elem,xi,eta,D,gps)[1] for xi,eta,_,_ in gps])
+        else:
+            calc = Calc_Q4 if element_type == "Quad_4node" else Calc_Q8
+            Ke.append(calc.calc_Ke(elem,D,gps))
+            B.append([calc.calc_B(elem,xi,eta)[0] for xi,eta,_,_ in gps])
+    return np.array(Ke), np.array(B)
+
+@pytest.mark.parametrize("element_type",ELEMENT_TYPES)
+def test_batch_matches_element_loop(element_type):
+    fem_model = distorted_model(element_type)
+    mesh = fem_model.mesh
+    D = CalcStifness.calc_D(fem_model)[0][0]
+    gps = CalcStifness.set_gps(element_type)
+    Ke, B = BATCH[element_type](mesh.get_element_xy(),D,mesh.get_element_thickness(),gps,return_B=True)
+    Ke_loop, B_loop = element_by_element(fem_model,D,gps)
+    assert np.abs(Ke - Ke_loop).max() < 1e-10 * np.abs(Ke_loop).max()
+    assert np.abs(B - B_loop).max() < 1e-12 * np.abs(B_loop).max()
+    #要素の形状が異なるためKeは要素ごとに異なる
+    assert np.abs(Ke[0] - Ke[1]).max() > 1e-3 * np.abs(Ke).max()
+
+def test_jacobian_of_parallelogram():
+    #(0,0),(2,0),(3,1),(1,1)の平行四辺形: J = [[1,0],[0.5,0.5]]、面積2 = 4 detJ
+    xy = np.array([[[0.0,0.0],[2.0,0.0],[3.0,1.0],[1.0,1.0]]])
+    gps = CalcStifness.set_gps("Quad_4node")
+    J, invJ, detJ = BatchKernel.calc_J(xy,Calc_Q4.calc_dN(gps))
+    assert np.allclose(J,[[1.0,0.0],[0.5,0.5]])
+    assert np.allclose(detJ,0.5)
+    assert np.allclose(np.einsum("egij,egjk->egik",J,invJ),np.eye(2))
+
+@pytest.mark.parametrize("element_type",ELEMENT_TYPES)
+def test_chunks_do_not_change_result(element_type,monkeypatch):
+    fem_model = distorted_model(element_type)
+    mesh = fem_model.mesh
+    D = CalcStifness.calc_D(fem_model)[0][0]
+    gps = CalcStifness.set_gps(element_type)
+    args = (mesh.get_element_xy(),D,mesh.get_element_thickness(),gps)
+    Ke = BATCH[element_type](*args)
+    monkeypatch.setattr(BatchKernel,"CHUNK_SIZE",5)
+    assert np.array_equal(BATCH[element_type](*args),Ke)
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+from Benchmark.Benchmark import Benchmark
+from Benchmark.MeshGenerator import MeshGenerator
+from Model.FEMModel import FEMModel
+from tests.common import ELEMENT_TYPES, solve, rel_error
+
+E, NU = MeshGenerator.MATERIAL["E"], MeshGenerator.MATERIAL["nu"]
+
+@pytest.mark.parametrize("element_type",ELEMENT_TYPES)
+def test_edge_loads_consistent(element_type):
+    data = MeshGenerator.plate(3,4,element_type,H=2.0,sigma=10.0)
+    total = np.sum([load["value"] for load in data["loads"]],axis=0)
+    assert np.allclose(total,[10.0 * 2.0,0.0],rtol=1e-14)
+    #8節点要素の中間節点への荷重は、FEMModelが生成する辺の中点の節点に与えられる
+    mesh = FEMModel(data).mesh
+    loaded = [load["node"] for load in data["loads"]]
+    assert np.allclose(mesh.coords[loaded,0],1.0)
+    if element_type == "Quad_8node":
+        assert len(loaded) == 2 * 4 + 1
+
+@pytest.mark.parametrize("element_type",ELEMENT_TYPES)
+def test_plate_patch(element_type):
+    sigma = 100.0
+    s = solve(MeshGenerator.plate(4,3,element_type,sigma=sigma))
+    coords = s.mesh.coords
+    exact = np.column_stack([sigma * coords[:,0] / E,-NU * sigma * coords[:,1] / E]).ravel()
+    assert rel_error(s.d,exact) < 1e-12
+    result = Benchmark.run_case("plate",element_type,4)
+    assert result["rel_error"] < 1e-12
+    assert result["passed"]
+
+@pytest.mark.parametrize("element_type",ELEMENT_TYPES)
+def test_cantilever_within_order_bound(element_type):
+    for ny in (1,2,4,8):
+        result = Benchmark.run_case("cantilever",element_type,ny)
+        assert result["tolerance"] == ny**-Benchmark.CONVERGENCE_ORDER[element_type]
+        assert result["passed"]
+
+def test_cantilever_q4_convergence_order():
+    #端から離れた断面の比較では固定端の影響による誤差の下限が無く、4節点要素は理論どおりh^2で収束する
+    errors = [Benchmark.run_case("cantilever","Quad_4node",ny)["rel_error"] for ny in (4,8,16)]
+    orders = np.log2(np.array(errors[:-1]) / np.array(errors[1:]))
+    assert np.all(orders > Benchmark.CONVERGENCE_ORDER["Quad_4node"] - 0.2)
+
+def test_cantilever_measure_is_exact_for_bending():
+    #2階差分の理論値は、梁の曲げの3次式のたわみを与えた変位場に対して厳密
+    data, nx = Benchmark.generate("cantilever","Quad_4node",2)
+    s = solve(data)
+    E, I, P, L = MeshGenerator.MATERIAL["E"], 1.0 / 12, -100.0, 10.0
+    x = s.mesh.coords[:,0]
+    s.d = np.column_stack([0.0 * x,P / (E * I) * (L * x**2 / 2 - x**3 / 6) + 3.0 * x + 1.0]).ravel()
+    assert Benchmark.measure("cantilever",s,nx,2) == pytest.approx(Benchmark.analytic("cantilever",data),rel=1e-12)
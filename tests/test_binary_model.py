@@ -0,0 +1,71 @@
+import json
+import os
+import numpy as np
+import pytest
+from Model.BinaryModel import BinaryModel
+from Model.FEMModel import FEMModel
+from Analysis.Solver import Solver
+from tests.common import ELEMENT_TYPES, beam, rel_error
+
+def rich_beam(element_type):
+    """
+    2材料・2荷重ケースと組合せ・強制変位を含む片持ち梁。
+    """
+    data = beam(element_type)
+    data["materials"].append({"id":7,"name":"Aluminium","E":70000.0,"nu":0.33})
+    for elem in data["elements"][::3]:
+        elem["material_id"] = 7
+    data["boundary_conditions"].append({"node":22,"type":[None,-1e-4]})
+    data["loads"] = {"cases":[{"name":"tip","loads":data["loads"]},{"name":"side","loads":[{"node":40,"value":[5.0,0.0]}]}],
+                     "combinations":[{"name":"both","factors":{"tip":1.0,"side":-2.0}}]}
+    return data
+
+@pytest.mark.parametrize("element_type",ELEMENT_TYPES)
+def test_round_trip(element_type,tmp_path):
+    data = rich_beam(element_type)
+    json_file, path = str(tmp_path / "model.json"), str(tmp_path / "model.fem")
+    with open(json_file,"w",encoding="utf-8") as f:
+        json.dump(data,f,default=float)
+    BinaryModel.convert(json_file,path)
+    assert BinaryModel.is_binary_model(path) and not BinaryModel.is_binary_model(json_file)
+    ref = Solver(FEMModel(data))
+    s = Solver(BinaryModel.load(path))
+    assert s.load_case_names == ref.load_case_names == ["tip","side","both"]
+    assert rel_error(s.d_cases,ref.d_cases) < 1e-14
+    assert rel_error(s.reaction_cases,ref.reaction_cases) < 1e-14
+    assert np.array_equal(s.mesh.coords,ref.mesh.coords)
+
+def test_arrays_are_memory_mapped(tmp_path):
+    path = str(tmp_path / "model.fem")
+    header, arrays = BinaryModel.from_json(rich_beam("Quad_4node"))
+    BinaryModel.save(path,header,arrays)
+    header, mapped = BinaryModel.read(path)
+    assert set(mapped) == set(BinaryModel.ARRAYS)
+    assert all(isinstance(mapped[name],np.memmap) for name in BinaryModel.ARRAYS)
+    assert mapped["material_ids"].tolist().count(7) == 11
+    #コピーオンライトのため、読み込んだ配列を変更してもファイルは変わらない
+    mapped["coords"][0] = 99.0
+    assert np.array_equal(BinaryModel.read(path)[1]["coords"],arrays["coords"])
+
+def test_from_fem_model_round_trip(tmp_path):
+    fem_model = FEMModel(rich_beam("Quad_8node"))
+    header, arrays = BinaryModel.from_fem_model(fem_model)
+    #中間節点は保存せず、読み込み時に同じ番号で生成する
+    assert len(arrays["node_ids"]) == fem_model.mesh.n_corner_nodes < len(fem_model.mesh.node_ids)
+    path = str(tmp_path / "model.fem")
+    BinaryModel.save(path,header,arrays)
+    loaded = BinaryModel.load(path)
+    assert np.array_equal(loaded.mesh.coords,fem_model.mesh.coords)
+    assert np.array_equal(loaded.mesh.connectivity,fem_model.mesh.connectivity)
+    assert loaded.load_combinations == fem_model.load_combinations
+
+def test_version_1_and_format(tmp_path):
+    path = str(tmp_path / "model.fem")
+    header, arrays = BinaryModel.from_json(beam("Quad_4node"))
+    BinaryModel.save(path,dict(header,version=1),arrays)
+    os.remove(os.path.join(path,"material_ids.npy"))
+    assert BinaryModel.read(path)[1]["material_ids"].tolist() == [0] * 32
+    with open(os.path.join(path,"header.json"),"w",encoding="utf-8") as f:
+        json.dump(dict(header,format="other"),f)
+    with pytest.raises(ValueError):
+        BinaryModel.read(path)
@@ -0,0 +1,54 @@
+import numpy as np
+import scipy.sparse as sp
+import scipy.sparse.linalg as spla
+from Analysis.LinearSolver import DirectSolver
+from tests.common import beam, solve, reference, rel_error
+
+def laplacian(n):
+    """
+    対称正定値の帯行列(2次元格子のラプラシアン + 単位行列)。
+    """
+    T = sp.diags([-1.0,2.0,-1.0],[-1,0,1],shape=(n,n))
+    return (sp.kronsum(T,T) + sp.identity(n * n)).tocsr()
+
+def test_sparse_and_dense_factorization():
+    K = laplacian(12)
+    f = np.random.default_rng(0).standard_normal((K.shape[0],3))
+    expected = np.linalg.solve(K.toarray(),f)
+    sparse, dense = DirectSolver(K), DirectSolver(K.toarray())
+    assert sparse.method in ("splu","cholmod")
+    assert dense.method == "dense_lu"
+    assert rel_error(sparse.solve(f),expected) < 1e-13
+    assert rel_error(dense.solve(f),expected) < 1e-13
+    assert rel_error(sparse.solve(f[:,1]),expected[:,1]) < 1e-13
+
+def test_fill_reducing_factor_is_small():
+    K = laplacian(40)
+    solver = DirectSolver(K)
+    if solver.method == "splu":
+        #順序付けにより分解のフィルインは密な逆行列(n^2)より十分小さい
+        assert solver.factor.nnz < 0.05 * K.shape[0]**2
+        assert solver.factor_bytes() < 0.05 * 8 * K.shape[0]**2
+
+def test_solve_reuses_factorization(monkeypatch):
+    data = beam("Quad_8node")
+    s = solve(data)
+    calls = []
+    splu = spla.splu
+    monkeypatch.setattr(spla,"splu",lambda *args,**kwargs: calls.append(1) or splu(*args,**kwargs))
+    #別の荷重ベクトル(右端の全節点に水平荷重)を分解済みのK_ffで求解
+    f = np.zeros(2 * len(s.mesh.node_ids))
+    right = np.flatnonzero(np.isclose(s.mesh.coords[:,0],2.0))
+    f[2 * right] = 1.0
+    d = s.solve(f)
+    assert calls == []
+    loaded = dict(data,loads=[{"node":int(i),"value":[1.0,0.0]} for i in right])
+    assert rel_error(d,reference(loaded).d) < 1e-11
+    #荷重に比例し、複数右辺も一度に解ける
+    D = s.solve(np.column_stack([f,-3 * f]))
+    assert rel_error(D[:,1],-3 * d) < 1e-13
+    assert calls == []
+    if s.linear_solver.method == "splu":
+        #新しく分解する場合は数えられる
+        DirectSolver(s.system.K_ff)
+        assert calls == [1]
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+from Analysis.ElementCache import ElementCache
+from tests.common import ELEMENT_TYPES, beam, solve, reference, rel_error
+
+@pytest.fixture(autouse=True)
+def fresh_caches(monkeypatch):
+    #プロセス内で共有のキャッシュを各テストで空にする
+    monkeypatch.setattr(ElementCache,"shared",{})
+
+def cache_stats(solver):
+    return [r["counters"]["element_cache"] for r in solver.profiler.stages if r["name"] == "K"][0]
+
+@pytest.mark.parametrize("element_type",ELEMENT_TYPES)
+def test_matches_reference(element_type):
+    data = beam(element_type)
+    ref = reference(data)
+    s = solve(data,element_cache=True)
+    assert rel_error(s.d_cases,ref.d_cases) < 1e-11
+    assert rel_error(s.nodal_stress,ref.nodal_stress) < 1e-11
+
+@pytest.mark.parametrize("element_type",ELEMENT_TYPES)
+def test_distorted_mesh_matches_reference(element_type):
+    data = beam(element_type)
+    rng = np.random.default_rng(0)
+    for node in data["nodes"]:
+        if 0.0 < node["x"] < 2.0 and 0.0 < node["y"] < 1.0:
+            node["x"] += rng.uniform(-0.05,0.05)
+            node["y"] += rng.uniform(-0.05,0.05)
+    ref = reference(data)
+    s = solve(data,element_cache=True)
+    assert rel_error(s.d_cases,ref.d_cases) < 1e-11
+
+def test_stats_per_model():
+    data = beam("Quad_4node")
+    n_elem = len(data["elements"])
+    first = cache_stats(solve(data,element_cache=True))
+    second = cache_stats(solve(data,element_cache=True))
+    #1要素1回だけ数え、2つ目のモデルは全て1つ目のモデルの要素にヒットする
+    assert first["hits"] + first["misses"] == n_elem
+    assert first["misses"] == 1
+    assert second == dict(second,hits=n_elem,misses=0,hit_rate=1.0)
+
+def test_one_cache_per_setting():
+    solve(beam("Quad_4node"),element_cache=True)
+    solve(beam("Quad_4node"),element_cache=True,element_cache_tol=1e-6)
+    assert len(ElementCache.shared) == 2
+    assert {cache.tol for cache in ElementCache.shared.values()} == {1e-6,ElementCache.DEFAULT_TOL}
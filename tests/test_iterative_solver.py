@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+from Analysis.LinearSolver import IterativeSolver
+from tests.common import beam, solve, reference, rel_error
+
+PRECONDITIONERS = ("jacobi","block_jacobi","ichol")
+
+@pytest.mark.parametrize("preconditioner",PRECONDITIONERS)
+def test_converges_to_direct(preconditioner):
+    data = beam("Quad_8node")
+    s = solve(data,solver="iterative",preconditioner=preconditioner,tolerance=1e-12)
+    solver = s.linear_solver
+    assert (solver.method,solver.preconditioner) == ("pcg",preconditioner)
+    assert rel_error(s.d_cases,reference(data).d_cases) < 1e-9
+    residuals = solver.residuals[0]
+    assert residuals[0] == 1.0 and residuals[-1] <= 1e-12
+    assert len(residuals) == solver.iterations[0] + 1
+    #相対残差は実際の残差 ||f - K d|| / ||f|| と一致する
+    K_ff, f = s.system.K_ff, s.F[s.system.free][:,0]
+    d_f = s.renumbering.to_internal(s.d_cases)[s.system.free][:,0]
+    assert np.linalg.norm(f - K_ff @ d_f) / np.linalg.norm(f) < 1e-11
+
+def test_tolerance_setting():
+    data = beam("Quad_4node",nx=16,ny=8)
+    loose = solve(data,solver="iterative",tolerance=1e-4).linear_solver
+    tight = solve(data,solver="iterative",tolerance=1e-10).linear_solver
+    assert loose.residuals[0][-1] <= 1e-4 < loose.residuals[0][-2]
+    assert loose.iterations[0] < tight.iterations[0]
+
+def test_stronger_preconditioner_needs_fewer_iterations():
+    data = beam("Quad_4node",nx=16,ny=8)
+    iterations = [solve(data,solver="iterative",preconditioner=name,tolerance=1e-8).linear_solver.iterations[0]
+                  for name in PRECONDITIONERS]
+    assert iterations[2] < iterations[1] <= iterations[0]
+
+def test_warns_without_convergence():
+    s = solve(beam("Quad_4node"),renumbering="none")
+    solver = IterativeSolver(s.system.K_ff,tol=1e-12,max_iter=3)
+    with pytest.warns(UserWarning,match="did not converge"):
+        solver.solve(np.ones(solver.n))
+    assert solver.iterations == 3
+
+@pytest.mark.parametrize("setting",[{"solver":"multigrid"},{"solver":"iterative","preconditioner":"amg"}])
+def test_unknown_setting(setting):
+    with pytest.raises(ValueError):
+        solve(beam("Quad_4node"),**setting)
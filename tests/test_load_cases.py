@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+import scipy.sparse.linalg as spla
+from tests.common import ELEMENT_TYPES, beam, solve, rel_error
+
+SIDE = [{"node":40,"value":[0.0,25.0]},{"node":44,"value":[-40.0,0.0]}]
+
+def case_data(element_type):
+    """
+    先端荷重"tip"と別の荷重"side"の2ケースと、その組合せ2つ。
+    """
+    data = beam(element_type)
+    data["loads"] = {"cases":[{"name":"tip","loads":data["loads"]},{"name":"side","loads":SIDE}],
+                     "combinations":[{"name":"1.2tip+side","factors":{"tip":1.2,"side":1.0}},
+                                     {"name":"-side","factors":{"side":-1.0}}]}
+    return data
+
+@pytest.mark.parametrize("element_type",ELEMENT_TYPES)
+def test_cases_match_separate_solves(element_type):
+    data = case_data(element_type)
+    s = solve(data)
+    results = s.load_case_results
+    assert list(results) == ["tip","side","1.2tip+side","-side"]
+    assert s.F.shape[1] == len(results) == 4
+    for name,loads in (("tip",beam(element_type)["loads"]),("side",SIDE)):
+        single = solve(dict(data,loads=loads))
+        assert rel_error(results[name]["d"],single.d) < 1e-12
+        assert rel_error(results[name]["nodal_stress"],single.nodal_stress) < 1e-10
+        assert abs(results[name]["strain_energy"] - single.strain_energy) < 1e-12 * single.strain_energy
+
+@pytest.mark.parametrize("element_type",ELEMENT_TYPES)
+def test_combinations_are_linear(element_type):
+    s = solve(case_data(element_type))
+    results = s.load_case_results
+    tip, side = results["tip"], results["side"]
+    combined = results["1.2tip+side"]
+    assert rel_error(combined["d"],1.2 * tip["d"] + side["d"]) < 1e-12
+    assert rel_error(combined["nodal_stress"][:,:3],1.2 * tip["nodal_stress"][:,:3] + side["nodal_stress"][:,:3]) < 1e-10
+    assert rel_error(s.reaction_cases[:,2],1.2 * s.reaction_cases[:,0] + s.reaction_cases[:,1]) < 1e-12
+    #ひずみエネルギーは変位の2次式のため、符号を反転したケースで等しく、組合せでは和にならない
+    assert abs(results["-side"]["strain_energy"] - side["strain_energy"]) < 1e-12 * side["strain_energy"]
+    assert abs(combined["strain_energy"] - (1.44 * tip["strain_energy"] + side["strain_energy"])) > 1e-6 * combined["strain_energy"]
+
+def test_one_factorization_for_all_cases(monkeypatch):
+    calls = []
+    splu = spla.splu
+    monkeypatch.setattr(spla,"splu",lambda *args,**kwargs: calls.append(1) or splu(*args,**kwargs))
+    s = solve(case_data("Quad_4node"))
+    if s.linear_solver.method == "splu":
+        assert len(calls) == 1
+    assert np.array_equal(s.d,s.d_cases[:,0])
+    summary = s.load_case_results.summary()
+    assert [row["name"] for row in summary] == ["tip","side","1.2tip+side","-side"]
+    assert summary[1]["max_abs_dx"] == np.abs(s.load_case_results[1]["dx"]).max()
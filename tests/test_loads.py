@@ -0,0 +1,50 @@
+import copy
+import numpy as np
+import pytest
+from Benchmark.MeshGenerator import MeshGenerator
+from Model.FEMModel import FEMModel
+from Model.BinaryModel import BinaryModel
+from Analysis.OutOfCore import OutOfCoreSolver
+
+def two_cases(element_type):
+    data = MeshGenerator.cantilever(4,2,element_type)
+    data["loads"] = {"cases":[{"name":"a","loads":[{"node":14,"value":[0.0,-1.0]}]},
+                              {"name":"b","loads":[{"node":9,"value":[2.0,0.0]}]}],
+                     "combinations":[]}
+    return data
+
+@pytest.mark.parametrize("case",[0,1])
+@pytest.mark.parametrize("node",[15,-1])
+def test_unknown_node_in_any_case(case,node):
+    data = two_cases("Quad_4node")
+    data["loads"]["cases"][case]["loads"].append({"node":node,"value":[1.0,0.0]})
+    with pytest.raises(ValueError,match="load case {}".format("ab"[case])):
+        FEMModel(data)
+
+def test_load_on_generated_mid_node():
+    #8節点要素では生成される中間節点の番号にも荷重を与えられる
+    data = two_cases("Quad_8node")
+    mid = MeshGenerator.mid_nodes(data["elements"],15,[4,9])[0]
+    data["loads"]["cases"][1]["loads"].append({"node":mid,"value":[0.0,3.0]})
+    model = FEMModel(copy.deepcopy(data))
+    assert np.allclose(model.mesh.coords[mid],[10.0,0.25])
+    nodes, values = model.load_cases["b"]
+    assert mid in nodes.tolist()
+    #同じ番号は4節点要素では存在しない節点
+    data["analysis_settings"][0]["element_type"] = "Quad_4node"
+    with pytest.raises(ValueError,match="load case b"):
+        FEMModel(data)
+
+def test_out_of_core_checks_every_case(tmp_path):
+    data = two_cases("Quad_4node")
+    data["loads"]["cases"][1]["loads"].append({"node":99,"value":[1.0,0.0]})
+    path = str(tmp_path / "model.fem")
+    header, arrays = BinaryModel.from_json(data)
+    BinaryModel.save(path,header,arrays)
+    work_dir = tmp_path / "work"
+    with pytest.raises(ValueError,match="load case b"):
+        OutOfCoreSolver(path)
+    #作業ディレクトリを指定した場合は削除しない
+    with pytest.raises(ValueError,match="load case b"):
+        OutOfCoreSolver(path,work_dir=str(work_dir))
+    assert work_dir.is_dir()
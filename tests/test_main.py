@@ -0,0 +1,54 @@
+import csv
+import json
+import os
+import pytest
+from Model.BinaryModel import BinaryModel
+import Main
+from tests.common import beam, solve
+
+def write_json(path,data):
+    os.makedirs(os.path.dirname(path),exist_ok=True)
+    with open(path,"w",encoding="utf-8") as f:
+        json.dump(data,f,default=float)
+    return path
+
+def test_output_names():
+    files = [os.path.join("a","beam.json"),os.path.join("b","beam.json"),"plate.json",os.path.join("c","plate.fem")]
+    assert Main.output_names(files) == ["a_beam","b_beam","plate","c_plate"]
+    #相対パスも同じ場合は入力の順番を付ける
+    assert Main.output_names(["x.json","x.json","y.json"]) == ["x","x_1","y"]
+
+def test_collect_inputs(tmp_path):
+    write_json(str(tmp_path / "b.json"),beam("Quad_4node"))
+    write_json(str(tmp_path / "a.json"),beam("Quad_4node"))
+    header, arrays = BinaryModel.from_json(beam("Quad_4node"))
+    BinaryModel.save(str(tmp_path / "c.fem"),header,arrays)
+    (tmp_path / "notes.txt").write_text("not a model")
+    files = Main.collect_inputs([str(tmp_path)])
+    assert [os.path.basename(f) for f in files] == ["a.json","b.json","c.fem"]
+    #バイナリ形式のディレクトリはそのまま1つの入力
+    assert Main.collect_inputs([str(tmp_path / "c.fem")]) == [str(tmp_path / "c.fem")]
+
+@pytest.mark.parametrize("workers",[1,2])
+def test_batch_outputs(workers,tmp_path):
+    #大きいモデルを先に渡し、並列実行で完了順が入力順と異なっても結果は入力順に並ぶことを確認
+    big, small = beam("Quad_8node",nx=24,ny=12), beam("Quad_4node")
+    inputs = [write_json(str(tmp_path / "in" / "big" / "beam.json"),big),
+              write_json(str(tmp_path / "in" / "small" / "beam.json"),small),
+              write_json(str(tmp_path / "in" / "broken.json"),{"nodes":[]})]
+    out_dir = str(tmp_path / "out")
+    status = Main.main(inputs + ["-o",out_dir,"-j",str(workers)])
+    assert status == 1
+    with open(os.path.join(out_dir,"summary.csv"),encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert [row["input"] for row in rows] == inputs
+    assert [row["status"] for row in rows] == ["ok","ok","error"]
+    assert rows[2]["error"].startswith("KeyError")
+    for row,data,name in zip(rows,(big,small),("big_beam","small_beam")):
+        assert row["result"] == os.path.join(out_dir,name + ".json")
+        with open(row["result"],encoding="utf-8") as f:
+            result = json.load(f)
+        expected = solve(data).strain_energy
+        assert abs(result["strain_energy"] - expected) < 1e-12 * expected
+        assert int(row["n_dof"]) == result["n_dof"]
+    assert sorted(os.listdir(out_dir)) == ["big_beam.json","small_beam.json","summary.csv"]
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+from Model.FEMModel import FEMModel
+from Analysis.SparseAssembly import SparseAssembly
+from tests.common import beam, solve, rel_error
+
+def test_node_order_in_input():
+    data = beam("Quad_4node")
+    #節点を逆順に、要素番号を飛び番で入力しても同じモデルになる
+    shuffled = dict(data,nodes=data["nodes"][::-1],elements=[dict(elem,id=100 + 3 * elem["id"]) for elem in data["elements"]])
+    mesh = FEMModel(shuffled).mesh
+    assert mesh.node_ids.tolist() == list(range(45))
+    assert mesh.nodes[44].x == 2.0 and mesh.nodes[44].y == 1.0
+    assert list(mesh.elements)[:3] == [100,103,106]
+    assert mesh.elements[103].node == data["elements"][1]["nodes"]
+    assert rel_error(solve(shuffled).d,solve(data).d) < 1e-14
+
+def test_node_ids_must_be_contiguous():
+    data = beam("Quad_4node")
+    data["nodes"][3]["id"] = 1000
+    with pytest.raises(ValueError):
+        FEMModel(data)
+
+def test_views_share_arrays():
+    mesh = FEMModel(beam("Quad_4node")).mesh
+    node = mesh.nodes[10]
+    assert node.bc_dist == [None,None]
+    node.bc_dist = [0.0,None]
+    node.bc_force = [1.0,-2.0]
+    assert mesh.bc_mask[10].tolist() == [True,False]
+    assert mesh.forces[10].tolist() == [1.0,-2.0]
+    mesh.coords[10] = [5.0,6.0]
+    assert (node.x,node.y) == (5.0,6.0)
+    elem = mesh.elements[0]
+    assert elem.cornernode == [0,1,10,9]
+    assert elem.xy[2].tolist() == [5.0,6.0]
+    assert elem.section is mesh.section_list[0] and elem.material is mesh.material_list[0]
+    with pytest.raises(KeyError):
+        mesh.nodes[45]
+
+def test_mid_nodes_follow_corner_nodes():
+    mesh = FEMModel(beam("Quad_8node")).mesh
+    assert mesh.n_corner_nodes == len(mesh.ori4node) == 45
+    #8 x 4の要素の辺の数 = 8 x 5 + 9 x 4
+    assert len(mesh.nodes) == 45 + 76
+    assert mesh.connectivity.shape == (32,8)
+    assert np.all(mesh.connectivity[:,4:] >= 45)
+
+def test_pattern_is_reset_by_topology_changes():
+    fem_model = FEMModel(beam("Quad_4node"))
+    mesh = fem_model.mesh
+    pattern = SparseAssembly.get_pattern(fem_model)
+    assert SparseAssembly.get_pattern(fem_model) is pattern
+    mesh.add_nodes(np.zeros((1,2)),np.zeros((1,2),dtype=bool),np.zeros((1,2)))
+    assert mesh.sparse_pattern is None and mesh.renumbering is None
+    assert len(mesh.forces) == len(mesh.coords) == 46
+
+def test_set_element_thickness_reuses_sections():
+    mesh = FEMModel(beam("Quad_4node")).mesh
+    mesh.set_element_thickness([0,1,2],[2.0,1.0,2.0])
+    assert [s.thickness for s in mesh.section_list] == [1.0,2.0]
+    assert mesh.get_element_thickness()[:4].tolist() == [2.0,1.0,2.0,1.0]
+    assert mesh.elements[0].section.id == mesh.elements[2].section.id != mesh.elements[1].section.id
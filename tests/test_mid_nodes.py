@@ -0,0 +1,70 @@
+import numpy as np
+from Model.FEMModel import FEMModel
+from tests.common import beam
+
+def mid_nodes_by_coordinates(mesh):
+    """
+    変更前の生成方法(要素ごと・辺ごとのループで、中点の座標が一致する中間節点を共有)による座標・拘束・接続。
+    """
+    coords = mesh.coords.tolist()
+    bc = [(tuple(m),tuple(v)) for m,v in zip(mesh.bc_mask.tolist(),mesh.bc_value.tolist())]
+    mid_nodes, new_xy, new_mask, mid_conn = {}, [], [], []
+    for corner in mesh.connectivity[:,:4].tolist():
+        row = []
+        for i in range(4):
+            n1, n2 = corner[i], corner[(i + 1) % 4]
+            xy = ((coords[n1][0] + coords[n2][0]) / 2,(coords[n1][1] + coords[n2][1]) / 2)
+            if xy not in mid_nodes:
+                mid_nodes[xy] = len(coords) + len(new_xy)
+                new_xy.append(xy)
+                new_mask.append(bc[n1][0] if bc[n1] == bc[n2] else (False,False))
+            row.append(mid_nodes[xy])
+        mid_conn.append(row)
+    return np.array(new_xy), np.array(new_mask), np.array(mid_conn)
+
+def test_matches_coordinate_matching():
+    data = beam("Quad_8node",nx=7,ny=5)
+    rng = np.random.default_rng(3)
+    for node in data["nodes"]:
+        node["x"] += rng.uniform(-0.02,0.02)
+        node["y"] += rng.uniform(-0.02,0.02)
+    corner_model = FEMModel(dict(data,loads=[],analysis_settings=[dict(data["analysis_settings"][0],element_type="Quad_4node")]))
+    xy, mask, mid_conn = mid_nodes_by_coordinates(corner_model.mesh)
+    mesh = FEMModel(data).mesh
+    n = mesh.n_corner_nodes
+    assert np.array_equal(mesh.connectivity[:,4:],mid_conn)
+    assert np.array_equal(mesh.coords[n:],xy)
+    assert np.array_equal(mesh.bc_mask[n:],mask)
+
+def test_edges_shared_by_topology_not_coordinates():
+    #同じ位置に別の節点がある(つながっていない)2要素: 座標では中間節点を共有してしまうが、辺の節点番号では共有しない
+    data = beam("Quad_8node",nx=1,ny=1)
+    data["nodes"] = [{"id":i,"x":x,"y":y} for i,(x,y) in enumerate([(0,0),(1,0),(1,1),(0,1),(0,1),(1,1),(1,2),(0,2)])]
+    data["elements"] = [{"id":0,"nodes":[0,1,2,3],"section_id":0},{"id":1,"nodes":[4,5,6,7],"section_id":0}]
+    data["boundary_conditions"] = [{"node":0,"type":[0,0]}]
+    data["loads"] = []
+    mesh = FEMModel(data).mesh
+    assert len(mesh.node_ids) == 8 + 8
+    assert mesh.connectivity[0,6] != mesh.connectivity[1,4]
+    assert np.array_equal(mesh.coords[mesh.connectivity[0,6]],mesh.coords[mesh.connectivity[1,4]])
+
+def test_boundary_conditions_of_mid_nodes():
+    data = beam("Quad_8node",nx=2,ny=2)
+    #左端(節点0, 3, 6)は固定、右端の節点2, 5はyを0.1、節点8はyを0.2で強制変位
+    data["boundary_conditions"] += [{"node":2,"type":[None,0.1]},{"node":5,"type":[None,0.1]},{"node":8,"type":[None,0.2]}]
+    mesh = FEMModel(data).mesh
+    n = mesh.n_corner_nodes
+    edges = {tuple(sorted(mesh.connectivity[e,[i,(i + 1) % 4]].tolist())):mesh.connectivity[e,4 + i]
+             for e in range(4) for i in range(4)}
+    assert mesh.nodes[edges[(0,3)]].bc_dist == [0.0,0.0]
+    assert mesh.nodes[edges[(2,5)]].bc_dist == [None,0.1]
+    assert mesh.nodes[edges[(5,8)]].bc_dist == [None,None]
+    assert mesh.nodes[edges[(0,1)]].bc_dist == [None,None]
+    assert all(node >= n for node in edges.values()) and len(set(edges.values())) == len(mesh.node_ids) - n
+
+def test_number_mid_nodes():
+    corner = np.array([[0,1,4,3],[1,2,5,4]])
+    a, b, mid_conn = FEMModel.number_mid_nodes(corner,6)
+    #辺は最初に現れた順に番号を付け、共有する辺(1-4)は同じ番号
+    assert list(zip(a.tolist(),b.tolist())) == [(0,1),(1,4),(4,3),(3,0),(1,2),(2,5),(5,4)]
+    assert mid_conn.tolist() == [[6,7,8,9],[10,11,12,7]]
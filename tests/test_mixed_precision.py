@@ -0,0 +1,52 @@
+import pytest
+from Benchmark.MeshGenerator import MeshGenerator
+from Analysis.LinearSolver import DirectSolver, sparse_bytes
+from tests.common import ELEMENT_TYPES, beam, solve, reference, rel_error
+
+def solve_counters(solver):
+    return [r["counters"] for r in solver.profiler.stages if r["name"] == "solve"][0]
+
+@pytest.mark.parametrize("element_type",ELEMENT_TYPES)
+@pytest.mark.parametrize("solver,preconditioner",[("direct",None),("iterative","ichol")])
+def test_matches_reference(element_type,solver,preconditioner):
+    data = beam(element_type)
+    ref = reference(data)
+    settings = {"solver":solver,"precision":"mixed","tolerance":1e-13}
+    if preconditioner is not None:
+        settings["preconditioner"] = preconditioner
+    s = solve(data,**settings)
+    assert rel_error(s.d_cases,ref.d_cases) < 1e-11
+    assert rel_error(s.nodal_stress,ref.nodal_stress) < 1e-11
+    memory = solve_counters(s)["memory"]
+    assert memory["matrix"] > 0 and memory["preconditioner"] > 0
+
+def test_refinement_on_slender_beam():
+    #単精度の分解のみでは精度が不足する細長い梁でも、倍精度の反復で直接法と一致する
+    data = MeshGenerator.cantilever(80,4,"Quad_8node")
+    ref = solve(data)
+    s = solve(data,precision="mixed",tolerance=1e-12)
+    assert solve_counters(s)["method"] == "mixed"
+    assert rel_error(s.d_cases,ref.d_cases) < 1e-10
+
+def test_factor_memory():
+    #単精度の分解結果は、同じK_ffの倍精度の分解より実際に小さい(倍精度のK_ffは両方で保持する)
+    data = MeshGenerator.cantilever(40,8,"Quad_8node")
+    s = solve(data,precision="mixed",tolerance=1e-10)
+    memory = solve_counters(s)["memory"]
+    double = DirectSolver(s.system.K_ff).factor_bytes()
+    assert memory["preconditioner"] == s.linear_solver.factor.factor_bytes()
+    assert memory["preconditioner"] < 0.75 * double
+    assert memory["matrix"] == sparse_bytes(s.system.K_ff)
+
+def test_load_cases():
+    data = beam("Quad_4node")
+    data["loads"] = {"cases":[{"name":"a","loads":data["loads"]},{"name":"b","loads":[{"node":5,"value":[3.0,0.0]}]}],
+                     "combinations":[{"name":"c","factors":{"a":1.0,"b":2.0}}]}
+    ref = reference(data)
+    s = solve(data,precision="mixed",tolerance=1e-13)
+    assert len(solve_counters(s)["iterations"]) == 3
+    assert rel_error(s.d_cases,ref.d_cases) < 1e-11
+
+def test_unknown_precision():
+    with pytest.raises(ValueError):
+        solve(beam("Quad_4node"),precision="half")
@@ -0,0 +1,71 @@
+import os
+import tempfile
+import numpy as np
+import pytest
+from Model.BinaryModel import BinaryModel
+from Analysis.OutOfCore import OutOfCoreSolver
+from tests.common import beam, solve, rel_error
+
+def save_binary(data,tmp_path):
+    path = os.path.join(str(tmp_path),"model.fem")
+    header, arrays = BinaryModel.from_json(data)
+    BinaryModel.save(path,header,arrays)
+    return path
+
+def load_case_beam(element_type):
+    data = beam(element_type,tolerance=1e-13)
+    data["loads"] = {"cases":[{"name":"a","loads":data["loads"]},{"name":"b","loads":[{"node":5,"value":[3.0,0.0]}]}],
+                     "combinations":[{"name":"c","factors":{"a":1.0,"b":2.0}}]}
+    return data
+
+@pytest.mark.parametrize("element_type",OutOfCoreSolver.ELEMENT_TYPES)
+@pytest.mark.parametrize("memory_budget_mb",[0.05,256])
+def test_matches_solver(element_type,memory_budget_mb,tmp_path):
+    data = load_case_beam(element_type)
+    ref = solve(data)
+    s = OutOfCoreSolver(save_binary(data,tmp_path),memory_budget_mb=memory_budget_mb)
+    try:
+        X = np.random.default_rng(0).standard_normal((s.n_dof,3))
+        #Solverの全体剛性マトリクスは並べ替え後の内部自由度順
+        KX = ref.renumbering.to_external(ref.K @ ref.renumbering.to_internal(X))
+        assert rel_error(s.matrix.matvec(X),KX) < 1e-13
+        assert s.load_case_names == ref.load_case_names
+        assert rel_error(s.d_cases,ref.d_cases) < 1e-13
+        assert rel_error(s.reaction_cases,ref.reaction_cases) < 1e-13
+        assert np.allclose(s.strain_energy,ref.load_case_results.strain_energy,rtol=1e-13)
+    finally:
+        s.close()
+
+def test_small_budget_splits_blocks(tmp_path):
+    data = load_case_beam("Quad_4node")
+    s = OutOfCoreSolver(save_binary(data,tmp_path),memory_budget_mb=0.05)
+    try:
+        counters = {r["name"]:r["counters"] for r in s.profiler.stages}
+        assert counters["element_blocks"]["n_chunks"] > 1
+        assert counters["merge"]["n_bands"] > 1
+    finally:
+        s.close()
+
+def test_vectors_count_against_budget(tmp_path):
+    data = load_case_beam("Quad_4node")
+    path = save_binary(data,tmp_path)
+    needed = OutOfCoreSolver.vector_bytes(90,3)
+    #荷重・変位・PCGの作業ベクトルだけで上限を超える場合は作業ディレクトリを残さずに中断する
+    before = set(os.listdir(tempfile.gettempdir()))
+    with pytest.raises(ValueError,match="memory_budget_mb"):
+        OutOfCoreSolver(path,memory_budget_mb=0.9 * needed / 2**20)
+    assert set(os.listdir(tempfile.gettempdir())) == before
+    s = OutOfCoreSolver(path,memory_budget_mb=1.1 * needed / 2**20)
+    try:
+        counters = {r["name"]:r["counters"] for r in s.profiler.stages}
+        assert counters["loads"]["vector_bytes"] == needed
+        #残りの上限が小さいため最小の大きさの帯に分かれる
+        assert s.max_entries == 64
+        assert counters["merge"]["n_bands"] > 10
+        assert rel_error(s.d_cases,solve(data).d_cases) < 1e-13
+    finally:
+        s.close()
+
+def test_unsupported_element_type(tmp_path):
+    with pytest.raises(ValueError):
+        OutOfCoreSolver(save_binary(beam("Quad_8node"),tmp_path))
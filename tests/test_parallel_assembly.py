@@ -0,0 +1,46 @@
+import os
+import numpy as np
+import pytest
+from Analysis.ElementCache import ElementCache
+from Analysis.SparseAssembly import SparseAssembly
+from Model.FEMModel import FEMModel
+from tests.common import ELEMENT_TYPES, beam, solve, reference, rel_error
+
+def k_counters(solver):
+    return [r["counters"] for r in solver.profiler.stages if r["name"] == "K"][0]
+
+@pytest.mark.parametrize("element_type",ELEMENT_TYPES)
+@pytest.mark.parametrize("workers",[2,3])
+def test_matches_reference(element_type,workers):
+    data = beam(element_type)
+    ref = reference(data)
+    serial = solve(data)
+    s = solve(data,assembly_workers=workers)
+    assert rel_error(s.K.toarray(),serial.K.toarray()) < 1e-14
+    assert rel_error(s.d_cases,ref.d_cases) < 1e-11
+    assert rel_error(s.nodal_stress,ref.nodal_stress) < 1e-11
+
+def test_with_element_cache(monkeypatch):
+    #スレッド間で共有するキャッシュを使う場合(ミスの要素はロックの外で算出)
+    monkeypatch.setattr(ElementCache,"shared",{})
+    data = beam("Quad_8node",nx=16,ny=8)
+    rng = np.random.default_rng(1)
+    for node in data["nodes"]:
+        if 0.0 < node["x"] < 2.0 and 0.0 < node["y"] < 1.0:
+            node["x"] += rng.uniform(-0.02,0.02)
+    ref = reference(data)
+    s = solve(data,assembly_workers=4,element_cache=True)
+    assert rel_error(s.d_cases,ref.d_cases) < 1e-11
+    stats = k_counters(s)["element_cache"]
+    assert stats["hits"] + stats["misses"] == len(data["elements"])
+
+def test_chunks_per_worker():
+    data = beam("Quad_4node")
+    assert k_counters(solve(data))["n_chunks"] == 1
+    counters = k_counters(solve(data,assembly_workers=2))
+    assert counters["workers"] == 2
+    assert counters["n_chunks"] == 4 * 2
+
+def test_auto_workers():
+    data = beam("Quad_4node",assembly_workers="auto")
+    assert SparseAssembly.n_workers(FEMModel(data)) == (os.cpu_count() or 1)
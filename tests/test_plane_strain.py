@@ -0,0 +1,52 @@
+import copy
+import numpy as np
+import pytest
+from Benchmark.MeshGenerator import MeshGenerator
+from tests.common import ELEMENT_TYPES, beam, solve, reference, rel_error
+
+E, NU = MeshGenerator.MATERIAL["E"], MeshGenerator.MATERIAL["nu"]
+
+def plane_strain(data):
+    data = copy.deepcopy(data)
+    for section in data["sections"]:
+        section["type"] = "plane_strain"
+    return data
+
+@pytest.mark.parametrize("element_type",ELEMENT_TYPES)
+def test_equivalent_plane_stress(element_type):
+    #平面ひずみは E' = E/(1-ν^2), ν' = ν/(1-ν) の平面応力と同じ変位・面内応力になる
+    data = beam(element_type)
+    equivalent = copy.deepcopy(data)
+    equivalent["materials"][0].update(E=E / (1 - NU**2),nu=NU / (1 - NU))
+    ref = reference(equivalent)
+    s = solve(plane_strain(data))
+    assert rel_error(s.d_cases,ref.d_cases) < 1e-11
+    assert rel_error(s.nodal_stress[:,:3],ref.nodal_stress[:,:3]) < 1e-11
+
+@pytest.mark.parametrize("element_type",ELEMENT_TYPES)
+def test_uniform_tension_patch(element_type):
+    sigma = 100.0
+    data = plane_strain(MeshGenerator.plate(4,4,element_type,sigma=sigma))
+    s = solve(data)
+    right = [j * 5 + 4 for j in range(5)]
+    assert np.allclose(s.d[2 * np.array(right)],sigma * (1 - NU**2) / E,rtol=1e-10)
+    assert np.allclose(s.gp_stress[...,0],sigma,rtol=1e-10)
+    #σz = ν σx を含むvon Mises応力(節点への外挿の倍率によらない比で確認)
+    assert np.allclose(s.nodal_stress[:,3] / s.nodal_stress[:,0],np.sqrt(1 - NU + NU**2),rtol=1e-10)
+
+@pytest.mark.parametrize("element_type",ELEMENT_TYPES)
+def test_mixed_materials_and_sections(element_type):
+    data = beam(element_type,nx=8,ny=4)
+    data["materials"].append({"id":5,"name":"Concrete","E":30000.0,"nu":0.2})
+    data["sections"].append({"id":1,"type":"plane_strain","thickness":0.5})
+    for element in data["elements"]:
+        if element["id"] % 8 < 4:
+            element["material_id"] = 5
+        if (element["id"] // 8) % 2:
+            element["section_id"] = 1
+    ref = reference(data)
+    s = solve(data)
+    k_counters = [r["counters"] for r in s.profiler.stages if r["name"] == "K"][0]
+    assert k_counters["n_groups"] == len(s.D)
+    assert rel_error(s.d_cases,ref.d_cases) < 1e-11
+    assert rel_error(s.nodal_stress,ref.nodal_stress) < 1e-11
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+from Benchmark.MeshGenerator import MeshGenerator
+from tests.common import beam, solve, rel_error
+
+E, NU = MeshGenerator.MATERIAL["E"], MeshGenerator.MATERIAL["nu"]
+
+def linear_field(x,y):
+    return 1e-3 * (1.0 + 2.0 * x + 0.5 * y), 1e-3 * (-1.0 + 0.3 * x - y)
+
+#非適合要素はTaylorの補正が無いため、要素がゆがむと定ひずみ状態を再現しない
+@pytest.mark.parametrize("element_type,distortion",[("Quad_4node",0.06),("Quad_4node_Incomp",0.0)])
+def test_patch_with_prescribed_boundary(element_type,distortion):
+    #外周の全節点に1次の変位場を与えると、内部の節点(乱数で移動)も同じ変位場になり、応力は一定
+    data = MeshGenerator.plate(4,4,element_type)
+    data["loads"] = []
+    rng = np.random.default_rng(4)
+    boundary = []
+    for node in data["nodes"]:
+        if 0.0 < node["x"] < 1.0 and 0.0 < node["y"] < 1.0:
+            node["x"] += rng.uniform(-distortion,distortion)
+            node["y"] += rng.uniform(-distortion,distortion)
+        else:
+            boundary.append({"node":node["id"],"type":list(linear_field(node["x"],node["y"]))})
+    data["boundary_conditions"] = boundary
+    s = solve(data)
+    u, v = linear_field(s.mesh.coords[:,0],s.mesh.coords[:,1])
+    assert rel_error(s.d,np.column_stack([u,v]).ravel()) < 1e-12
+    strain = 1e-3 * np.array([2.0,-1.0,0.8])
+    D = E / (1 - NU**2) * np.array([[1,NU,0],[NU,1,0],[0,0,(1 - NU) / 2]])
+    assert np.allclose(s.gp_stress,D @ strain,rtol=1e-10)
+    #荷重が無いため反力は自己釣り合い
+    R = s.reactions.reshape(-1,2)
+    assert np.abs(R.sum(axis=0)).max() < 1e-10 * np.abs(R).max()
+
+def test_reactions_balance_loads():
+    s = solve(beam("Quad_8node"))
+    R, F = s.reactions.reshape(-1,2), s.renumbering.to_external(s.F)[:,0].reshape(-1,2)
+    x, y = s.mesh.coords[:,0], s.mesh.coords[:,1]
+    assert np.abs(R + F).sum(axis=0).max() > 0.0
+    assert np.abs((R + F).sum(axis=0)).max() < 1e-10 * np.abs(F).sum()
+    moment = np.sum(x * (R + F)[:,1] - y * (R + F)[:,0])
+    assert abs(moment) < 1e-10 * np.abs(F).sum()
+    #拘束のない自由度の反力は0
+    assert np.all(R[~s.mesh.bc_mask] == 0.0)
+
+def test_prescribed_tip_equals_reaction_load():
+    data = beam("Quad_4node")
+    data["loads"] = []
+    tip = [8,17,26,35,44]
+    data["boundary_conditions"] += [{"node":n,"type":[None,-2e-3]} for n in tip]
+    prescribed = solve(data)
+    R = prescribed.reactions.reshape(-1,2)
+    assert R[tip,1].sum() < 0.0
+    #強制変位で生じた反力を荷重として与えると同じ変位になる
+    loaded = dict(data,boundary_conditions=data["boundary_conditions"][:-len(tip)],
+                  loads=[{"node":n,"value":[0.0,float(R[n,1])]} for n in tip])
+    s = solve(loaded)
+    assert rel_error(s.d,prescribed.d) < 1e-10
+    assert np.allclose(prescribed.d.reshape(-1,2)[tip,1],-2e-3)
+    #Kは拘束で書き換えない
+    assert abs(prescribed.K - s.K).max() == 0.0
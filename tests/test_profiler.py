@@ -0,0 +1,73 @@
+import json
+import time
+import numpy as np
+from Analysis.Profiler import Profiler
+from Model.FEMModel import FEMModel
+from Analysis.Solver import Solver
+from tests.common import beam
+
+MB = 2**20
+
+def test_nested_peak_memory():
+    profiler = Profiler(memory=True)
+    with profiler.stage("outer"):
+        block = np.ones(8 * MB // 8)
+        del block
+        with profiler.stage("inner"):
+            small = np.ones(MB // 8)
+            del small
+    records = {record["name"]:record for record in profiler.stages}
+    #内側の段階のreset_peakで外側の8MBのピークが消えないこと
+    assert records["outer"]["peak_memory"] >= 8 * MB
+    assert MB <= records["inner"]["peak_memory"] < 2 * MB
+    assert (records["outer"]["depth"],records["inner"]["depth"]) == (0,1)
+
+def test_inner_peak_propagates_to_outer():
+    profiler = Profiler(memory=True)
+    with profiler.stage("outer"):
+        with profiler.stage("inner"):
+            block = np.ones(4 * MB // 8)
+            del block
+        with profiler.stage("sibling"):
+            pass
+    records = {record["name"]:record for record in profiler.stages}
+    assert records["inner"]["peak_memory"] >= 4 * MB
+    assert records["sibling"]["peak_memory"] < MB
+    assert records["outer"]["peak_memory"] >= 4 * MB
+
+def test_total_counts_top_level_only():
+    profiler = Profiler()
+    with profiler.stage("outer"):
+        with profiler.stage("inner"):
+            time.sleep(0.05)
+    with profiler.stage("second"):
+        pass
+    profile = profiler.to_dict()
+    records = {record["name"]:record for record in profile["stages"]}
+    assert [record["name"] for record in profile["stages"]] == ["inner","outer","second"]
+    assert profile["total_wall"] == records["outer"]["wall"] + records["second"]["wall"]
+    assert profile["total_wall"] < 0.05 + records["inner"]["wall"]
+    assert "  inner" in profiler.summary()
+
+def test_solver_stages_and_hooks(tmp_path):
+    events = []
+    data = beam("Quad_8node")
+    model = FEMModel(data)
+    model.profiler.add_hook(events.append)
+    s = Solver(model)
+    records = {record["name"]:record for record in s.profiler.stages}
+    n_dof = 2 * len(s.mesh.node_ids)
+    assert ["parse","build_mesh","mid_nodes"] == [record["name"] for record in s.profiler.stages[:3]]
+    assert records["K"]["counters"]["n_elements"] == 32
+    assert records["K"]["counters"]["n_dof"] == records["solve"]["counters"]["n_dof"] == n_dof
+    assert records["K"]["counters"]["nnz"] == s.K.nnz
+    assert all(record["depth"] == 0 and record["peak_memory"] is None for record in s.profiler.stages)
+    #FEMModelの作成後に追加したhookは解析段階だけを受け取る
+    assert [event["name"] for event in events] == [record["name"] for record in s.profiler.stages[3:]]
+    assert all(event["event"] == "stage" for event in events)
+    path = tmp_path / "profile.json"
+    s.profiler.to_json(str(path))
+    with open(path,encoding="utf-8") as f:
+        profile = json.load(f)
+    assert len(profile["stages"]) == len(s.profiler.stages)
+    assert abs(profile["total_wall"] - sum(record["wall"] for record in s.profiler.stages)) < 1e-12
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+from Benchmark.MeshGenerator import MeshGenerator
+from Model.FEMModel import FEMModel
+from Analysis.Solver import Solver
+from Analysis.Renumbering import Renumbering
+
+def long_beam(**analysis_settings):
+    #節点番号がx方向に並ぶため、並べ替え前の半帯幅は nx 程度と大きい
+    return MeshGenerator.cantilever(30,3,"Quad_4node",L=4.0,H=1.0,**analysis_settings)
+
+def envelope(K):
+    """
+    Kの非ゼロ構造から直接数えた半帯幅(対角からの最大距離)とプロファイル(下三角の包絡線内の成分数)。
+    """
+    coo = K.tocoo()
+    rows, cols = coo.row, coo.col
+    first = np.full(K.shape[0],K.shape[0])
+    np.minimum.at(first,rows,cols)
+    first = np.minimum(first,np.arange(K.shape[0]))
+    return int(np.abs(rows - cols).max()), int(np.sum(np.arange(K.shape[0]) - first + 1))
+
+@pytest.mark.parametrize("method",["none","rcm","nd"])
+def test_bandwidth_profile_match_matrix(method):
+    s = Solver(FEMModel(long_beam(renumbering=method)))
+    bandwidth, profile = envelope(s.K)
+    assert s.renumbering.bandwidth_after == bandwidth
+    assert s.renumbering.profile_after == profile
+
+def test_rcm_reduces_bandwidth():
+    report = Solver(FEMModel(long_beam(renumbering="rcm"))).renumbering.report()
+    assert report["bandwidth_after"] < report["bandwidth_before"] / 3
+    assert report["profile_after"] < report["profile_before"]
+
+def test_default_is_rcm_and_recorded():
+    s = Solver(FEMModel(long_beam()))
+    counters = [r["counters"] for r in s.profiler.stages if r["name"] == "renumbering"][0]
+    assert counters == s.renumbering.report()
+    assert counters["method"] == Renumbering.DEFAULT_METHOD == "rcm"
+
+@pytest.mark.parametrize("method",["rcm","nd"])
+@pytest.mark.parametrize("solver",["direct","iterative"])
+def test_displacements_unchanged(method,solver):
+    settings = {"solver":solver,"preconditioner":"ichol","tolerance":1e-13}
+    base = Solver(FEMModel(long_beam(renumbering="none",**settings)))
+    s = Solver(FEMModel(long_beam(renumbering=method,**settings)))
+    assert not np.array_equal(s.renumbering.perm,np.arange(len(s.renumbering.perm)))
+    assert np.abs(s.d_cases - base.d_cases).max() < 1e-10 * np.abs(base.d_cases).max()
+    assert np.abs(s.nodal_stress - base.nodal_stress).max() < 1e-10 * np.abs(base.nodal_stress).max()
@@ -0,0 +1,72 @@
+import copy
+import io
+import json
+from collections import OrderedDict
+import numpy as np
+import pytest
+import scipy.sparse.linalg as spla
+import Server
+from tests.common import beam, solve, rel_error
+
+@pytest.fixture(autouse=True)
+def empty_caches(monkeypatch):
+    monkeypatch.setattr(Server,"MODEL_CACHE",OrderedDict())
+    monkeypatch.setattr(Server,"PATTERN_CACHE",OrderedDict())
+
+def request(data):
+    return Server.analyze(data,Server.model_hash(data,with_loads=False))
+
+def scaled_loads(data,factor):
+    data = copy.deepcopy(data)
+    for load in data["loads"]:
+        load["value"] = [factor * v for v in load["value"]]
+    return data
+
+def test_load_change_reuses_factorization(monkeypatch):
+    data = beam("Quad_8node",solver="direct")
+    assert request(data)["cache"] == "none"
+    calls = []
+    splu = spla.splu
+    monkeypatch.setattr(spla,"splu",lambda *args,**kwargs: calls.append(1) or splu(*args,**kwargs))
+    changed = scaled_loads(data,-3.0)
+    result = request(changed)
+    #荷重のみ異なるモデルは分解し直さず、新たに解析した結果と一致
+    assert result["cache"] == "factorization" and calls == []
+    fresh = solve(changed)
+    assert calls or fresh.linear_solver.method != "splu"
+    assert rel_error(result["d"],fresh.d_cases) < 1e-12
+    assert rel_error(result["reactions"],fresh.reaction_cases) < 1e-12
+    assert rel_error(result["nodal_stress"],fresh.load_case_results.nodal_stress) < 1e-12
+    assert np.isclose(result["strain_energy"][0],9.0 * request(data)["strain_energy"][0])
+
+def test_same_connectivity_reuses_pattern():
+    data = beam("Quad_4node")
+    request(data)
+    moved = copy.deepcopy(data)
+    for node in moved["nodes"]:
+        node["y"] *= 1.5
+    #座標が異なれば分解は使えないが、要素接続が同じため非ゼロ構造は再利用
+    result = request(moved)
+    assert result["cache"] == "pattern"
+    assert rel_error(result["d"],solve(moved).d_cases) < 1e-12
+    assert len(Server.MODEL_CACHE) == 2 and len(Server.PATTERN_CACHE) == 1
+
+def test_model_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(Server,"CACHE_SIZE",2)
+    models = [beam("Quad_4node",nx=n,ny=2) for n in (2,3,4)]
+    for data in models:
+        request(data)
+    assert list(Server.MODEL_CACHE) == [Server.model_hash(data,with_loads=False) for data in models[1:]]
+    assert request(models[0])["cache"] == "none"
+
+def test_encode_result():
+    data = beam("Quad_4node")
+    result = request(data)
+    body, content_type = Server.encode_result(result,"json")
+    body = json.loads(body)
+    assert content_type == "application/json" and body["n_nodes"] == 45
+    assert np.allclose(body["displacement"],result["d"][:,0].reshape(-1,2))
+    body, content_type = Server.encode_result(result,"npz")
+    arrays = np.load(io.BytesIO(body))
+    assert content_type == "application/octet-stream"
+    assert np.array_equal(arrays["reactions"],result["reactions"])
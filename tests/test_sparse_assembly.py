@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+import scipy.sparse as sp
+from Analysis.SparseAssembly import SparsityPattern
+from tests.common import ELEMENT_TYPES, beam, solve
+
+@pytest.mark.parametrize("element_type",ELEMENT_TYPES)
+def test_sparse_matches_dense(element_type):
+    data = beam(element_type,nx=5,ny=3)
+    s = solve(data,renumbering="none",element_cache=False)
+    sparse = s.K
+    dense = solve(data,assembly="dense",renumbering="none",element_cache=False).K
+    assert sp.isspmatrix_csr(sparse) and isinstance(dense,np.ndarray)
+    assert np.abs(sparse.toarray() - dense).max() < 1e-12 * np.abs(dense).max()
+    #非ゼロ構造は同じ要素に属する節点の組ごとの2x2ブロックのみ
+    pairs = {(i,j) for conn in s.mesh.connectivity.tolist() for i in conn for j in conn}
+    assert sparse.nnz == 4 * len(pairs)
+
+@pytest.mark.parametrize("element_type",ELEMENT_TYPES)
+def test_rigid_body_modes(element_type):
+    s = solve(beam(element_type,nx=5,ny=3),renumbering="none")
+    x, y = s.mesh.coords[:,0], s.mesh.coords[:,1]
+    modes = {"x":np.column_stack([np.ones_like(x),0 * x]),"y":np.column_stack([0 * x,np.ones_like(x)]),
+             "rotation":np.column_stack([-y,x])}
+    scale = abs(s.K).max()
+    for name,mode in modes.items():
+        assert np.abs(s.K @ mode.ravel()).max() < 1e-10 * scale, name
+    assert abs(s.K - s.K.T).max() < 1e-12 * scale
+
+def test_pattern_slots():
+    #自由度を1つ共有する2つの2自由度要素
+    pattern = SparsityPattern(3,np.array([[0,1],[1,2]]))
+    assert pattern.nnz == 7
+    Ke = np.array([[[1.0,2.0],[3.0,4.0]],[[10.0,20.0],[30.0,40.0]]])
+    expected = np.array([[1.0,2.0,0.0],[3.0,14.0,20.0],[0.0,30.0,40.0]])
+    assert np.array_equal(pattern.assemble(Ke).toarray(),expected)
+    data = np.zeros(pattern.nnz)
+    pattern.add_elements(data,0,Ke[:1])
+    pattern.add_elements(data,1,Ke[1:])
+    assert np.array_equal(pattern.to_csr(data).toarray(),expected)
+    lo, local = pattern.local_data(1,Ke[1:])
+    data = np.zeros(pattern.nnz)
+    data[lo:lo + len(local)] = local
+    assert np.array_equal(pattern.to_csr(data).toarray(),np.pad(Ke[1],((1,0),(1,0))))
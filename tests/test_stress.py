@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+from collections import defaultdict
+from Model.FEMModel import FEMModel
+from Analysis.Solver import Solver
+from Analysis.CalcStress import CalcStress
+from Analysis.Calc_Q4 import Calc_Q4
+from Analysis.Calc_Q8 import Calc_Q8
+from Analysis.Calc_Q4Incomp import Calc_Q4Incomp
+from tests.common import ELEMENT_TYPES, beam
+
+def distorted_solver(element_type):
+    data = beam(element_type,nx=6,ny=3)
+    rng = np.random.default_rng(2)
+    for node in data["nodes"]:
+        if 0.0 < node["x"] < 2.0 and 0.0 < node["y"] < 1.0:
+            node["x"] += rng.uniform(-0.08,0.08)
+            node["y"] += rng.uniform(-0.08,0.08)
+    return Solver(FEMModel(data))
+
+def stress_by_element(s):
+    """
+    要素ごと・積分点ごとのループで積分点応力を求め、隅節点へ外挿して節点ごとに平均した応力(sigX, sigY, tauXY, von Mises)。
+    """
+    element_type = s.fem_model.analysis_setting["element_type"]
+    D = s.D[0]
+    E = CalcStress.calc_extrapolation_matrix(s.gps)
+    values = defaultdict(list)
+    for elem in s.mesh.elements.values():
+        d_e = np.array([s.d_cases[2 * n + c,0] for n in elem.node for c in range(2)])
+        if element_type == "Quad_4node_Incomp":
+            B = [Calc_Q4Incomp.calc_KeBe(elem,xi,eta,D,s.gps)[1] for xi,eta,_,_ in s.gps]
+        else:
+            calc = Calc_Q4 if element_type == "Quad_4node" else Calc_Q8
+            B = [calc.calc_B(elem,xi,eta)[0] for xi,eta,_,_ in s.gps]
+        gp_stress = np.array([D @ b @ d_e for b in B])
+        for node,stress in zip(elem.cornernode,E @ gp_stress):
+            values[node].append(stress)
+    stress = np.array([np.mean(values[i],axis=0) for i in range(s.mesh.n_corner_nodes)])
+    return np.column_stack([stress,CalcStress.calc_mises(stress)])
+
+@pytest.mark.parametrize("element_type",ELEMENT_TYPES)
+def test_vectorized_matches_element_loop(element_type):
+    s = distorted_solver(element_type)
+    expected = stress_by_element(s)
+    assert s.nodal_stress.shape == (s.mesh.n_corner_nodes,4)
+    assert np.abs(s.nodal_stress - expected).max() < 1e-10 * np.abs(expected).max()
+    assert s.calc_stress()[5].tolist() == s.nodal_stress[5].tolist()
+
+def test_average_nodal():
+    #節点1, 2を共有する2要素と、どの要素にも属さない節点6
+    corner_nodes = np.array([[0,1,2,3],[1,4,5,2]])
+    node_stress_e = np.arange(8,dtype=float).reshape(2,4,1)
+    stress = CalcStress.average_nodal(corner_nodes,node_stress_e,7)[:,0]
+    assert stress[:6].tolist() == [0.0,2.5,4.5,3.0,5.0,6.0]
+    assert np.isnan(stress[6])
+
+def test_mises():
+    #一軸・純せん断・等二軸(平面応力)
+    stress = np.array([[100.0,0.0,0.0],[0.0,0.0,50.0],[80.0,80.0,0.0]])
+    assert np.allclose(CalcStress.calc_mises(stress),[100.0,50.0 * np.sqrt(3),80.0])
+    #面外応力を含む静水圧状態
+    assert CalcStress.calc_mises(np.array([80.0,80.0,0.0,80.0])) == 0.0
@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+from Model.FEMModel import FEMModel
+from Analysis.Solver import Solver
+from Analysis.AdaptiveRefinement import AdaptiveRefinement
+from Analysis.TopologyOptimization import TopologyOptimization
+from tests.common import ELEMENT_TYPES, beam, reference, rel_error
+
+def compliance(to,x):
+    densities = to.filter(x)
+    _, ce = to.analyze(densities)
+    return float(np.sum(to.stiffness_scale(densities) * ce))
+
+def gradient(to,x):
+    densities = to.filter(x)
+    _, ce = to.analyze(densities)
+    dc = -to.penal * densities**(to.penal - 1) * (1.0 - to.E_min) * ce
+    return to.filter_gradient(dc)
+
+@pytest.mark.parametrize("element_type",ELEMENT_TYPES)
+def test_full_density_matches_reference(element_type):
+    data = beam(element_type)
+    ref = reference(data)
+    to = TopologyOptimization(FEMModel(data),0.5)
+    d, ce = to.analyze(np.ones(len(to.x)))
+    assert rel_error(to.solver.renumbering.to_external(d),ref.d_cases) < 1e-11
+    #コンプライアンス = F^T d = 2 x ひずみエネルギー
+    assert abs(ce.sum() - 2 * ref.strain_energy) < 1e-11 * ref.strain_energy
+
+@pytest.mark.parametrize("element_type",ELEMENT_TYPES)
+def test_sensitivity_finite_difference(element_type):
+    to = TopologyOptimization(FEMModel(beam(element_type,nx=12,ny=4)),0.5)
+    x = np.random.default_rng(0).uniform(0.3,1.0,len(to.x))
+    g = gradient(to,x)
+    h = 1e-6
+    for e in (0,7,25,47):
+        step = np.zeros_like(x)
+        step[e] = h
+        fd = (compliance(to,x + step) - compliance(to,x - step)) / (2 * h)
+        assert abs(fd - g[e]) < 1e-6 * np.abs(g).max()
+
+def test_run_reduces_compliance():
+    to = TopologyOptimization(FEMModel(beam("Quad_4node",nx=16,ny=8)),0.4)
+    to.run(20,0.01)
+    history = to.history
+    assert history[-1]["compliance"] < history[0]["compliance"]
+    assert abs(history[-1]["volume"] - 0.4) < 1e-3
+
+@pytest.mark.parametrize("element_type",("Quad_4node","Quad_4node_Incomp"))
+def test_hanging_nodes_match_solver(element_type):
+    ar = AdaptiveRefinement(FEMModel(beam(element_type)))
+    s = Solver(ar.fem_model)
+    x = s.mesh.coords[s.mesh.connectivity[:,:4]].mean(axis=1)[:,0]
+    ar.refine(x < 0.5,s.d_cases)
+    assert len(ar.fem_model.mesh.hanging_nodes) > 0
+    ref = Solver(ar.fem_model)
+    to = TopologyOptimization(ar.fem_model,0.5)
+    d, ce = to.analyze(np.ones(len(to.x)))
+    assert rel_error(to.solver.renumbering.to_external(d),ref.d_cases) < 1e-11
+    assert abs(ce.sum() - 2 * ref.strain_energy) < 1e-11 * ref.strain_energy
+
+def test_refactor_reuses_ordering():
+    to = TopologyOptimization(FEMModel(beam("Quad_8node",nx=16,ny=4)),0.5)
+    x = np.random.default_rng(1).uniform(0.3,1.0,len(to.x))
+    to.analyze(np.ones(len(to.x)))
+    solver = to.linear_solver
+    d, _ = to.analyze(x)
+    assert to.linear_solver is solver
+    if solver.method == "splu":
+        assert solver.order is not None
+    #順序付けを再利用した分解と新しく分解した結果は一致する
+    fresh = TopologyOptimization(FEMModel(beam("Quad_8node",nx=16,ny=4)),0.5)
+    d_fresh, _ = fresh.analyze(x)
+    assert fresh.linear_solver.order is None
+    assert rel_error(d,d_fresh) < 1e-11
+
+def test_iterative_refactor_rebuilds_preconditioner():
+    data = beam("Quad_4node",nx=16,ny=8,solver="iterative",preconditioner="ichol",tolerance=1e-12)
+    to = TopologyOptimization(FEMModel(data),0.4)
+    to.iterate()
+    solver = to.linear_solver
+    densities = to.densities
+    d, _ = to.analyze(densities)
+    assert to.linear_solver is solver
+    #密度に合わせて前処理を作り直すため、少ない反復回数で収束する
+    assert max(solver.iterations) < 20
+    direct = TopologyOptimization(FEMModel(beam("Quad_4node",nx=16,ny=8)),0.4)
+    assert rel_error(d,direct.analyze(densities)[0]) < 1e-10
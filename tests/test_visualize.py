@@ -0,0 +1,35 @@
+import pytest
+
+matplotlib = pytest.importorskip("matplotlib")
+import matplotlib.pyplot as plt
+from matplotlib.collections import PolyCollection, LineCollection
+from Result.Visualize import Visualize
+from tests.common import beam, solve
+
+def test_save_without_pyplot(tmp_path):
+    s = solve(beam("Quad_8node"))
+    figures = plt.get_fignums()
+    stress_png, deform_png = tmp_path / "stress.png", tmp_path / "deform.png"
+    Visualize(s).plot_stress(save_path=str(stress_png))
+    Visualize(s).plot_deform(save_path=str(deform_png))
+    #ファイル保存時はpyplotの図を作らない(バッチ実行で図が溜まらない)
+    assert plt.get_fignums() == figures
+    for path in (stress_png,deform_png):
+        assert path.read_bytes()[:8] == b"\x89PNG\r\n\x1a\n"
+
+def test_contour_is_rasterized_in_vector_output(tmp_path):
+    svg = tmp_path / "stress.svg"
+    Visualize(solve(beam("Quad_4node"))).plot_stress(save_path=str(svg))
+    text = svg.read_text(encoding="utf-8")
+    #コンターは画像として埋め込み、要素境界のみベクター
+    assert "<image" in text
+    assert text.count("<path") < 200
+
+def test_outline_decimation():
+    s = solve(beam("Quad_4node",nx=8,ny=4))
+    x, _, corner = Visualize(s).deformed_coords(1.0)
+    full = Visualize.outline_collection(x,corner,None,ec="black")
+    assert isinstance(full,PolyCollection) and len(full.get_paths()) == 32
+    outline = Visualize.outline_collection(x,corner,10,ec="black")
+    #要素数が上限を超える場合は外周の辺(2 x (8 + 4)本)のみ
+    assert isinstance(outline,LineCollection) and len(outline.get_segments()) == 24
@@ -0,0 +1,65 @@
+import xml.etree.ElementTree as ET
+import numpy as np
+import pytest
+from Result.VTUWriter import VTUWriter
+from tests.common import beam, solve
+
+DTYPES = {"Float64":"<f8","Int64":"<i8","UInt8":"u1"}
+
+def read_vtu(path):
+    """
+    VTUWriterの出力をXMLとして解析し、AppendedDataの配列を読み込む。
+
+    Returns:
+        piece (Element): Pieceタグ
+        arrays ({(親タグ, 名前): array n_rows x n_comp})
+    """
+    with open(path,"rb") as f:
+        raw = f.read()
+    start = raw.index(b'<AppendedData encoding="raw">')
+    data_start = raw.index(b"_",start) + 1
+    root = ET.fromstring(raw[:start] + b"</VTKFile>")
+    assert root.get("type") == "UnstructuredGrid" and root.get("header_type") == "UInt64"
+    piece = root.find("UnstructuredGrid/Piece")
+    arrays, end = {}, data_start
+    for parent in piece:
+        for array in parent.iter("DataArray"):
+            pos = data_start + int(array.get("offset"))
+            nbytes = int(np.frombuffer(raw[pos:pos + 8],dtype="<u8")[0])
+            values = np.frombuffer(raw[pos + 8:pos + 8 + nbytes],dtype=DTYPES[array.get("type")])
+            arrays[parent.tag,array.get("Name")] = values.reshape(-1,int(array.get("NumberOfComponents")))
+            end = max(end,pos + 8 + nbytes)
+    #配列の後にはAppendedDataの終了タグのみ
+    assert raw[end:] == b"\n</AppendedData>\n</VTKFile>\n"
+    return piece, arrays
+
+@pytest.mark.parametrize("element_type,cell_type",[("Quad_4node",9),("Quad_8node",23)])
+def test_vtu_round_trip(element_type,cell_type,tmp_path,monkeypatch):
+    #チャンクの境界をまたぐように小さなチャンクで書き出す
+    monkeypatch.setattr(VTUWriter,"CHUNK_SIZE",7)
+    data = beam(element_type)
+    data["loads"] = {"cases":[{"name":"tip","loads":data["loads"]},{"name":'a<b & "c"',"loads":[{"node":40,"value":[5.0,0.0]}]}]}
+    s = solve(data)
+    path = str(tmp_path / "result.vtu")
+    VTUWriter.write(s,path)
+    piece, arrays = read_vtu(path)
+    mesh = s.mesh
+    n_nodes, n_elem = len(mesh.node_ids), len(mesh.element_ids)
+    assert (int(piece.get("NumberOfPoints")),int(piece.get("NumberOfCells"))) == (n_nodes,n_elem)
+    assert np.array_equal(arrays["Points","Points"][:,:2],mesh.coords)
+    assert np.array_equal(arrays["Cells","connectivity"],mesh.connectivity)
+    assert np.array_equal(arrays["Cells","offsets"].ravel(),mesh.connectivity.shape[1] * np.arange(1,n_elem + 1))
+    assert set(arrays["Cells","types"].ravel().tolist()) == {cell_type}
+    assert np.array_equal(arrays["CellData","element_id"].ravel(),mesh.element_ids)
+    for c,name in enumerate(["tip",'a<b & "c"']):
+        assert np.array_equal(arrays["PointData","displacement:" + name][:,:2],s.d_cases[:,c].reshape(-1,2))
+        stress = arrays["PointData","stress:" + name]
+        assert np.array_equal(stress[:mesh.n_corner_nodes],s.case_nodal_stress[c])
+    assert np.array_equal(arrays["CellData","gp_stress:tip"],s.gp_stress.reshape(n_elem,-1))
+
+def test_mid_node_stress_is_edge_average():
+    s = solve(beam("Quad_8node"))
+    stress = VTUWriter.point_stress(s.mesh,s.nodal_stress)
+    conn = s.mesh.connectivity
+    assert not np.isnan(stress).any()
+    assert np.allclose(stress[conn[:,5]],(s.nodal_stress[conn[:,1]] + s.nodal_stress[conn[:,2]]) / 2)